@@ -9,6 +9,20 @@ class Age:
         total_days = years * self.DAYS_IN_YEAR + days
         self.years, self.days = divmod(total_days, self.DAYS_IN_YEAR)
 
+    @classmethod
+    def parse(cls, value) -> "Age":
+        """
+        Build an Age from "years.days" text (the export format, e.g. "21.72"),
+        a [years, days] pair or a {"years": ..., "days": ...} mapping.
+        """
+        if isinstance(value, str):
+            years, _, days = value.strip().partition(".")
+            return cls(int(years), int(days or 0))
+        if isinstance(value, dict):
+            return cls(int(value["years"]), int(value.get("days", 0)))
+        years, days = value
+        return cls(int(years), int(days))
+
     def add_days(self, days: int):
         """
         Increase age by a certain number of days.
@@ -16,6 +30,12 @@ class Age:
         total_days = self.to_days() + days
         self.years, self.days = divmod(total_days, self.DAYS_IN_YEAR)
 
+    def plus_days(self, days: int) -> "Age":
+        """
+        Return the age a certain number of days later, leaving this one unchanged.
+        """
+        return Age(0, self.to_days() + days)
+
     def add_years(self, years: int):
         """
         Increase age by a certain number of years.
@@ -0,0 +1,156 @@
+"""Run optimization jobs from a JSONL stream and write results as JSONL.
+
+Each input line is one job (see optimization.parse_job). Jobs run on a bounded
+worker pool, of processes or, with --threads, of threads sharing this
+process's caches: at most --max-pending jobs are read ahead, so arbitrarily long
+streams are processed in constant memory. Results are written as soon as they
+finish (completion order, not input order), each tagged with its job "id";
+jobs without an id get their 1-based input line number. A job that fails
+becomes an error record instead of stopping the batch, and jobs without their
+own "time_budget" get --job-time-budget seconds.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+
+import optimization
+import profiling
+
+
+def safe_run_job(job: dict) -> dict:
+    """Worker task: run one job, turning any failure into an error record."""
+    try:
+        with profiling.phase("optimize"):
+            return optimization.run_job(job)
+    except ValueError as exc:
+        return {"id": job.get("id"), "error": str(exc)}
+    except Exception as exc:
+        return {"id": job.get("id"), "error": f"{type(exc).__name__}: {exc}"}
+
+
+def iter_jobs(lines):
+    """Yield (job, None) for each JSON object line, or (None, error record) for bad lines."""
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError as exc:
+            yield None, {"id": line_no, "error": f"invalid JSON: {exc}"}
+            continue
+        if not isinstance(job, dict):
+            yield None, {"id": line_no, "error": "job must be a JSON object"}
+            continue
+        job.setdefault("id", line_no)
+        yield job, None
+
+
+class InlineExecutor(concurrent.futures.Executor):
+    """Executor that runs each task immediately in the calling thread."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+
+def run_batch(lines, out, executor: concurrent.futures.Executor, max_pending: int,
+              job_time_budget: float | None = None) -> dict:
+    """Stream jobs from lines through executor, writing one JSON result line per job to out.
+
+    job_time_budget is the "time_budget" of jobs that set none. Returns counts
+    of finished jobs and errors.
+    """
+    counts = {"jobs": 0, "errors": 0}
+
+    def emit(record: dict) -> None:
+        counts["jobs"] += 1
+        if "error" in record:
+            counts["errors"] += 1
+        with profiling.phase("write"):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+
+    def drain(futures, return_when):
+        done, still_pending = concurrent.futures.wait(futures, return_when=return_when)
+        for future in done:
+            emit(future.result())
+        return still_pending
+
+    pending = set()
+    for job, error in iter_jobs(lines):
+        if error is not None:
+            emit(error)
+            continue
+        if job_time_budget is not None and job.get("time_budget") is None:
+            job["time_budget"] = job_time_budget
+        if len(pending) >= max_pending:
+            pending = drain(pending, concurrent.futures.FIRST_COMPLETED)
+        pending.add(executor.submit(safe_run_job, job))
+    drain(pending, concurrent.futures.ALL_COMPLETED)
+    return counts
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Run training optimization jobs from JSONL and stream results as JSONL.")
+    parser.add_argument("jobs", nargs="?", default="-",
+                        help="JSONL file with one job per line (default: stdin)")
+    parser.add_argument("--out", default="-", help="result file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes")
+    parser.add_argument("--threads", action="store_true",
+                        help="run the workers as threads of this process, sharing one warm training "
+                             "cache (parallel only on a free-threaded Python)")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="jobs read ahead of the workers (default: 4 per worker)")
+    parser.add_argument("--job-time-budget", type=float, default=60.,
+                        help="seconds a job may optimize before it returns its partial plan, for "
+                             "jobs without their own time_budget (default: 60; 0 for no limit)")
+    parser.add_argument("--profile", action="store_true",
+                        help="run the jobs in this process and print per-phase times, hot-function "
+                             "call counts, cache hit rates and peak memory to stderr")
+    parser.add_argument("--profile-dump", default=None, metavar="FILE",
+                        help="also write a cProfile dump of the run to FILE (implies --profile)")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.job_time_budget < 0:
+        parser.error("--job-time-budget must not be negative")
+    max_pending = args.max_pending or 4 * args.workers
+    job_time_budget = args.job_time_budget or None
+
+    jobs = sys.stdin if args.jobs == "-" else open(args.jobs, encoding="utf-8")
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    profiler = None
+    if args.profile or args.profile_dump:
+        profiler = profiling.Profiler(args.profile_dump)
+    try:
+        if profiler is not None:
+            # worker processes would hide the jobs from the counters and the dump
+            with profiler, InlineExecutor() as executor:
+                counts = run_batch(jobs, out, executor, max_pending, job_time_budget)
+        else:
+            if args.threads and args.workers > 1 and optimization.gil_enabled():
+                print("warning: the GIL is enabled, so --threads runs one job at a time; "
+                      "use worker processes or a free-threaded Python", file=sys.stderr)
+            with optimization.worker_pool(args.workers, args.threads) as executor:
+                counts = run_batch(jobs, out, executor, max_pending, job_time_budget)
+    finally:
+        if jobs is not sys.stdin:
+            jobs.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"{counts['jobs']} jobs, {counts['errors']} errors", file=sys.stderr)
+    if profiler is not None:
+        print(profiler.report(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Refit the training model's constants from observed weekly skill changes.
+
+Observations are kept as columns (one array per field) and the model is
+evaluated over all of them at once, together with its analytic derivative
+with respect to every fitted constant. Levenberg-Marquardt on the resulting
+normal equations fits the constants, and the result is written as a
+versioned parameter set that training.load_parameters reads back.
+
+The model's scale is shared by the level factor, the training factor and the
+age factor: multiplying one and dividing another changes nothing. So
+under_9_scale and age_numerator stay fixed by default and anchor that scale.
+drop_start is where the drop term switches on; it is not differentiable and
+can never be fitted.
+"""
+
+import argparse
+import array
+import csv
+import json
+import math
+import operator
+import sys
+
+import training
+from age import Age
+from rank_players import parse_float
+
+FIT_DEFAULT = ("under_9_rate", "over_9_scale", "over_9_offset",
+               "drop_a", "drop_b", "drop_c", "drop_d",
+               *training.TRAINING_TYPES, "age_offset")
+NOT_FITTABLE = ("drop_start",)
+
+OBSERVATION_DEFAULTS = {"Coach": 5, "Assistant": 10, "Intensity": 100, "Stamina": 10, "Minutes": 90}
+
+
+class Observations:
+    """Columns of (age, skill, level, coaching, observed gain) observations."""
+
+    def __init__(self):
+        self.level = array.array("d")  # skill level - 1, as training.calculate_training uses it
+        self.age = array.array("d")  # years, fractional
+        self.skill = array.array("b")  # index into training.TRAINING_TYPES
+        self.base = array.array("d")  # coach * assistant * intensity * stamina * minutes factors
+        self.gain = array.array("d")
+
+    def __len__(self) -> int:
+        return len(self.gain)
+
+    def add(self, age: Age, skill: str, level: float, gain: float, coach=5, assistant=10,
+            intensity=100, stamina=10, minutes=90) -> None:
+        if skill not in training.TRAINING_TYPES:
+            raise ValueError(f"unknown training type {skill!r}")
+        self.level.append(level - 1)
+        self.age.append(age.get_age())
+        self.skill.append(training.TRAINING_TYPES.index(skill))
+        self.base.append(training.coach_factor(coach) * training.assistant_factor(assistant)
+                         * intensity / 100.0 * (1 - stamina / 100.0) * minutes / 90.0)
+        self.gain.append(gain)
+
+
+def read_observations(lines) -> tuple[Observations, list[str]]:
+    """Parse semicolon-separated Age;Skill;Level;Gain rows (plus optional Coach,
+    Assistant, Intensity, Stamina and Minutes columns); returns (observations, warnings)."""
+    observations = Observations()
+    warnings = []
+    for number, row in enumerate(csv.DictReader(lines, delimiter=";"), start=2):
+        try:
+            coaching = {name.lower(): parse_float(row.get(name) or default)
+                        for name, default in OBSERVATION_DEFAULTS.items()}
+            coaching["coach"] = int(coaching["coach"])
+            observations.add(Age.parse(row["Age"]), row["Skill"].strip(),
+                             parse_float(row["Level"]), parse_float(row["Gain"]), **coaching)
+        except (KeyError, TypeError, ValueError) as exc:
+            warnings.append(f"skipping line {number}: bad or missing value ({exc})")
+    return observations, warnings
+
+
+def evaluate(observations: Observations, params: dict,
+             names: tuple[str, ...] = ()) -> tuple[list[float], dict[str, list[float]]]:
+    """Residuals (predicted - observed gain) and the residuals' derivative columns for `names`.
+
+    Predictions match training.calculate_training with the same params.
+    """
+    obs = observations
+    a1, b1 = params["under_9_scale"], params["under_9_rate"]
+    a2, c2 = params["over_9_scale"], params["over_9_offset"]
+    start, shift = params["drop_start"], params["drop_shift_over_20"]
+    da, db, dc, dd = params["drop_a"], params["drop_b"], params["drop_c"], params["drop_d"]
+    factors = [params[skill] for skill in training.TRAINING_TYPES]
+    numerator, offset = params["age_numerator"], params["age_offset"]
+
+    under = [level < 9 for level in obs.level]
+    level_factor = [a1 * math.e ** (b1 * level) if u else a2 / level - c2
+                    for level, u in zip(obs.level, under)]
+    age_factor = [numerator / (age + offset) for age in obs.age]
+    # everything but the level factor
+    unit = [base * factors[skill] * k for base, skill, k in zip(obs.base, obs.skill, age_factor)]
+    amount = list(map(operator.mul, level_factor, unit))
+    dropped = [level >= start for level in obs.level]
+    shifted = [level + shift if level > 20 else level for level in obs.level]
+    drop = [((da * x + db) * x + dc) * x + dd if d else 0. for x, d in zip(shifted, dropped)]
+    active = [d <= m for d, m in zip(drop, amount)]
+    residuals = [m - d - gain if a else -gain
+                 for m, d, gain, a in zip(amount, drop, obs.gain, active)]
+
+    columns = {}
+    for name in names:
+        if name == "under_9_scale":
+            column = [m / a1 if a and u else 0. for m, a, u in zip(amount, active, under)]
+        elif name == "under_9_rate":
+            column = [m * level if a and u else 0.
+                      for m, level, a, u in zip(amount, obs.level, active, under)]
+        elif name == "over_9_scale":
+            column = [g / level if a and not u else 0.
+                      for g, level, a, u in zip(unit, obs.level, active, under)]
+        elif name == "over_9_offset":
+            column = [-g if a and not u else 0.
+                      for g, level, a, u in zip(unit, obs.level, active, under)]
+        elif name in ("drop_a", "drop_b", "drop_c", "drop_d"):
+            power = 3 - "abcd".index(name[-1])
+            column = [-x ** power if a and d else 0. for x, a, d in zip(shifted, active, dropped)]
+        elif name == "drop_shift_over_20":
+            column = [-((3 * da * x + 2 * db) * x + dc) if a and d and level > 20 else 0.
+                      for x, level, a, d in zip(shifted, obs.level, active, dropped)]
+        elif name in training.TRAINING_TYPES:
+            index = training.TRAINING_TYPES.index(name)
+            column = [f * base * k if a and skill == index else 0.
+                      for f, base, k, skill, a in zip(level_factor, obs.base, age_factor,
+                                                      obs.skill, active)]
+        elif name == "age_numerator":
+            column = [m / numerator if a else 0. for m, a in zip(amount, active)]
+        elif name == "age_offset":
+            column = [-m / (age + offset) if a else 0. for m, age, a in zip(amount, obs.age, active)]
+        else:
+            raise ValueError(f"cannot fit {name!r}")
+        columns[name] = column
+    return residuals, columns
+
+
+def solve(matrix: list[list[float]], rhs: list[float]) -> list[float]:
+    """Solve a small dense linear system by Gaussian elimination with partial pivoting."""
+    n = len(rhs)
+    rows = [row[:] + [value] for row, value in zip(matrix, rhs)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        if rows[pivot][col] == 0:
+            raise ValueError("singular system")
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for r in range(col + 1, n):
+            factor = rows[r][col] / rows[col][col]
+            if factor:
+                rows[r] = [x - factor * y for x, y in zip(rows[r], rows[col])]
+    solution = [0.] * n
+    for r in reversed(range(n)):
+        solution[r] = (rows[r][n] - sum(rows[r][c] * solution[c] for c in range(r + 1, n))) / rows[r][r]
+    return solution
+
+
+def dot(a: list[float], b: list[float]) -> float:
+    return sum(map(operator.mul, a, b))
+
+
+def normal_equations(names, residuals, columns):
+    """J^T J and J^T r; derivatives of different training types never overlap and are skipped."""
+    size = len(names)
+    jtj = [[0.] * size for _ in range(size)]
+    for i, first in enumerate(names):
+        for j in range(i, size):
+            second = names[j]
+            if (i != j and first in training.TRAINING_TYPES
+                    and second in training.TRAINING_TYPES):
+                continue
+            jtj[i][j] = jtj[j][i] = dot(columns[first], columns[second])
+    jtr = [dot(columns[name], residuals) for name in names]
+    return jtj, jtr
+
+
+def fit(observations: Observations, params: dict | None = None,
+        names: tuple[str, ...] = FIT_DEFAULT, max_iterations: int = 100,
+        tolerance: float = 1e-12, progress=None) -> tuple[dict, dict]:
+    """Least-squares fit of `names`, starting from params (default training.PARAMS).
+
+    Returns (params, info); info has iterations, rmse, observations and the
+    names actually fitted (constants no observation depends on are left alone).
+    """
+    params = dict(training.PARAMS if params is None else params)
+    for name in names:
+        if name in NOT_FITTABLE or name not in params:
+            raise ValueError(f"cannot fit {name!r}")
+    if not len(observations):
+        raise ValueError("no observations to fit")
+    residuals, columns = evaluate(observations, params, names)
+    names = tuple(name for name in names if any(columns[name]))
+    loss = dot(residuals, residuals)
+    damping = 1e-3
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        jtj, jtr = normal_equations(names, residuals, columns)
+        while True:
+            damped = [[value * (1 + damping) if i == j else value for j, value in enumerate(row)]
+                      for i, row in enumerate(jtj)]
+            step = solve(damped, [-g for g in jtr])
+            trial = dict(params)
+            for name, delta in zip(names, step):
+                trial[name] += delta
+            trial_residuals, _ = evaluate(observations, trial)
+            trial_loss = dot(trial_residuals, trial_residuals)
+            if trial_loss < loss or damping > 1e12:
+                break
+            damping *= 4
+        if trial_loss >= loss:
+            break
+        improvement = loss - trial_loss
+        params, loss = trial, trial_loss
+        damping = max(damping / 3, 1e-12)
+        residuals, columns = evaluate(observations, params, names)
+        if progress is not None:
+            progress(iteration, math.sqrt(loss / len(observations)))
+        if improvement <= tolerance * loss:
+            break
+    info = {"iterations": iteration, "rmse": math.sqrt(loss / len(observations)),
+            "observations": len(observations), "fitted": list(names)}
+    return params, info
+
+
+def write_parameters(path: str, params: dict, info: dict) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"format": training.PARAMETERS_FORMAT, "version": training.PARAMETERS_VERSION,
+                   **info, "params": params}, f, indent=2)
+        f.write("\n")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Fit the training model's constants to observed weekly skill changes.")
+    parser.add_argument("observations",
+                        help="semicolon-separated file with Age;Skill;Level;Gain columns "
+                             "(optional: Coach;Assistant;Intensity;Stamina;Minutes)")
+    parser.add_argument("--out", required=True, help="parameter set to write (JSON)")
+    parser.add_argument("--start", default=None,
+                        help="parameter set to start from (default: the built-in constants)")
+    parser.add_argument("--fit", default=None,
+                        help="comma-separated constants to fit (default: "
+                             f"{','.join(FIT_DEFAULT)})")
+    parser.add_argument("--max-iterations", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    names = FIT_DEFAULT
+    if args.fit:
+        names = tuple(name.strip() for name in args.fit.split(","))
+    with open(args.observations, encoding="utf-8") as f:
+        observations, warnings = read_observations(f)
+    for warning in warnings:
+        print(f"warning: {warning}", file=sys.stderr)
+    try:
+        start = training.load_parameters(args.start) if args.start else None
+        params, info = fit(observations, start, names, args.max_iterations,
+                           progress=lambda i, rmse: print(f"iteration {i}: rmse {rmse:.6g}",
+                                                          file=sys.stderr))
+    except ValueError as exc:
+        parser.error(str(exc))
+    write_parameters(args.out, params, info)
+    print(f"fitted {len(info['fitted'])} constants to {info['observations']} observations "
+          f"in {info['iterations']} iterations, rmse {info['rmse']:.6g}; wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
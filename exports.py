@@ -0,0 +1,132 @@
+"""Open player exports that may be gzip, bz2 or zip compressed.
+
+The compression is detected from the file's magic bytes, not its name. A
+compressed export is decompressed on a background thread that hands chunks to
+the reader through a bounded queue, so decompression overlaps with CSV parsing
+and at most max_chunks * chunk_size decompressed bytes are buffered; nothing
+is written to disk. Plain files are opened directly.
+"""
+
+import bz2
+import contextlib
+import gzip
+import io
+import queue
+import threading
+import zipfile
+
+MAGIC = {b"\x1f\x8b": "gzip", b"BZh": "bz2", b"PK\x03\x04": "zip"}
+CHUNK_SIZE = 1 << 16
+MAX_CHUNKS = 8
+
+
+def detect_compression(path: str) -> str | None:
+    """"gzip", "bz2" or "zip" from the file's first bytes, None for a plain file."""
+    with open(path, "rb") as f:
+        head = f.read(4)
+    for magic, kind in MAGIC.items():
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def zip_member(archive: zipfile.ZipFile) -> str:
+    """The export inside a zip: its only file, or else its only .csv file."""
+    names = [info.filename for info in archive.infolist() if not info.is_dir()]
+    if len(names) != 1:
+        names = [name for name in names if name.lower().endswith(".csv")]
+    if len(names) != 1:
+        raise ValueError(f"zip archive must hold exactly one .csv export, found {len(names)}")
+    return names[0]
+
+
+class QueueReader(io.RawIOBase):
+    """Raw stream over the chunks a background thread reads from a binary file.
+
+    The thread puts bytes chunks on a bounded queue and then None; an exception
+    raised while decompressing is put on the queue instead and re-raised by
+    the reader.
+    """
+
+    def __init__(self, raw, chunk_size: int = CHUNK_SIZE, max_chunks: int = MAX_CHUNKS):
+        self.raw = raw
+        self.chunks = queue.Queue(maxsize=max_chunks)
+        # the current chunk and how much of it has been read
+        self.pending = b""
+        self.offset = 0
+        self.finished = False
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._produce, args=(chunk_size,), daemon=True)
+        self.thread.start()
+
+    def _put(self, item) -> bool:
+        while not self.stopping.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, chunk_size: int) -> None:
+        try:
+            while not self.stopping.is_set():
+                chunk = self.raw.read(chunk_size)
+                if not chunk:
+                    break
+                if not self._put(chunk):
+                    return
+        except Exception as exc:
+            self._put(exc)
+            return
+        self._put(None)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while self.offset == len(self.pending) and not self.finished:
+            item = self.chunks.get()
+            if item is None:
+                self.finished = True
+            elif isinstance(item, Exception):
+                self.finished = True
+                raise item
+            else:
+                self.pending, self.offset = item, 0
+        size = min(len(buffer), len(self.pending) - self.offset)
+        buffer[:size] = memoryview(self.pending)[self.offset:self.offset + size]
+        self.offset += size
+        return size
+
+    def close(self) -> None:
+        if not self.closed:
+            self.stopping.set()
+            if self.thread.ident is not None:
+                self.thread.join()
+            self.raw.close()
+        super().close()
+
+
+@contextlib.contextmanager
+def open_export(path: str, encoding: str = "utf-8", chunk_size: int = CHUNK_SIZE,
+                max_chunks: int = MAX_CHUNKS):
+    """Open an export for reading as text, decompressing it in the background if needed."""
+    kind = detect_compression(path)
+    if kind is None:
+        with open(path, encoding=encoding) as f:
+            yield f
+        return
+    with contextlib.ExitStack() as stack:
+        if kind == "gzip":
+            raw = gzip.open(path, "rb")
+        elif kind == "bz2":
+            raw = bz2.open(path, "rb")
+        else:
+            archive = stack.enter_context(zipfile.ZipFile(path))
+            raw = archive.open(zip_member(archive))
+        # closed here if the reader or its wrappers cannot be built; closing twice is harmless
+        stack.callback(raw.close)
+        reader = QueueReader(raw, chunk_size, max_chunks)
+        stack.callback(reader.close)
+        yield stack.enter_context(io.TextIOWrapper(io.BufferedReader(reader), encoding=encoding))
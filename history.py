@@ -0,0 +1,360 @@
+"""Append-only weekly history of player exports, keyed by PlayerID.
+
+The store is a directory of column files, one fixed-width array per field,
+holding one row per (player, week) in which something changed. Unchanged
+players are not written again, and a change in age alone does not count as a
+change. Each row also records:
+
+- "prev": the row of the same player's previous record, so one player's
+  progression is a walk back along that chain;
+- "popped": a bitmask of the skills whose whole level went up since that
+  previous record.
+
+The rows of a week are contiguous, and weeks.col holds their range.
+Every player's last row, name and values are kept in memory, so ingesting an
+export only compares it with them and appends new rows. On disk they are
+latest.json, a snapshot covering the rows up to its "rows" count, plus
+latest.log, one appended JSON line per later ingest with the players it
+changed. An ingest therefore writes in proportion to the export, not to the
+players ever seen or the weeks already held; every LOG_COMPACT_INGESTS
+ingests the log is folded into a new snapshot. meta.json is replaced last;
+rows and log lines past its count left by an interrupted ingest are ignored
+and cut off by the next one. A latest.json pointing at such rows is rebuilt
+from the columns when the store is opened.
+"""
+
+import argparse
+import array
+import json
+import math
+import os
+import sys
+
+import rank_players
+from age import Age
+
+SKILLS = list(rank_players.SKILL_COLUMNS.values())
+
+# column name -> array typecode
+COLUMNS = {
+    "player_id": "q",
+    "week": "l",
+    "prev": "q",
+    "age_days": "l",
+    "form": "d",
+    "experience": "d",
+    **{skill: "d" for skill in SKILLS},
+    "popped": "H",
+}
+TRACKED = ["form", "experience"] + SKILLS
+WEEK_FIELDS = 3  # week, first row, row count
+# ingests logged to latest.log before it is folded into latest.json
+LOG_COMPACT_INGESTS = 52
+
+
+def column_file(name: str) -> str:
+    return name.lower().replace(" ", "_") + ".col"
+
+
+def age_days(player: dict) -> int:
+    """Age in days from the export's "years.days" text; -1 when unknown."""
+    try:
+        return Age.parse(player["age"]).to_days()
+    except ValueError:
+        return -1
+
+
+def popped_mask(before: dict, after: dict) -> int:
+    """Bit i is set when SKILLS[i] reached a higher whole level."""
+    mask = 0
+    for bit, skill in enumerate(SKILLS):
+        if math.floor(after[skill]) > math.floor(before[skill]):
+            mask |= 1 << bit
+    return mask
+
+
+def mask_skills(mask: int) -> list[str]:
+    return [skill for bit, skill in enumerate(SKILLS) if mask & (1 << bit)]
+
+
+class HistoryStore:
+    """A history directory; created empty on first use."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        try:
+            with open(self._file("meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            meta = {"version": 1, "rows": 0, "weeks": 0}
+        self.rows = meta["rows"]
+        self.week_count = meta["weeks"]
+        try:
+            with open(self._file("latest.json"), encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            snapshot = {"rows": 0, "players": {}}
+        # a store written before latest.log holds the whole map, with no row count
+        old_format = "players" not in snapshot
+        if old_format:
+            snapshot = {"rows": self.rows, "players": snapshot}
+        self.latest = {int(player_id): record for player_id, record in snapshot["players"].items()}
+        self._replay_log(snapshot["rows"])
+        if any(record["row"] >= self.rows for record in self.latest.values()):
+            self._rebuild_latest()
+            self._compact()
+        elif old_format and self.latest:
+            self._compact()
+
+    def _replay_log(self, snapshot_rows: int) -> None:
+        """Apply the latest.log lines committed after the snapshot; note where the valid log ends."""
+        self.log_end = 0
+        self.log_ingests = 0
+        try:
+            with open(self._file("latest.log"), "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # cut short by a crash
+                    if entry["rows"] > self.rows:
+                        break  # written by an ingest that never committed
+                    self.log_end += len(line)
+                    self.log_ingests += 1
+                    if entry["rows"] > snapshot_rows:
+                        for player_id, record in entry["players"].items():
+                            self.latest[int(player_id)] = record
+        except FileNotFoundError:
+            pass
+
+    def _append_log(self, rows: int, changed: dict) -> None:
+        with open(self._file("latest.log"), "ab") as f:
+            if f.tell() != self.log_end:
+                f.truncate(self.log_end)
+            line = (json.dumps({"rows": rows, "players": changed}) + "\n").encode("utf-8")
+            f.write(line)
+        self.log_end += len(line)
+        self.log_ingests += 1
+
+    def _compact(self) -> None:
+        """Fold latest.log into a new latest.json snapshot and empty the log."""
+        self._write_json("latest.json", {"rows": self.rows, "players": {
+            str(player_id): record for player_id, record in self.latest.items()}})
+        with open(self._file("latest.log"), "wb"):
+            pass
+        self.log_end = 0
+        self.log_ingests = 0
+
+    def _rebuild_latest(self) -> None:
+        """Recompute latest from the committed rows, after latest.json got ahead of meta.json."""
+        names = {player_id: record["name"] for player_id, record in self.latest.items()}
+        self.latest = {}
+        for record in self.read_rows(0, self.rows):
+            player_id = record["player_id"]
+            self.latest[player_id] = {
+                "row": record["row"], "name": names.get(player_id, ""),
+                "values": {key: record["skills"][key] if key in SKILLS else record[key]
+                           for key in TRACKED}}
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _write_json(self, name: str, data) -> None:
+        tmp = self._file(name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self._file(name))
+
+    def _append(self, name: str, typecode: str, committed: int, values: array.array) -> None:
+        """Append to a column file, dropping anything past the committed length first."""
+        path = self._file(column_file(name))
+        itemsize = array.array(typecode).itemsize
+        with open(path, "ab") as f:
+            if f.tell() != committed * itemsize:
+                f.truncate(committed * itemsize)
+            values.tofile(f)
+
+    def weeks(self) -> list[tuple[int, int, int]]:
+        """(week, first row, row count) for every ingested week, oldest first."""
+        index = array.array("q")
+        if self.week_count:
+            with open(self._file("weeks.col"), "rb") as f:
+                index.fromfile(f, self.week_count * WEEK_FIELDS)
+        return [tuple(index[i:i + WEEK_FIELDS]) for i in range(0, len(index), WEEK_FIELDS)]
+
+    def last_week(self) -> int | None:
+        if not self.week_count:
+            return None
+        index = array.array("q")
+        with open(self._file("weeks.col"), "rb") as f:
+            f.seek((self.week_count - 1) * WEEK_FIELDS * index.itemsize)
+            index.fromfile(f, WEEK_FIELDS)
+        return index[0]
+
+    def ingest(self, players: list[dict], week: int | None = None) -> dict:
+        """Append the players that changed since their last record; returns counts.
+
+        Weeks must be ingested in increasing order; the default is the week
+        after the last one (or 0 for an empty store). The counts are rows
+        "appended", players "unchanged", rows "skipped" for lacking a PlayerID
+        and "duplicates" of a PlayerID already in the export.
+        """
+        last = self.last_week()
+        if week is None:
+            week = 0 if last is None else last + 1
+        elif last is not None and week <= last:
+            raise ValueError(f"week {week} is not after the last ingested week {last}")
+
+        columns = {name: array.array(typecode) for name, typecode in COLUMNS.items()}
+        stats = {"week": week, "appended": 0, "unchanged": 0, "skipped": 0, "duplicates": 0}
+        seen = set()
+        changed = {}
+        for player in players:
+            player_id = player.get("player_id")
+            if player_id is None:
+                stats["skipped"] += 1
+                continue
+            if player_id in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(player_id)
+            values = dict(player["skills"], form=player["form"], experience=player["experience"])
+            previous = self.latest.get(player_id)
+            if previous is not None and all(
+                    previous["values"][key] == values[key] for key in TRACKED):
+                stats["unchanged"] += 1
+                continue
+            row = self.rows + stats["appended"]
+            columns["player_id"].append(player_id)
+            columns["week"].append(week)
+            columns["prev"].append(-1 if previous is None else previous["row"])
+            columns["age_days"].append(age_days(player))
+            for key in TRACKED:
+                columns[key].append(values[key])
+            columns["popped"].append(
+                0 if previous is None else popped_mask(previous["values"], values))
+            self.latest[player_id] = changed[str(player_id)] = {
+                "row": row, "name": player["name"], "values": {key: values[key] for key in TRACKED}}
+            stats["appended"] += 1
+
+        for name, typecode in COLUMNS.items():
+            self._append(name, typecode, self.rows, columns[name])
+        self._append("weeks", "q", self.week_count * WEEK_FIELDS,
+                     array.array("q", (week, self.rows, stats["appended"])))
+        self._append_log(self.rows + stats["appended"], changed)
+        self.rows += stats["appended"]
+        self.week_count += 1
+        self._write_json("meta.json", {"version": 1, "rows": self.rows, "weeks": self.week_count})
+        if self.log_ingests >= LOG_COMPACT_INGESTS:
+            self._compact()
+        stats["rows"] = self.rows
+        return stats
+
+    def read_rows(self, start: int, stop: int) -> list[dict]:
+        """Rows [start, stop) as dicts, read as one slice of every column."""
+        stop = min(stop, self.rows)
+        if stop <= start:
+            return []
+        columns = {}
+        for name, typecode in COLUMNS.items():
+            values = array.array(typecode)
+            with open(self._file(column_file(name)), "rb") as f:
+                f.seek(start * values.itemsize)
+                values.fromfile(f, stop - start)
+            columns[name] = values
+        return [self._record(start + i, {name: values[i] for name, values in columns.items()})
+                for i in range(stop - start)]
+
+    def _record(self, row: int, fields: dict) -> dict:
+        player_id = fields["player_id"]
+        days = fields["age_days"]
+        return {
+            "row": row,
+            "player_id": player_id,
+            "name": self.latest.get(player_id, {}).get("name", ""),
+            "week": fields["week"],
+            "age": "?" if days < 0 else "{}.{}".format(*divmod(days, Age.DAYS_IN_YEAR)),
+            "form": fields["form"],
+            "experience": fields["experience"],
+            "skills": {skill: fields[skill] for skill in SKILLS},
+            "popped": mask_skills(fields["popped"]),
+            "prev": fields["prev"],
+        }
+
+    def progression(self, player_id: int) -> list[dict]:
+        """Every stored record of one player, oldest first."""
+        records = []
+        row = self.latest.get(player_id, {}).get("row", -1)
+        while row >= 0:
+            record = self.read_rows(row, row + 1)[0]
+            records.append(record)
+            row = record["prev"]
+        records.reverse()
+        return records
+
+    def popped(self, week: int | None = None) -> list[dict]:
+        """Records of the players who gained a whole skill level in a week (default: the last)."""
+        weeks = {entry[0]: entry for entry in self.weeks()}
+        if week is None:
+            week = self.last_week()
+        if week not in weeks:
+            raise ValueError(f"week {week} has not been ingested")
+        _, start, count = weeks[week]
+        return [record for record in self.read_rows(start, start + count) if record["popped"]]
+
+
+def format_record(record: dict) -> str:
+    skills = "  ".join(f"{skill} {record['skills'][skill]:g}" for skill in SKILLS)
+    popped = f"  popped: {', '.join(record['popped'])}" if record["popped"] else ""
+    return (f"week {record['week']}  {record['name']} ({record['player_id']})  {record['age']}  "
+            f"form {record['form']:g}  exp {record['experience']:g}  {skills}{popped}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Keep a weekly history of player exports and query skill progression.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="append an export to the history")
+    ingest.add_argument("store", help="history directory (created if missing)")
+    ingest.add_argument("csv_file", help="semicolon-separated player export")
+    ingest.add_argument("--week", type=int, default=None,
+                        help="week number of the export (default: one after the last ingested)")
+    progression = commands.add_parser("progression", help="show one player's stored records")
+    progression.add_argument("store", help="history directory")
+    progression.add_argument("player_id", type=int)
+    popped = commands.add_parser("popped", help="list players who gained a skill level in a week")
+    popped.add_argument("store", help="history directory")
+    popped.add_argument("--week", type=int, default=None, help="week to look at (default: the last)")
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.store)
+    if args.command == "ingest":
+        players, warnings = rank_players.parse_players(args.csv_file)
+        for warning in warnings:
+            print(f"warning: {warning}", file=sys.stderr)
+        try:
+            stats = store.ingest(players, args.week)
+        except ValueError as exc:
+            parser.error(str(exc))
+        print(f"week {stats['week']}: {stats['appended']} rows appended, "
+              f"{stats['unchanged']} unchanged, {stats['skipped']} without a PlayerID, "
+              f"{stats['duplicates']} duplicate PlayerIDs; {stats['rows']} rows in total")
+    elif args.command == "progression":
+        records = store.progression(args.player_id)
+        if not records:
+            parser.error(f"no history for player {args.player_id}")
+        for record in records:
+            print(format_record(record))
+    else:
+        try:
+            records = store.popped(args.week)
+        except ValueError as exc:
+            parser.error(str(exc))
+        for record in records:
+            print(format_record(record))
+        print(f"\n{len(records)} players popped", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,528 @@
+"""Find the best formation, player assignment and individual orders for a squad.
+
+The objective is the one optimization.team_objective uses: the sector-
+weighted sum of ratings.calculate_team_ratings. Overcrowding factors come from
+ratings.get_overcowding_factor and orders from contributions.contributions.
+
+Every formation the game allows is searched exactly by branch and bound.
+
+Prices. If every sector rating were linear in its sum, the best lineup would
+be an assignment problem: a player's value in a slot is the priced
+contribution of their best order there, and the Hungarian method solves it
+exactly. The rating is x ** 1.2 of the sum, which is convex, but the best
+lineup is still the best assignment under some prices: the gradient at its
+own sums.
+
+Pruning. Before searching, a slot option is dropped when at least as many
+other players as there are slots have an option there that contributes at
+least as much to every sector.
+
+Bound. The search branches over boxes of sector sums, starting from the range
+the per-player best and worst contributions allow. Inside a box the chord of
+each sector lies above its curve, so the objective becomes linear again. The
+box constraint is moved into the prices by Lagrangian relaxation and a few
+subgradient steps tighten it. Boxes that cannot beat the best lineup are
+pruned. The rest are split in half along the sector whose chord is furthest
+from its curve, and both halves start from the parent's multipliers. Every
+assignment solved on the way is a real lineup and is rated.
+
+Start. A fixed-point pass gives a strong first lineup for every formation.
+It repeatedly re-solves the assignment with the current sector gradients
+until the lineup stops changing.
+
+Symmetry. The contribution table is left/right symmetric, so with symmetric
+sector weights (LB = RB and LF = RF) a lineup and its mirror image rate the
+same. Only one formation of each mirror pair is searched. In a formation that
+is its own mirror, only boxes with room for LB <= RB are searched and rated
+lineups are memoized up to mirroring. The formations are spread over worker
+processes.
+"""
+
+import argparse
+import concurrent.futures
+import itertools
+import sys
+
+import contributions
+import rank_players
+import ratings
+
+SECTORS = ("LB", "MB", "RB", "M", "LF", "MF", "RF")
+
+# slot -> its orders as contribution-table codes; right-hand slots mirror the left-hand ones
+SLOT_ORDERS = {
+    "GK": ("GK",),
+    "LWB": ("LWB", "LWBD", "LWBM", "LWBO"),
+    "LCD": ("LCD", "LOCD", "LCDTW"),
+    "CD": ("CD", "OCD"),
+    "LW": ("LW", "LWD", "LWO", "LWTM"),
+    "LIM": ("LIM", "LIMD", "LIMO", "LIMTW"),
+    "IM": ("IM", "IMD", "IMO"),
+    "LFW": ("LFW", "LDF", "LFTW"),
+    "FW": ("FW", "DF"),
+}
+# central slots used for 0, 1, 2 or 3 players in a line
+CENTRAL = {
+    "CD": ((), ("CD",), ("LCD", "RCD"), ("LCD", "CD", "RCD")),
+    "IM": ((), ("IM",), ("LIM", "RIM"), ("LIM", "IM", "RIM")),
+    "FW": ((), ("FW",), ("LFW", "RFW"), ("LFW", "FW", "RFW")),
+}
+# the formations the game allows: 2-5 defenders, 2-5 midfielders, 0-3 forwards
+DEFENDERS = range(2, 6)
+MIDFIELDERS = range(2, 6)
+FORWARDS = range(0, 4)
+# slots from the goalkeeper forwards, right to left within a line, as the game lists them
+SLOT_DISPLAY_ORDER = ("GK", "RWB", "RCD", "CD", "LCD", "LWB", "RW", "RIM", "IM", "LIM", "LW",
+                      "RFW", "FW", "LFW")
+EPSILON = 1e-9
+# Lagrangian price updates per sector box
+SUBGRADIENT_STEPS = 3
+# assignment value of a player who has no order left in a slot
+UNAVAILABLE = -1e30
+
+
+def mirror(code: str) -> str:
+    """The same slot or order on the other side of the pitch."""
+    if code.startswith("L"):
+        return "R" + code[1:]
+    if code.startswith("R"):
+        return "L" + code[1:]
+    return code
+
+
+for _slot in [slot for slot in SLOT_ORDERS if slot.startswith("L")]:
+    SLOT_ORDERS[mirror(_slot)] = tuple(mirror(code) for code in SLOT_ORDERS[_slot])
+
+
+def enumerate_formations() -> list[tuple[str, ...]]:
+    """Every allowed formation as a tuple of slots, goalkeeper first."""
+    formations = []
+    for defenders in DEFENDERS:
+        for midfielders in MIDFIELDERS:
+            forwards = 10 - defenders - midfielders
+            if forwards not in FORWARDS:
+                continue
+            for backs in ((), ("LWB",), ("RWB",), ("LWB", "RWB")):
+                central_backs = defenders - len(backs)
+                if not 0 <= central_backs <= 3:
+                    continue
+                for wings in ((), ("LW",), ("RW",), ("LW", "RW")):
+                    inner = midfielders - len(wings)
+                    if not 0 <= inner <= 3:
+                        continue
+                    formations.append(("GK", *backs, *CENTRAL["CD"][central_backs], *wings,
+                                       *CENTRAL["IM"][inner], *CENTRAL["FW"][forwards]))
+    return formations
+
+
+def mirror_formation(formation: tuple[str, ...]) -> tuple[str, ...]:
+    return tuple(sorted(mirror(slot) for slot in formation))
+
+
+def formation_label(formation: tuple[str, ...]) -> str:
+    defenders = sum(1 for slot in formation if "WB" in slot or "CD" in slot)
+    forwards = sum(1 for slot in formation if "FW" in slot)
+    return f"{defenders}-{10 - defenders - forwards}-{forwards}"
+
+
+def symmetric_weights(weights: dict[str, float]) -> bool:
+    return weights["LB"] == weights["RB"] and weights["LF"] == weights["RF"]
+
+
+ORDER_TERMS = {}
+for (_code, _skill, _sector), _factor in contributions.contributions.items():
+    ORDER_TERMS.setdefault(_code, []).append(
+        (_skill, SECTORS.index(_sector), _factor * ratings.get_sector_factor(_sector)))
+
+
+def contribution_vector(skills: dict[str, float], code: str, factor: float) -> tuple[float, ...]:
+    """Per-sector linear contribution (before the team's **1.2) of one player in one order."""
+    vector = [0.] * len(SECTORS)
+    for skill, sector, weight in ORDER_TERMS.get(code, ()):
+        vector[sector] += (skills[skill] - 1.) * weight * factor
+    return tuple(vector)
+
+
+def sector_rating(total: float) -> float:
+    # a negative sum (skills below 1) would make **1.2 complex; it rates as zero
+    return max(total, 0.) ** 1.2
+
+
+def objective(sums, weights) -> float:
+    """Weighted team rating of per-sector linear sums, as in ratings.calculate_team_ratings."""
+    return sum(weight * (sector_rating(total) / 4. + 1.) for weight, total in zip(weights, sums))
+
+
+def chord_gap(low: float, high: float) -> float:
+    """Largest distance from the chord of sector_rating over [low, high] down to the curve."""
+    low, high = max(low, 0.), max(high, 0.)
+    if high - low <= EPSILON:
+        return 0.
+    slope = (sector_rating(high) - sector_rating(low)) / (high - low)
+    touch = (slope / 1.2) ** 5.
+    return sector_rating(low) + slope * (touch - low) - sector_rating(touch)
+
+
+def assign(values: list[list[float]]) -> tuple[float, list[int]]:
+    """Maximum-value assignment of every row to a distinct column (rows <= columns).
+
+    Hungarian method with potentials, O(rows^2 * columns); returns (total, column of each row).
+    """
+    rows, columns = len(values), len(values[0])
+    inf = float("inf")
+    u = [0.] * (rows + 1)
+    v = [0.] * (columns + 1)
+    owner = [0] * (columns + 1)  # row (1-based) assigned to each column, 0 if none
+    way = [0] * (columns + 1)
+    for row in range(1, rows + 1):
+        owner[0] = row
+        column = 0
+        slack = [inf] * (columns + 1)
+        done = [False] * (columns + 1)
+        while True:
+            done[column] = True
+            current = owner[column]
+            delta = inf
+            next_column = 0
+            costs = values[current - 1]
+            base = u[current]
+            for j in range(1, columns + 1):
+                if not done[j]:
+                    reduced = -costs[j - 1] - base - v[j]
+                    if reduced < slack[j]:
+                        slack[j] = reduced
+                        way[j] = column
+                    if slack[j] < delta:
+                        delta = slack[j]
+                        next_column = j
+            for j in range(columns + 1):
+                if done[j]:
+                    u[owner[j]] += delta
+                    v[j] -= delta
+                else:
+                    slack[j] -= delta
+            column = next_column
+            if owner[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            owner[column] = owner[previous]
+            column = previous
+    chosen = [0] * rows
+    for j in range(1, columns + 1):
+        if owner[j]:
+            chosen[owner[j] - 1] = j - 1
+    return sum(values[row][chosen[row]] for row in range(rows)), chosen
+
+
+class FormationSearch:
+    """Branch and bound over boxes of sector sums for one formation."""
+
+    def __init__(self, squad: list[dict], formation: tuple[str, ...], weights: dict[str, float]):
+        self.squad = squad
+        self.weights = [weights[sector] for sector in SECTORS]
+        overcrowding = ratings.count_overcrowding(formation)
+        self.slots = list(formation)
+        # a formation that is its own mirror image, under weights that do not tell the sides apart
+        self.mirrored = (symmetric_weights(weights)
+                         and mirror_formation(formation) == tuple(sorted(formation)))
+        # options[slot index][player] = [(vector, order code), ...] without dominated orders
+        self.options = []
+        for slot in self.slots:
+            factor = ratings.get_overcowding_factor(slot, overcrowding)
+            per_player = []
+            for skills in squad:
+                vectors = [(contribution_vector(skills, code, factor), code)
+                           for code in SLOT_ORDERS[slot]]
+                per_player.append([
+                    (vector, code) for vector, code in vectors
+                    if not any(other != vector and all(map(float.__ge__, other, vector))
+                               or (other == vector and other_code < code)
+                               for other, other_code in vectors)])
+            self.options.append(per_player)
+        self.drop_dominated()
+        # players left with an option in some slot are the assignment's columns
+        self.players = [player for player in range(len(squad))
+                        if any(per_player[player] for per_player in self.options)]
+        # per slot, every option as (column, vector, order code)
+        self.flat_options = [[(column, vector, code)
+                              for column, player in enumerate(self.players)
+                              for vector, code in per_player[player]]
+                             for per_player in self.options]
+        self.boxes = 0
+        self.rated = {}
+        self.best = float("-inf")
+        self.best_lineup = None
+
+    def drop_dominated(self) -> None:
+        """Drop every slot option that at least as many other players as there are slots beat.
+
+        A lineup using such an option leaves one of those players on the bench,
+        and swapping that player in rates at least as high. Equal options are
+        ordered by player and order so the swaps cannot cycle.
+        """
+        for per_player in self.options:
+            # only an option with at least the same total can beat another
+            entries = sorted(((sum(vector), vector, player, code)
+                              for player, options in enumerate(per_player)
+                              for vector, code in options), reverse=True)
+            for player, options in enumerate(per_player):
+                kept = []
+                for vector, code in options:
+                    total = sum(vector)
+                    beaten_by = set()
+                    for other_total, other_vector, other, other_code in entries:
+                        if other_total < total or len(beaten_by) >= len(self.slots):
+                            break
+                        if (other != player and all(map(float.__ge__, other_vector, vector))
+                                and (other_vector != vector or (other, other_code) < (player, code))):
+                            beaten_by.add(other)
+                    if len(beaten_by) < len(self.slots):
+                        kept.append((vector, code))
+                options[:] = kept
+
+    def lineup_key(self, lineup: list[tuple]) -> tuple:
+        """The lineup as sorted (slot, player, order), the same for it and its mirror image."""
+        key = tuple(sorted((self.slots[slot], player, code) for slot, player, code, _ in lineup))
+        if self.mirrored:
+            key = min(key, tuple(sorted((mirror(slot), player, mirror(code))
+                                        for slot, player, code in key)))
+        return key
+
+    def evaluate(self, lineup: list[tuple]) -> None:
+        """Rate a complete lineup [(slot, player, code, vector), ...] and keep it if it is the best."""
+        key = self.lineup_key(lineup)
+        if key in self.rated:
+            return
+        sums = [sum(entry[3][s] for entry in lineup) for s in range(len(SECTORS))]
+        value = self.rated[key] = objective(sums, self.weights)
+        if value > self.best + EPSILON:
+            self.best = value
+            self.best_lineup = sorted((slot, player, code) for slot, player, code, _ in lineup)
+
+    def linear_lineup(self, prices: list[float]):
+        """Best assignment of players to slots under per-sector prices.
+
+        Returns (linear value, [(slot, player, code, vector) per slot]).
+        """
+        columns = len(self.players)
+        values = []
+        choices = []
+        for options in self.flat_options:
+            row = [UNAVAILABLE] * columns
+            choice = [None] * columns
+            for option in options:
+                value = sum(map(float.__mul__, prices, option[1]))
+                if value > row[option[0]]:
+                    row[option[0]] = value
+                    choice[option[0]] = option
+            values.append(row)
+            choices.append(choice)
+        total, assigned = assign(values)
+        lineup = []
+        for slot, column in enumerate(assigned):
+            _, vector, code = choices[slot][column]
+            lineup.append((slot, self.players[column], code, vector))
+        return total, lineup
+
+    def gradient_lineup(self) -> None:
+        """Fixed-point start: re-solve the assignment under the current gradients until stable."""
+        prices = [float(weight) for weight in self.weights]
+        seen = set()
+        for _ in range(20):
+            _, lineup = self.linear_lineup(prices)
+            self.evaluate(lineup)
+            key = tuple(entry[1:3] for entry in lineup)
+            if key in seen:
+                break
+            seen.add(key)
+            sums = [sum(entry[3][s] for entry in lineup) for s in range(len(SECTORS))]
+            prices = [weight * 1.2 * max(total, EPSILON) ** 0.2 / 4.
+                      for weight, total in zip(self.weights, sums)]
+
+    def sector_range(self) -> tuple[list[float], list[float]]:
+        """Lowest and highest sum each sector can reach, from every slot's best and worst option."""
+        low = [0.] * len(SECTORS)
+        high = [0.] * len(SECTORS)
+        for options in self.flat_options:
+            for s in range(len(SECTORS)):
+                low[s] += min(option[1][s] for option in options)
+                high[s] += max(option[1][s] for option in options)
+        return low, high
+
+    def bound(self, low: list[float], high: list[float],
+              multipliers: list[float]) -> tuple[float, list[float]]:
+        """Upper bound of every lineup whose sector sums lie in the box [low, high].
+
+        The chords make the objective linear; the box constraint is relaxed
+        into the prices and tightened by a few subgradient steps from the given
+        multipliers. Returns the bound and the multipliers that gave it.
+        """
+        chord = []
+        constant = 0.
+        for weight, a, b in zip(self.weights, low, high):
+            if b - a > EPSILON:
+                slope = (sector_rating(b) - sector_rating(a)) / (b - a)
+            else:
+                slope = 1.2 * max(b, EPSILON) ** 0.2
+            chord.append(weight * slope / 4.)
+            constant += weight * ((sector_rating(a) - slope * a) / 4. + 1.)
+        best_bound = float("inf")
+        best_multipliers = multipliers
+        for _ in range(SUBGRADIENT_STEPS):
+            linear, lineup = self.linear_lineup(list(map(float.__add__, chord, multipliers)))
+            self.evaluate(lineup)
+            penalty = sum(max(-m, 0.) * b - max(m, 0.) * a
+                          for m, a, b in zip(multipliers, low, high))
+            value = constant + linear + penalty
+            if value < best_bound:
+                best_bound, best_multipliers = value, multipliers
+            if best_bound <= self.best + EPSILON:
+                break
+            sums = [sum(entry[3][s] for entry in lineup) for s in range(len(SECTORS))]
+            gradient = [total - (b if m < 0 or (m == 0 and total > b) else
+                                 a if m > 0 or total < a else total)
+                        for total, m, a, b in zip(sums, multipliers, low, high)]
+            norm = sum(g * g for g in gradient)
+            if norm < EPSILON:
+                break
+            # Polyak step towards the best lineup's rating
+            step = (value - self.best) / norm
+            multipliers = [m - step * g for m, g in zip(multipliers, gradient)]
+        return best_bound, best_multipliers
+
+    def run(self, floor: float = float("-inf")) -> tuple[float, list | None]:
+        """Best (objective, [(slot, player, order), ...]) above floor; (floor, None) if none is."""
+        self.best = floor
+        self.best_lineup = None
+        self.gradient_lineup()
+        lb, rb = SECTORS.index("LB"), SECTORS.index("RB")
+        boxes = [(*self.sector_range(), [0.] * len(SECTORS))]
+        while boxes:
+            low, high, multipliers = boxes.pop()
+            # the mirror image of a lineup with LB > RB lies in a box that is searched
+            if self.mirrored and low[lb] > high[rb]:
+                continue
+            self.boxes += 1
+            # no lineup in the box rates above its top corner
+            if objective(high, self.weights) <= self.best + EPSILON:
+                continue
+            bound, multipliers = self.bound(low, high, multipliers)
+            if bound <= self.best + EPSILON:
+                continue
+            s = max(range(len(SECTORS)),
+                    key=lambda s: self.weights[s] * chord_gap(low[s], high[s]))
+            middle = (low[s] + high[s]) / 2.
+            # both halves start from the multipliers that bounded their parent best
+            boxes.append((low, high[:s] + [middle] + high[s + 1:], multipliers))
+            boxes.append((low[:s] + [middle] + low[s + 1:], high, multipliers))
+        if self.best_lineup is None:
+            return floor, None
+        return self.best, [(self.slots[slot], player, code)
+                           for slot, player, code in self.best_lineup]
+
+
+def search_formation(squad: list[dict], formation: tuple[str, ...], weights: dict[str, float],
+                     floor: float) -> tuple[float, list | None, int]:
+    search = FormationSearch(squad, formation, weights)
+    value, lineup = search.run(floor)
+    return value, lineup, search.boxes
+
+
+def best_lineup(squad: list[dict], weights: dict[str, float], workers: int = 1,
+                formations: list[tuple[str, ...]] | None = None) -> dict:
+    """The best lineup of a squad (list of skill dicts) over the given formations (default: all).
+
+    Returns objective, formation label, lineup [(slot, player index, order code)]
+    in the game's slot order, and the number of formations searched and
+    sector boxes visited.
+    """
+    if any(value < 0 for value in weights.values()):
+        raise ValueError("sector weights must not be negative")
+    if len(squad) < 11:
+        raise ValueError(f"a lineup needs 11 players, the squad has {len(squad)}")
+    if formations is None:
+        formations = enumerate_formations()
+    if symmetric_weights(weights):
+        formations = list(dict.fromkeys(
+            min(tuple(sorted(formation)), mirror_formation(formation)) for formation in formations))
+
+    # a cheap first lineup over every formation lets the exact searches prune from the start
+    best, best_formation, best_lineup_found = float("-inf"), None, None
+    starts = []
+    for formation in formations:
+        search = FormationSearch(squad, formation, weights)
+        search.gradient_lineup()
+        starts.append(search.best)
+        if search.best > best:
+            best, best_formation = search.best, formation
+            best_lineup_found = [(search.slots[slot], player, code)
+                                 for slot, player, code in search.best_lineup]
+    # most promising first, so a single worker raises its floor early
+    formations = [formation for _, formation in sorted(zip(starts, formations), reverse=True)]
+
+    boxes = 0
+    floor = best
+    if workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(search_formation, itertools.repeat(squad), formations,
+                                        itertools.repeat(weights), itertools.repeat(floor)))
+    else:
+        results = []
+        for formation in formations:
+            results.append(search_formation(squad, formation, weights, floor))
+            floor = max(floor, results[-1][0])
+    for formation, (value, lineup, visited) in zip(formations, results):
+        boxes += visited
+        if lineup is not None and value > best:
+            best, best_formation, best_lineup_found = value, formation, lineup
+    return {
+        "objective": best,
+        "formation": formation_label(best_formation),
+        "lineup": sorted(best_lineup_found, key=lambda entry: SLOT_DISPLAY_ORDER.index(entry[0])),
+        "formations": len(formations),
+        "boxes": boxes,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Search every formation and order for the squad's best weighted team rating.")
+    parser.add_argument("csv_file", help="semicolon-separated player export")
+    parser.add_argument("--weights", default=None,
+                        help="sector weight overrides, e.g. MB=1.2,M=3 (default 1.0 each)")
+    parser.add_argument("--formation", default=None,
+                        help="only search formations with this shape, e.g. 4-4-2")
+    parser.add_argument("--workers", type=int, default=1, help="processes to spread formations over")
+    args = parser.parse_args(argv)
+
+    try:
+        weights = rank_players.parse_weights(args.weights)
+    except ValueError as exc:
+        parser.error(str(exc))
+    players, warnings = rank_players.parse_players(args.csv_file)
+    for warning in warnings:
+        print(f"warning: {warning}", file=sys.stderr)
+    formations = enumerate_formations()
+    if args.formation:
+        formations = [f for f in formations if formation_label(f) == args.formation.strip()]
+        if not formations:
+            parser.error(f"no formation {args.formation!r}")
+    try:
+        result = best_lineup([player["skills"] for player in players], weights,
+                             workers=args.workers, formations=formations)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    print(f"formation {result['formation']}  objective {result['objective']:.3f}")
+    team = {}
+    for slot, player, code in result["lineup"]:
+        print(f"  {slot:<4} {code:<6} {players[player]['name']}")
+        team[code] = players[player]["skills"]
+    team_ratings = ratings.calculate_team_ratings(team)
+    print("  " + "  ".join(f"{sector} {team_ratings[sector]:.2f}" for sector in SECTORS))
+    print(f"\nsearched {result['formations']} formations, {result['boxes']} boxes", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Marginal value of one more skill point for every player and order.
+
+rank_players.order_total adds, for each (skill, sector) term of an order,
+weight * ((level - 1) * form * factor)**1.2 and divides by 4, where factor is
+the positional times the sector factor. Its derivative with respect to a
+skill's level is therefore
+
+    1.2 / 4 * form**1.2 * (level - 1)**0.2 * sum(weight * factor**1.2)
+
+summed over that skill's sectors. The sum depends only on the order and the
+weights, so it is computed once per (order, skill) and the report applies it
+column by column over a PlayerTable. Experience does not depend on skills and
+drops out; levels at or below 1 contribute nothing and have zero marginal value.
+"""
+
+import argparse
+import array
+import csv
+import sys
+
+import contributions
+import rank_players
+import ratings
+
+SKILLS = list(rank_players.SKILL_COLUMNS.values())
+
+
+def marginal_coefficients(order_code: str, weights: dict[str, float]) -> dict[str, float]:
+    """{skill: 1.2 / 4 * sum of weight * factor**1.2 over the skill's sectors} for an order."""
+    coefficients = {skill: 0.0 for skill in SKILLS}
+    for (skill, sector) in rank_players.order_terms(order_code):
+        factor = (contributions.contributions[(order_code, skill, sector)]
+                  * ratings.get_sector_factor(sector))
+        coefficients[skill] += weights[sector] * factor ** 1.2
+    return {skill: 1.2 / 4.0 * value for skill, value in coefficients.items()}
+
+
+def order_marginals(skills: dict[str, float], form_mult: float, order_code: str,
+                    weights: dict[str, float]) -> dict[str, float]:
+    """d order_total / d level for each of the seven skills of one player."""
+    form_term = form_mult ** 1.2
+    return {skill: coefficient * form_term * (skills[skill] - 1.0) ** 0.2
+            if coefficient and skills[skill] > 1.0 else 0.0
+            for skill, coefficient in marginal_coefficients(order_code, weights).items()}
+
+
+def column_marginals(table: rank_players.PlayerTable, form_mults, order_code: str,
+                     weights: dict[str, float]) -> dict[str, array.array]:
+    """order_marginals for every row of the table: {skill: array of per-row values}."""
+    form_terms = [form_mult ** 1.2 for form_mult in form_mults]
+    marginals = {}
+    for skill, coefficient in marginal_coefficients(order_code, weights).items():
+        if not coefficient:
+            marginals[skill] = array.array("d", bytes(8 * len(table)))
+            continue
+        marginals[skill] = array.array("d", (
+            coefficient * form_term * (level - 1.0) ** 0.2 if level > 1.0 else 0.0
+            for level, form_term in zip(table.skills[skill], form_terms)))
+    return marginals
+
+
+def marginal_report(table: rank_players.PlayerTable, position: str, weights: dict[str, float],
+                    use_form: bool = True, orders: list[str] | None = None):
+    """Rank the table and compute every order's marginals.
+
+    Returns (ranking, marginals) where ranking is rank_players.rank_table's
+    TableRanking and marginals maps each order label to column_marginals.
+    """
+    ranking = rank_players.rank_table(table, position, weights, use_form=use_form, orders=orders)
+    form_mults = array.array("d", (rank_players.form_multiplier(form) if use_form else 1.0
+                                   for form in table.form))
+    codes = rank_players.POSITION_ORDERS[position]
+    marginals = {label: column_marginals(table, form_mults, codes[label], weights)
+                 for label in ranking.order_labels}
+    return ranking, marginals
+
+
+def iter_report_rows(ranking, marginals: dict[str, dict[str, array.array]],
+                     all_orders: bool = False):
+    """Yield (rank, player, order, total, *marginals, best skill) best player first.
+
+    Only each player's best order is listed unless all_orders is set.
+    """
+    for rank, row in enumerate(ranking.rows, start=1):
+        name = ranking.table.name(row)
+        best = ranking.order_labels[ranking.best[row]]
+        for label in ranking.order_labels if all_orders else [best]:
+            values = [marginals[label][skill][row] for skill in SKILLS]
+            best_skill = max(SKILLS, key=lambda skill: marginals[label][skill][row])
+            yield (rank, name, label, ranking.totals[label][row], *values,
+                   best_skill if marginals[label][best_skill][row] > 0 else "")
+
+
+REPORT_HEADERS = ["Rank", "Player", "Order", "Total"] + SKILLS + ["Best skill"]
+
+
+def format_report(rows) -> str:
+    cells = [[str(rank), name, label, f"{total:.3f}", *(f"{value:.4f}" for value in values),
+              best_skill]
+             for rank, name, label, total, *values, best_skill in rows]
+    widths = [max(len(header), *(len(row[i]) for row in cells)) if cells else len(header)
+              for i, header in enumerate(REPORT_HEADERS)]
+    lines = [
+        "  ".join(header.ljust(widths[i]) for i, header in enumerate(REPORT_HEADERS)),
+        "  ".join("-" * width for width in widths),
+    ]
+    for row in cells:
+        lines.append("  ".join(cell.ljust(widths[i]) for i, cell in enumerate(row)))
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Report the rating value of one more point in each skill, per player and order.")
+    parser.add_argument("csv_file", help="semicolon-separated player export")
+    parser.add_argument("position", help="position whose orders are evaluated, e.g. wingback")
+    parser.add_argument("--weights", default=None, help="sector weight overrides, e.g. MB=1.2,M=3")
+    parser.add_argument("--orders", default=None,
+                        help="comma-separated orders to consider (default: all orders of the position)")
+    parser.add_argument("--all-orders", action="store_true",
+                        help="one line per player and order instead of the best order only")
+    parser.add_argument("--ignore-form", action="store_true",
+                        help="treat every player as being at maximum form")
+    parser.add_argument("--out", default=None, help="write the report to this CSV file instead")
+    args = parser.parse_args(argv)
+
+    order_labels = None
+    if args.orders:
+        order_labels = [label.strip().lower() for label in args.orders.split(",")]
+    try:
+        position = rank_players.normalize_position(args.position)
+        weights = rank_players.parse_weights(args.weights)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    table, warnings = rank_players.parse_player_table(args.csv_file)
+    for warning in warnings:
+        print(f"warning: {warning}", file=sys.stderr)
+    try:
+        ranking, marginals = marginal_report(table, position, weights,
+                                             use_form=not args.ignore_form, orders=order_labels)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    rows = iter_report_rows(ranking, marginals, all_orders=args.all_orders)
+    if args.out:
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(REPORT_HEADERS)
+            writer.writerows(rows)
+        print(f"wrote {args.out}", file=sys.stderr)
+    else:
+        print(format_report(rows))
+
+
+if __name__ == "__main__":
+    main()
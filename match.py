@@ -0,0 +1,184 @@
+"""Predict match results from two teams' sector ratings.
+
+The match is a fixed number of chance events:
+
+1. Midfield decides who gets each chance. A team's share is
+   M^3 / (M_home^3 + M_away^3).
+2. The chance goes down the left, the centre or the right (25/50/25).
+3. It is scored with probability 0.6 * A^3.5 / (A^3.5 + D^3.5). A is the
+   attack sector used and D is the opposing defence sector facing it. Evenly
+   matched sides therefore score about three goals between them.
+
+Every event is independent, so the scoreline follows a trinomial
+distribution. score_distribution computes it exactly, and that is what an
+optimizer should use as its objective.
+
+simulate draws seeded Monte Carlo samples from the same model. Each stream
+draws whole scorelines by inverse CDF over the exact distribution: one
+draw per match, with the same result as playing out every event. Streams
+are split into fixed chunks and each chunk has its own seed. The samples
+therefore depend only on the seed and the match count, not on how many
+worker processes run them.
+"""
+
+import argparse
+import bisect
+import collections
+import concurrent.futures
+import itertools
+import json
+import math
+import random
+
+import ratings
+
+EVENTS = 10
+POSSESSION_EXPONENT = 3.
+CONVERSION_EXPONENT = 3.5
+MAX_CONVERSION = 0.6
+# attack sector, the opposing defence sector it runs into, share of chances
+ATTACKS = (("LF", "RB", 0.25), ("MF", "MB", 0.5), ("RF", "LB", 0.25))
+SECTORS = ("LB", "MB", "RB", "M", "LF", "MF", "RF")
+CHUNK_MATCHES = 100_000
+
+
+def ratio(a: float, b: float, exponent: float) -> float:
+    a, b = a ** exponent, b ** exponent
+    return a / (a + b)
+
+
+def goal_probabilities(home: dict[str, float], away: dict[str, float]) -> tuple[float, float]:
+    """Chance per event that the home side scores, and that the away side does."""
+    possession = ratio(home["M"], away["M"], POSSESSION_EXPONENT)
+    home_goal = possession * MAX_CONVERSION * sum(
+        share * ratio(home[attack], away[defence], CONVERSION_EXPONENT)
+        for attack, defence, share in ATTACKS)
+    away_goal = (1 - possession) * MAX_CONVERSION * sum(
+        share * ratio(away[attack], home[defence], CONVERSION_EXPONENT)
+        for attack, defence, share in ATTACKS)
+    return home_goal, away_goal
+
+
+def score_distribution(home: dict[str, float], away: dict[str, float],
+                       events: int = EVENTS) -> dict[tuple[int, int], float]:
+    """Exact probability of every (home goals, away goals) scoreline."""
+    p_home, p_away = goal_probabilities(home, away)
+    p_none = 1 - p_home - p_away
+    distribution = {}
+    for home_goals in range(events + 1):
+        for away_goals in range(events + 1 - home_goals):
+            quiet = events - home_goals - away_goals
+            ways = math.comb(events, home_goals) * math.comb(events - home_goals, away_goals)
+            distribution[(home_goals, away_goals)] = (
+                ways * p_home ** home_goals * p_away ** away_goals * p_none ** quiet)
+    return distribution
+
+
+def summarize(scores: dict[tuple[int, int], float]) -> dict:
+    """Win/draw/loss probabilities and expected goals from scoreline weights (probabilities or counts)."""
+    total = sum(scores.values())
+    summary = {"win": 0., "draw": 0., "loss": 0., "home_goals": 0., "away_goals": 0.}
+    for (home_goals, away_goals), weight in scores.items():
+        share = weight / total
+        if home_goals > away_goals:
+            summary["win"] += share
+        elif home_goals == away_goals:
+            summary["draw"] += share
+        else:
+            summary["loss"] += share
+        summary["home_goals"] += share * home_goals
+        summary["away_goals"] += share * away_goals
+    return summary
+
+
+def predict(home: dict[str, float], away: dict[str, float], events: int = EVENTS) -> dict:
+    """Exact win/draw/loss probabilities and expected goals for the home side."""
+    return summarize(score_distribution(home, away, events))
+
+
+def simulate_chunk(home: dict[str, float], away: dict[str, float], matches: int, seed: str,
+                   events: int = EVENTS) -> collections.Counter:
+    """Scoreline counts of one seeded stream of matches."""
+    distribution = score_distribution(home, away, events)
+    outcomes = list(distribution)
+    cumulative = list(itertools.accumulate(distribution.values()))
+    rng = random.Random(seed)
+    top = cumulative[-1]
+    last = len(outcomes) - 1
+    counts = collections.Counter(
+        min(bisect.bisect(cumulative, rng.random() * top), last) for _ in range(matches))
+    return collections.Counter({outcomes[index]: count for index, count in counts.items()})
+
+
+def simulate(home: dict[str, float], away: dict[str, float], matches: int, seed: int = 0,
+             workers: int = 1, events: int = EVENTS) -> dict:
+    """Monte Carlo estimate of predict(); also returns the sampled scoreline counts."""
+    chunks = [(start // CHUNK_MATCHES, min(CHUNK_MATCHES, matches - start))
+              for start in range(0, matches, CHUNK_MATCHES)]
+    args = [(home, away, size, f"{seed}/{index}", events) for index, size in chunks]
+    scores = collections.Counter()
+    if workers > 1 and len(chunks) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            for counts in executor.map(simulate_chunk, *zip(*args)):
+                scores.update(counts)
+    else:
+        for chunk in args:
+            scores.update(simulate_chunk(*chunk))
+    summary = summarize(scores) if scores else {}
+    summary["matches"] = matches
+    summary["scores"] = scores
+    return summary
+
+
+def team_ratings(spec: str) -> dict[str, float]:
+    """Sector ratings from "M=8.5,LB=6,..." text or a JSON lineup file ({position: skills})."""
+    if "=" in spec:
+        values = {}
+        for part in spec.split(","):
+            sector, _, value = part.partition("=")
+            sector = sector.strip().upper()
+            if sector not in SECTORS:
+                raise ValueError(f"unknown sector {sector!r}; valid sectors: {', '.join(SECTORS)}")
+            values[sector] = float(value)
+        missing = [sector for sector in SECTORS if sector not in values]
+        if missing:
+            raise ValueError(f"missing sector ratings: {', '.join(missing)}")
+        return values
+    with open(spec, encoding="utf-8") as f:
+        return ratings.calculate_team_ratings(json.load(f))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Predict a match from two teams' sector ratings.")
+    parser.add_argument("home", help="sector ratings (LB=..,MB=..,RB=..,M=..,LF=..,MF=..,RF=..) "
+                                     "or a JSON lineup file mapping positions to skills")
+    parser.add_argument("away", help="the other team, in the same form")
+    parser.add_argument("--matches", type=int, default=0,
+                        help="also simulate this many matches (default: exact prediction only)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the simulation")
+    parser.add_argument("--workers", type=int, default=1, help="processes for the simulation")
+    parser.add_argument("--scores", type=int, default=5, help="most likely scorelines to list")
+    args = parser.parse_args(argv)
+
+    try:
+        home, away = team_ratings(args.home), team_ratings(args.away)
+    except (OSError, ValueError) as exc:
+        parser.error(str(exc))
+
+    distribution = score_distribution(home, away)
+    exact = summarize(distribution)
+    print(f"exact:     win {exact['win']:.4f}  draw {exact['draw']:.4f}  loss {exact['loss']:.4f}  "
+          f"goals {exact['home_goals']:.2f}-{exact['away_goals']:.2f}")
+    if args.matches > 0:
+        sampled = simulate(home, away, args.matches, args.seed, args.workers)
+        print(f"simulated: win {sampled['win']:.4f}  draw {sampled['draw']:.4f}  "
+              f"loss {sampled['loss']:.4f}  goals {sampled['home_goals']:.2f}-"
+              f"{sampled['away_goals']:.2f}  ({args.matches} matches, seed {args.seed})")
+    for (home_goals, away_goals), probability in sorted(
+            distribution.items(), key=lambda item: item[1], reverse=True)[:args.scores]:
+        print(f"  {home_goals}-{away_goals}  {probability:.4f}")
+
+
+if __name__ == "__main__":
+    main()
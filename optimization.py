@@ -2,11 +2,117 @@ from age import Age
 import training
 import contributions
 import ratings
-import logging
+import log
+import array
+import bisect
+import concurrent.futures
 import copy
+import functools
+import heapq
+import sys
+import time
 from pprint import pprint
 
-rating_cache = {}
+SKILLS = ("Goalkeeping", "Defending", "Playmaking", "Passing", "Scoring", "Winger", "Set Pieces")
+SECTORS = ("LB", "MB", "RB", "M", "LF", "MF", "RF")
+
+# shards of the training cache; more shards mean less contention between threads
+TRAINING_CACHE_SHARDS = 16
+# entries the training cache holds at most, spread evenly over its shards
+TRAINING_CACHE_SIZE = 1 << 18
+
+class TrainingCache:
+    """
+    Memoized default-coaching training effects, keyed on (age in days, level, skill).
+
+    Safe to share between threads, including on free-threaded Python: the key
+    picks one of several dicts, reads are a single dict.get and a miss is
+    stored with setdefault, so there is no check-then-set window. Two threads
+    missing the same key both compute it, get the same value and keep the
+    first one stored. Sharding spreads the dicts' internal locks so threads
+    rarely wait on each other.
+
+    Each shard holds at most max_entries / shards effects (no limit when
+    max_entries is None); a miss on a full shard empties it first, which keeps
+    a long-lived process's memory flat at the cost of recomputing what it held.
+    misses counts computed effects, for hit rates.
+    """
+
+    def __init__(self, shards: int = TRAINING_CACHE_SHARDS, max_entries: int | None = TRAINING_CACHE_SIZE):
+        if shards < 1:
+            raise ValueError("a training cache needs at least one shard")
+        if max_entries is not None and max_entries < shards:
+            raise ValueError("a training cache needs room for at least one entry per shard")
+        self.shards = tuple({} for _ in range(shards))
+        self.shard_size = None if max_entries is None else max_entries // shards
+        self.misses = 0
+
+    def get(self, age, level, skill):
+        key = (age.to_days(), level, skill)
+        shard = self.shards[hash(key) % len(self.shards)]
+        effect = shard.get(key)
+        if effect is None:
+            if self.shard_size is not None and len(shard) >= self.shard_size:
+                shard.clear()
+            effect = shard.setdefault(key, training.calculate_training(age=age, level=level, training=skill))
+            self.misses += 1
+        return effect
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def clear(self):
+        for shard in self.shards:
+            shard.clear()
+
+# shared by every run and thread in the process
+training_cache = TrainingCache()
+
+# A term's sector rating contribution at form 1 is
+# ((level - 1) * positional factor * sector factor)**1.2, i.e. a fixed
+# coefficient (factors**1.2) times (level - 1)**1.2. The coefficients of every
+# (position, skill, sector) term are computed once into a dense array indexed
+# through TERM_INDEX; it never grows and, being built at import, is shared
+# read-only by forked worker processes. Evaluating a contribution is an array
+# read and one power, exact up to floating-point rounding.
+CONTRIBUTION_TERMS = tuple(contributions.contributions)
+TERM_INDEX = {term: i for i, term in enumerate(CONTRIBUTION_TERMS)}
+TERM_COEFFICIENTS = array.array("d", (
+    (value * ratings.get_sector_factor(sector)) ** 1.2
+    for (_, _, sector), value in contributions.contributions.items()))
+
+class RunControl:
+    """
+    Budget, progress reporting and cancellation for one optimizer run.
+
+    time_budget is wall-clock seconds and max_weeks the number of simulated
+    training weeks the run may use. progress(week, objective) is called after
+    every simulated week. cancel is any object with an is_set() method, e.g. a
+    threading.Event or multiprocessing.Event set from another thread or process.
+    """
+
+    def __init__(self, time_budget=None, max_weeks=None, progress=None, cancel=None):
+        self.deadline = None if time_budget is None else time.monotonic() + time_budget
+        self.max_weeks = max_weeks
+        self.progress = progress
+        self.cancel = cancel
+
+    def stop_reason(self, weeks):
+        """Why the run must stop before simulating another week, or None to go on."""
+        if self.cancel is not None and self.cancel.is_set():
+            return "cancelled"
+        if self.max_weeks is not None and weeks >= self.max_weeks:
+            return "week budget"
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return "time budget"
+        return None
+
+    def report(self, week, objective):
+        if self.progress is not None:
+            self.progress(week, objective)
+
+# stop reasons that leave a plan short of its target
+PARTIAL_REASONS = ("cancelled", "week budget", "time budget")
 
 def calculate_optimal_skills(starting_age: Age, target_age: Age, starting_skills: dict, position: str, sector_weights: dict, min_target_skills: dict = None, max_skills: dict = None):
     """
@@ -36,94 +142,696 @@ def calculate_optimal_skills(starting_age: Age, target_age: Age, starting_skills
     dict
         A dictionary of number of training sessions per skill.
     """
+    plan = optimize_plan(starting_age, target_age, starting_skills, position, sector_weights,
+                         min_target_skills, max_skills)
+    return plan["skills"], plan["sessions"]
+
+def optimize_plan(starting_age: Age, target_age: Age, starting_skills: dict, position: str, sector_weights: dict, min_target_skills: dict = None, max_skills: dict = None,
+                  time_budget: float = None, max_weeks: int = None, progress=None, cancel=None):
+    """
+    Greedy one-player training optimizer with run controls.
+
+    Takes the calculate_optimal_skills arguments plus the RunControl options.
+    Minimum skills are trained first, then each week the skill with the largest
+    weighted rating gain. A run stopped by its budget or cancelled returns the
+    plan built so far, flagged as partial.
+
+    Returns
+    -------
+    dict
+        "skills" and "sessions" as in calculate_optimal_skills, "schedule" (skill
+        trained each week, in order), "effects" (level gained each week), "weeks",
+        "rating" (weighted rating reached), "partial" and "stop_reason" (one of
+        "target age", "no gain", "min skill unreachable", "time budget",
+        "week budget", "cancelled").
+    """
+    control = RunControl(time_budget, max_weeks, progress, cancel)
+    plan = train_greedily(control, starting_age, target_age, starting_skills,
+                          position_terms(position, sector_weights),
+                          weighted_rating(starting_skills, position, sector_weights), min_target_skills, max_skills)
+    return {
+        **{key: plan[key] for key in ("skills", "sessions", "schedule", "effects", "weeks")},
+        "rating": weighted_rating(plan["skills"], position, sector_weights),
+        "partial": plan["partial"],
+        "stop_reason": plan["stop_reason"],
+        # inputs, so the plan can be replayed and replanned (see replan)
+        "starting_age": [starting_age.years, starting_age.days],
+        "target_age": [target_age.years, target_age.days],
+        "start_week": 0,
+        "starting_skills": dict(starting_skills),
+        "position": position,
+        "sector_weights": dict(sector_weights),
+        "min_skills": min_target_skills,
+        "max_skills": max_skills,
+    }
+
+def plan_skills_at(plan, week):
+    """Skills an optimize_plan/replan result expects after its first `week` training weeks."""
+    if not plan["start_week"] <= week <= plan["weeks"]:
+        raise ValueError(f"week {week} is outside the plan (weeks {plan['start_week']}-{plan['weeks']})")
+    skills = dict(plan["starting_skills"])
+    for skill, effect in zip(plan["schedule"][plan["start_week"]:week], plan["effects"][plan["start_week"]:week]):
+        skills[skill] += effect
+    return skills
+
+def replan(plan, week, observed_skills, tolerance=1e-6, time_budget=None, max_weeks=None, progress=None, cancel=None):
+    """
+    Update a plan with the skills actually observed after `week` training weeks.
+
+    The first `week` weeks of the schedule are kept as history. When the observed
+    skills match the plan's expectation (within tolerance) on every skill that
+    steers it -- the skills the position is rated on and the minimum-skill
+    targets -- the rest of the plan still holds and is reused, with deviations in
+    the other skills carried through to the final skills. Otherwise only the
+    remaining weeks are re-optimized from the observed skills; the rating and
+    training caches keep the evaluations the original run already made.
+
+    Weeks count from the start of the original plan, so a replanned plan can be
+    replanned again. Takes the RunControl options for the re-optimized part.
+
+    Returns
+    -------
+    dict
+        An optimize_plan result covering the whole horizon, with
+        "starting_skills" set to the observed skills and "start_week" to `week`.
+    """
+    expected = plan_skills_at(plan, week)
+    steering = {skill for (skill, _) in relevant_contributions(plan["position"])} | set(plan["min_skills"] or {})
+    if not plan["partial"] and all(abs(observed_skills[skill] - expected[skill]) <= tolerance for skill in steering):
+        final_skills = {skill: level + observed_skills[skill] - expected[skill] for skill, level in plan["skills"].items()
+                        if skill not in steering}
+        return {**plan,
+                "skills": {**plan["skills"], **final_skills},
+                "start_week": week,
+                "starting_skills": dict(observed_skills)}
+
+    current_age = Age(*plan["starting_age"]).plus_days(7 * week)
+    tail = optimize_plan(current_age, Age(*plan["target_age"]), observed_skills, plan["position"],
+                         plan["sector_weights"], plan["min_skills"], plan["max_skills"],
+                         time_budget, max_weeks, progress, cancel)
+    schedule = plan["schedule"][:week] + tail["schedule"]
+    return {**tail,
+            "sessions": {skill: schedule.count(skill) for skill in observed_skills},
+            "schedule": schedule,
+            "effects": plan["effects"][:week] + tail["effects"],
+            "weeks": len(schedule),
+            "starting_age": plan["starting_age"],
+            "target_age": plan["target_age"],
+            "start_week": week}
+
+def position_terms(position, sector_weights):
+    """{skill: sector-weighted term coefficient} of one position; empty for a code with no terms."""
+    terms = {}
+    for skill, skill_terms in skill_coefficients(position).items():
+        weight = 0.
+        for sector, coefficient in skill_terms:
+            weight += sector_weights[sector] * coefficient
+        terms[skill] = weight
+    return terms
+
+def multi_target_terms(targets):
+    """
+    {skill: coefficient} merged over (position, sector_weights, importance) targets.
+
+    A skill's coefficient sums importance * sector weight * term coefficient
+    over every target term that rates it, so the combined gain of training it
+    is one coefficient times the change in (level - 1)**1.2, whatever the
+    number of targets.
+    """
+    terms = {}
+    for position, sector_weights, importance in targets:
+        if not relevant_contributions(position):
+            raise ValueError(f"unknown position code {position!r}")
+        for skill, weight in position_terms(position, sector_weights).items():
+            terms[skill] = terms.get(skill, 0.) + importance * weight
+    return terms
+
+def multi_rating_delta(skill, before, after, terms):
+    """Combined objective change from moving one skill from level before to level after."""
+    return terms.get(skill, 0.) * ((after - 1.) ** 1.2 - (before - 1.) ** 1.2)
+
+def train_greedily(control, starting_age, target_age, starting_skills, terms, objective,
+                   min_target_skills=None, max_skills=None):
+    """
+    The greedy loop shared by optimize_plan and optimize_multi_plan.
+
+    terms is a multi_target_terms coefficient table and objective the caller's
+    objective at the starting skills, reported to control as it grows. Minimum
+    skills are trained first, to completion even past the target age, as
+    calculate_optimal_skills always has; a minimum that training stops
+    raising ends the run as "min skill unreachable". Then each week trains the skill with the largest gain under terms, until
+    the target age, no skill gains, or control stops the run. Returns
+    "skills", "sessions", "schedule", "effects", "weeks", "partial" and
+    "stop_reason".
+    """
     final_skills = starting_skills.copy()
     training_sessions = {skill: 0 for skill in starting_skills.keys()}
     current_age = Age(starting_age.years, starting_age.days)
+    schedule = []
+    effects = []
+    stop_reason = None
+
+    def train(skill, training_effect, delta):
+        nonlocal objective, current_age
+        objective += delta
+        final_skills[skill] += training_effect
+        training_sessions[skill] += 1
+        schedule.append(skill)
+        effects.append(training_effect)
+        current_age = current_age.plus_days(7)
+        control.report(len(schedule), objective)
+
+    for skill, min_level in (min_target_skills or {}).items():
+        while stop_reason is None and final_skills[skill] < min_level:
+            stop_reason = control.stop_reason(len(schedule))
+            if stop_reason is not None:
+                break
+            training_effect = get_cached_training(current_age, final_skills[skill], skill)
+            if training_effect <= 0.:
+                stop_reason = "min skill unreachable"
+                break
+            train(skill, training_effect, multi_rating_delta(
+                skill, final_skills[skill], final_skills[skill] + training_effect, terms))
+
+    while stop_reason is None:
+        if current_age.to_days() >= target_age.to_days():
+            stop_reason = "target age"
+            break
+        stop_reason = control.stop_reason(len(schedule))
+        if stop_reason is not None:
+            break
 
-    current_age, training_sessions, final_skills = get_to_minimum_skills(
-            current_age, training_sessions, final_skills, min_target_skills)
-
-    position_contributions = relevant_contributions(position)
-
-    while current_age.to_days() < target_age.to_days():
-        best_skill, best_delta, training_effect = find_best_skill(
-            current_age, final_skills, sector_weights, position_contributions, position, max_skills)
+        best_skill = None
+        best_delta = 0.
+        best_effect = 0.
+        for skill in terms:
+            current_level = final_skills[skill]
+            training_effect = get_cached_training(current_age, current_level, skill)
+            new_level = current_level + training_effect
+            if max_skills is not None and skill in max_skills and new_level > max_skills[skill]:
+                continue
+            delta = multi_rating_delta(skill, current_level, new_level, terms)
+            if delta > best_delta:
+                best_skill, best_delta, best_effect = skill, delta, training_effect
 
         if best_skill is None:
+            stop_reason = "no gain"
             break
+        train(best_skill, best_effect, best_delta)
+
+    return {
+        "skills": final_skills,
+        "sessions": training_sessions,
+        "schedule": schedule,
+        "effects": effects,
+        "weeks": len(schedule),
+        "partial": stop_reason in PARTIAL_REASONS,
+        "stop_reason": stop_reason,
+    }
 
-        final_skills[best_skill] += training_effect
-        training_sessions[best_skill] += 1
-        current_age.add_days(7)
-        #logging.log(f"Age: {current_age.to_days()}, Trained: {best_skill}, Effect: {training_effect:.3f}, New Level: {final_skills[best_skill]:.3f}, Delta Rating: {best_delta:.3f}")
-
-    return final_skills, training_sessions
+def optimize_multi_plan(starting_age: Age, target_age: Age, starting_skills: dict, targets, min_target_skills: dict = None, max_skills: dict = None,
+                        time_budget: float = None, max_weeks: int = None, progress=None, cancel=None):
+    """
+    Greedy training optimizer toward several positions at once.
 
-def find_best_skill(current_age, current_skills, sector_weights, position_contributions, position, max_skills):
-    best_skill = None
-    best_delta = 0.
-    training_effect = 0.
+    targets is a list of (position, sector_weights, importance). The objective
+    is the importance-weighted sum of each target's weighted rating; each week
+    the training effect of every skill is computed once and its gain evaluated
+    against all targets with one coefficient (see multi_target_terms), so a run costs about
+    as much as an optimize_plan run. Minimum skills, budgets and cancellation
+    work as in optimize_plan.
 
-    relevant_skills = {skill for (skill, _) in position_contributions.keys()}
+    Returns
+    -------
+    dict
+        "skills", "sessions", "schedule", "effects", "weeks", "partial" and
+        "stop_reason" as in optimize_plan, "objective" (combined objective
+        reached) and "ratings" (each target's weighted rating, in target order).
+    """
+    control = RunControl(time_budget, max_weeks, progress, cancel)
+    terms = multi_target_terms(targets)
+    objective = sum(importance * weighted_rating(starting_skills, position, sector_weights)
+                    for position, sector_weights, importance in targets)
+    plan = train_greedily(control, starting_age, target_age, starting_skills, terms, objective,
+                          min_target_skills, max_skills)
+    target_ratings = [weighted_rating(plan["skills"], position, sector_weights)
+                      for position, sector_weights, _ in targets]
+    return {
+        **{key: plan[key] for key in ("skills", "sessions", "schedule", "effects", "weeks")},
+        "objective": sum(importance * rating for (_, _, importance), rating in zip(targets, target_ratings)),
+        "ratings": target_ratings,
+        "partial": plan["partial"],
+        "stop_reason": plan["stop_reason"],
+    }
 
-    for skill in relevant_skills:
-        current_level = current_skills[skill]
-        skill_training = training.calculate_training(
-            age=current_age,
-            level=current_level,
-            training=skill,
-            )
+# full skill snapshots are kept every this many weeks of a trajectory
+CHECKPOINT_WEEKS = 16
 
-        new_level = current_level + skill_training
-        if max_skills is not None and skill in max_skills and new_level > max_skills[skill]:
-            continue
-
-        delta_rating = 0.
-        for (s, sector), _ in position_contributions.items():
-            if s == skill:
-                before = get_cached_rating(current_level, skill, sector, position)
-                after = get_cached_rating(new_level, skill, sector, position)
-                delta_rating += sector_weights[sector] * (after - before)
-
-        #logging.log(f"Skill: {skill}, Current Level: {current_level:.3f}, Delta Rating: {delta_rating:.3f}")
-        if delta_rating > best_delta:
-            best_delta = delta_rating
-            best_skill = skill
-            training_effect = skill_training
-
-    return best_skill, best_delta, training_effect
-
-def get_cached_rating(skill_level, skill_type, sector, position):
-    """Return cached sector rating contribution if available, otherwise compute and store it."""
-    key = (round(skill_level, 3), skill_type, sector, position)
-    # rounding avoids cache bloat from floating-point quirks
-
-    if key not in rating_cache:
-        rating_cache[key] = ratings.calculate_sector_rating_contribution(
-            skill_level=skill_level,
-            skill_type=skill_type,
-            sector=sector,
-            position=position,
-        )
-    return rating_cache[key]
+class Trajectory:
+    """
+    Weekly skills and weighted rating of one greedy run, answerable at any age.
+
+    The greedy choice each week does not depend on the target age, so the plan
+    for any target up to the horizon is a prefix of one run to the horizon.
+    The trajectory keeps that run as per-week skill indices and training
+    effects, the weighted rating after every week and a full skill snapshot
+    every CHECKPOINT_WEEKS weeks; skills for a week are the nearest snapshot
+    plus at most CHECKPOINT_WEEKS - 1 replayed effects. Answers equal those of
+    calculate_optimal_skills run to the same target age; like such a run, they
+    always include the weeks spent reaching the minimum skills.
+
+    stop_reason and partial come from the plan. A partial plan (stopped by a
+    budget or cancelled) says nothing about the weeks after it stopped, so
+    lookups that need them raise ValueError instead of answering with the
+    last trained week.
+    """
 
+    def __init__(self, plan):
+        if plan["start_week"]:
+            raise ValueError("a trajectory needs a plan from its first week, not a replanned one")
+        self.skill_names = tuple(plan["starting_skills"])
+        self.start_days = Age(*plan["starting_age"]).to_days()
+        self.horizon_days = Age(*plan["target_age"]).to_days()
+        self.stop_reason = plan["stop_reason"]
+        self.partial = plan["partial"]
+        self.schedule = array.array("B", (self.skill_names.index(skill) for skill in plan["schedule"]))
+        self.effects = array.array("d", plan["effects"])
+        self.checkpoints = []
+        self.ratings = array.array("d")
+        skills = dict(plan["starting_skills"])
+        for week in range(len(self.schedule) + 1):
+            if week:
+                skills[self.skill_names[self.schedule[week - 1]]] += self.effects[week - 1]
+            if week % CHECKPOINT_WEEKS == 0:
+                self.checkpoints.append(array.array("d", skills.values()))
+            self.ratings.append(weighted_rating(skills, plan["position"], plan["sector_weights"]))
+        # the minimum-skill phase runs to completion whatever the target age
+        self.minimum_weeks = 0
+        levels = dict(plan["starting_skills"])
+        for skill, min_level in (plan["min_skills"] or {}).items():
+            while self.minimum_weeks < self.weeks and levels[skill] < min_level:
+                levels[skill] += self.effects[self.minimum_weeks]
+                self.minimum_weeks += 1
+
+    @property
+    def weeks(self):
+        return len(self.schedule)
+
+    def _weeks_before(self, age: Age):
+        days = age.to_days()
+        if days > self.horizon_days:
+            raise ValueError(f"age {age.years}.{age.days} is past the trajectory horizon")
+        return max(0, -(-(days - self.start_days) // 7))
+
+    def is_trained(self, age: Age):
+        """Whether the run covers every week a run to target `age` gets (False only for partial plans)."""
+        return not self.partial or max(self.minimum_weeks, self._weeks_before(age)) <= self.weeks
+
+    def week_for(self, age: Age):
+        """Training weeks a run to target `age` gets: the minimum-skill weeks, then one per started week before it."""
+        weeks = max(self.minimum_weeks, self._weeks_before(age))
+        if weeks > self.weeks and self.partial:
+            raise ValueError(f"age {age.years}.{age.days} is past week {self.weeks}, "
+                             f"where the plan stopped ({self.stop_reason})")
+        return min(self.weeks, weeks)
+
+    def age_at(self, week):
+        return Age(0, self.start_days + 7 * week)
+
+    def skills_at_week(self, week):
+        if not 0 <= week <= self.weeks:
+            raise ValueError(f"week {week} is outside the trajectory (weeks 0-{self.weeks})")
+        checkpoint = week // CHECKPOINT_WEEKS
+        skills = dict(zip(self.skill_names, self.checkpoints[checkpoint]))
+        for i in range(checkpoint * CHECKPOINT_WEEKS, week):
+            skills[self.skill_names[self.schedule[i]]] += self.effects[i]
+        return skills
+
+    def skills_at(self, age: Age):
+        """Skills the greedy plan reaches by `age` (calculate_optimal_skills' first result)."""
+        return self.skills_at_week(self.week_for(age))
+
+    def rating_at(self, age: Age):
+        """Weighted rating reached by `age`."""
+        return self.ratings[self.week_for(age)]
+
+    def earliest_age(self, rating):
+        """First age at which the weighted rating reaches `rating`, or None if it never does."""
+        week = bisect.bisect_left(self.ratings, rating)
+        if week == len(self.ratings):
+            if self.partial:
+                raise ValueError(f"rating {rating:g} is not reached in the {self.weeks} weeks "
+                                 f"trained before the plan stopped ({self.stop_reason})")
+            return None
+        return self.age_at(week)
+
+    def curve(self):
+        """(age, weighted rating) for every week of the run, for plotting."""
+        return [(self.age_at(week), rating) for week, rating in enumerate(self.ratings)]
+
+def rating_trajectory(starting_age: Age, horizon_age: Age, starting_skills: dict, position: str, sector_weights: dict, min_target_skills: dict = None, max_skills: dict = None):
+    """Run the greedy optimizer once to horizon_age and return its Trajectory."""
+    return Trajectory(optimize_plan(starting_age, horizon_age, starting_skills, position, sector_weights,
+                                    min_target_skills, max_skills))
+
+def get_cached_training(age, level, skill):
+    """Return the default-coaching training effect, memoized on the exact age and level."""
+    return training_cache.get(age, level, skill)
+
+@functools.lru_cache(maxsize=None)
 def relevant_contributions(position):
     return { (skill, sector): val for (pos, skill, sector), val in contributions.contributions.items() if pos == position }
 
-def get_to_minimum_skills(current_age, training_sessions, final_skills, min_target_skils):
-    if min_target_skils is None:
-        return current_age, training_sessions, final_skills
-    for skill, min_level in min_target_skils.items():
-        while final_skills[skill] < min_level:
-            training_effect = training.calculate_training(
-                age=current_age,
-                level=final_skills[skill],
-                training=skill,
+@functools.lru_cache(maxsize=None)
+def skill_coefficients(position):
+    """{skill: ((sector, coefficient), ...)} for a position's terms, from TERM_COEFFICIENTS."""
+    grouped = {}
+    for (skill, sector) in relevant_contributions(position):
+        grouped.setdefault(skill, []).append((sector, TERM_COEFFICIENTS[TERM_INDEX[(position, skill, sector)]]))
+    return {skill: tuple(terms) for skill, terms in grouped.items()}
+
+def warm_tables():
+    """Build every position's contribution table up front (e.g. as a worker-pool initializer)."""
+    for position in {pos for (pos, _, _) in contributions.contributions}:
+        relevant_contributions(position)
+        skill_coefficients(position)
+
+def worker_pool(workers, threads=False):
+    """
+    Executor for optimization jobs, its workers' tables built up front.
+
+    Worker processes by default. With threads=True the workers are threads of
+    this process and share its warm tables and training cache; they run jobs
+    in parallel only on a free-threaded Python (see gil_enabled).
+    """
+    if threads:
+        return concurrent.futures.ThreadPoolExecutor(max_workers=workers, initializer=warm_tables)
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=warm_tables)
+
+def gil_enabled():
+    """Whether the GIL is on; False only on a free-threaded Python running without it."""
+    is_enabled = getattr(sys, "_is_gil_enabled", None)
+    return True if is_enabled is None else is_enabled()
+
+def weighted_rating(skills, position, sector_weights):
+    """Sum of the sector-weighted rating contributions of a skill set at a position."""
+    total = 0.
+    for skill, terms in skill_coefficients(position).items():
+        weight = 0.
+        for sector, coefficient in terms:
+            weight += sector_weights[sector] * coefficient
+        total += weight * (skills[skill] - 1.) ** 1.2
+    return total
+
+def parse_job(job):
+    """
+    Validate a JSON optimization job and turn it into calculate_optimal_skills arguments.
+
+    A job holds "age" and "target_age" (see Age.parse), "skills", "position" and
+    optionally "sector_weights" (missing sectors weigh 1.0), "min_skills",
+    "max_skills" and the run budgets "time_budget" (seconds) and "max_weeks".
+    Raises ValueError describing the first problem found.
+    """
+    try:
+        position = job["position"]
+        if not relevant_contributions(position):
+            raise ValueError(f"unknown position code {position!r}")
+        skills = {skill: float(job["skills"][skill]) for skill in SKILLS}
+        sector_weights = {sector: 1. for sector in SECTORS}
+        for sector, weight in (job.get("sector_weights") or {}).items():
+            if sector not in sector_weights:
+                raise ValueError(f"unknown sector {sector!r}")
+            sector_weights[sector] = float(weight)
+        limits = {}
+        for key in ("min_skills", "max_skills"):
+            if job.get(key) is not None:
+                unknown = set(job[key]) - set(SKILLS)
+                if unknown:
+                    raise ValueError(f"unknown skill(s) in {key}: {', '.join(sorted(unknown))}")
+                limits[key] = {skill: float(level) for skill, level in job[key].items()}
+        for skill, level in limits.get("min_skills", {}).items():
+            cap = limits.get("max_skills", {}).get(skill)
+            if cap is not None and level > cap:
+                raise ValueError(f"min_skills {skill} {level:g} is above its max_skills cap {cap:g}")
+        budgets = {}
+        if job.get("time_budget") is not None:
+            budgets["time_budget"] = float(job["time_budget"])
+        if job.get("max_weeks") is not None:
+            budgets["max_weeks"] = int(job["max_weeks"])
+        return {
+            **budgets,
+            "starting_age": Age.parse(job["age"]),
+            "target_age": Age.parse(job["target_age"]),
+            "starting_skills": skills,
+            "position": position,
+            "sector_weights": sector_weights,
+            "min_target_skills": limits.get("min_skills"),
+            "max_skills": limits.get("max_skills"),
+        }
+    except KeyError as exc:
+        raise ValueError(f"missing field {exc}") from exc
+    except (TypeError, AttributeError) as exc:
+        raise ValueError(f"malformed job: {exc}") from exc
+
+def run_job(job):
+    """
+    Run one JSON optimization job; returns a JSON-ready result dict.
+
+    A job may also list "ages" up to its target age and a "rating_goal"; the
+    result then holds "at_ages" (skills and rating at each age) and
+    "earliest_age" (first age reaching the goal, or null), both read from the
+    trajectory of the same run. When the run stopped early ("partial"), ages
+    after its last trained week get null skills and rating, and a goal not
+    reached by then gets a null earliest_age.
+    """
+    args = parse_job(job)
+    try:
+        ages = [Age.parse(age) for age in job.get("ages") or []]
+        rating_goal = None if job.get("rating_goal") is None else float(job["rating_goal"])
+    except (TypeError, KeyError) as exc:
+        raise ValueError(f"malformed job: {exc}") from exc
+    plan = optimize_plan(**args)
+    result = {key: plan[key] for key in ("skills", "sessions", "rating", "weeks", "partial", "stop_reason")}
+    if ages or rating_goal is not None:
+        trajectory = Trajectory(plan)
+        if ages:
+            result["at_ages"] = [{"age": f"{age.years}.{age.days}", "skills": trajectory.skills_at(age),
+                                  "rating": trajectory.rating_at(age)} if trajectory.is_trained(age)
+                                 else {"age": f"{age.years}.{age.days}", "skills": None, "rating": None}
+                                 for age in ages]
+        if rating_goal is not None:
+            try:
+                age = trajectory.earliest_age(rating_goal)
+            except ValueError:
+                # not reached before a partial plan stopped; "partial" says so
+                age = None
+            result["earliest_age"] = None if age is None else f"{age.years}.{age.days}"
+    if "id" in job:
+        result = {"id": job["id"], **result}
+    return result
+
+def team_objective(players, sector_weights):
+    """Sector-weighted sum of the team ratings of a lineup (position code -> skills)."""
+    team_ratings = ratings.calculate_team_ratings(players)
+    return sum(sector_weights[sector] * team_ratings[sector] for sector in sector_weights)
+
+def optimize_team(players, starting_age: Age, target_age: Age, sector_weights: dict,
+                  time_budget: float = None, max_weeks: int = None, progress=None, cancel=None):
+    """
+    Greedy squad training optimizer.
+
+    Every week each player, in lineup order, trains the skill that raises the
+    weighted team rating most given the players already updated that week.
+    Takes the RunControl options; the budget is checked between weeks, so a
+    stopped run returns the squad as of its last complete week.
+
+    Parameters
+    ----------
+    players : dict
+        Lineup as position code -> skills dict; not modified.
+    starting_age, target_age : Age
+        Age of the squad at the start and end of the plan.
+    sector_weights : dict
+        A dictionary of weights for each sector.
+
+    Returns
+    -------
+    dict
+        "players" (trained skills per position), "weeks", "rating" (weighted team
+        rating reached), "partial" and "stop_reason" (as in optimize_plan).
+    """
+    control = RunControl(time_budget, max_weeks, progress, cancel)
+    players = {position: dict(skills) for position, skills in players.items()}
+    current_age = Age(starting_age.years, starting_age.days)
+    weeks = 0
+    evaluations = 0
+    stop_reason = "target age"
+
+    while current_age.to_days() < target_age.to_days():
+        reason = control.stop_reason(weeks)
+        if reason is not None:
+            stop_reason = reason
+            break
+        for position, skills in players.items():
+            best_delta = 0.
+            best_skill = None
+            best_training = 0.
+            old_objective = team_objective(players, sector_weights)
+            evaluations += len(skills) + 1
+            for skill_type, skill_value in skills.items():
+                training_effect = training.calculate_training(
+                    age=current_age,
+                    level=skill_value,
+                    training=skill_type,
                 )
-            final_skills[skill] += training_effect
-            training_sessions[skill] += 1
-            current_age.add_days(7)
-    return current_age, training_sessions, final_skills
+                new_skills = dict(skills)
+                new_skills[skill_type] += training_effect
+                delta = team_objective({**players, position: new_skills}, sector_weights) - old_objective
+                if delta > best_delta:
+                    best_delta = delta
+                    best_skill = skill_type
+                    best_training = training_effect
+            if best_skill is not None:
+                skills[best_skill] += best_training
+        current_age = current_age.plus_days(7)
+        weeks += 1
+        if control.progress is not None:
+            control.report(weeks, team_objective(players, sector_weights))
+
+    return {
+        "players": players,
+        "weeks": weeks,
+        "rating": team_objective(players, sector_weights),
+        "partial": stop_reason in PARTIAL_REASONS,
+        "stop_reason": stop_reason,
+        "evaluations": evaluations,
+    }
+
+def optimize_team_lazy(players, starting_age: Age, target_age: Age, sector_weights: dict,
+                       time_budget: float = None, max_weeks: int = None, progress=None, cancel=None,
+                       check: bool = False):
+    """
+    Lazy-greedy version of optimize_team that makes the same choices with far less work.
+
+    The team rating is kept as running per-sector sums, so the gain of training
+    one player's skill costs a few terms instead of a full
+    ratings.calculate_team_ratings. Each player's candidate skills sit in a heap
+    keyed by their last computed gain. A key stays an upper bound on the current
+    gain as long as nothing it depends on has grown: the training effect only
+    shrinks as the squad ages, and the sector sums only grow when someone trains
+    a skill feeding the same sector -- those candidates are marked dirty and
+    re-evaluated. So each turn re-evaluates the dirty candidates and then pops
+    until the top entry is fresh for the current week; that entry is the best.
+
+    With check=True every choice is compared with an eager evaluation through
+    team_objective and a RuntimeError is raised on disagreement.
+
+    Returns
+    -------
+    dict
+        As optimize_team; "evaluations" counts incremental gain evaluations.
+    """
+    control = RunControl(time_budget, max_weeks, progress, cancel)
+    players = {position: dict(skills) for position, skills in players.items()}
+    current_age = Age(starting_age.years, starting_age.days)
+    overcrowding = ratings.count_overcrowding(players)
+
+    # linear (pre-**1.2) sector sums and, per candidate, the sectors it feeds
+    sums = {sector: 0. for sector in SECTORS}
+    terms = {}
+    by_sector = {sector: [] for sector in SECTORS}
+    for position, skills in players.items():
+        overcrowding_factor = ratings.get_overcowding_factor(position, overcrowding)
+        for skill, level in skills.items():
+            feeds = []
+            for sector in SECTORS:
+                coefficient = (ratings.get_positional_factor(skill, sector, position)
+                               * ratings.get_sector_factor(sector) * overcrowding_factor)
+                if coefficient:
+                    feeds.append((sector, coefficient, sector_weights.get(sector, 0.)))
+                    sums[sector] += (level - 1.) * coefficient
+                    by_sector[sector].append((position, skill))
+            if feeds:
+                terms[(position, skill)] = feeds
+
+    evaluations = 0
+    weeks = 0
+    tokens = {candidate: 0 for candidate in terms}
+    heaps = {position: [] for position in players}
+    dirty = {position: [skill for (p, skill) in terms if p == position] for position in players}
+    skill_order = {position: {skill: i for i, skill in enumerate(skills)} for position, skills in players.items()}
+
+    def evaluate(position, skill):
+        nonlocal evaluations
+        evaluations += 1
+        effect = get_cached_training(current_age, players[position][skill], skill)
+        gain = 0.
+        for sector, coefficient, weight in terms[(position, skill)]:
+            before = sums[sector]
+            gain += weight * ((before + effect * coefficient)**1.2 - before**1.2) / 4.
+        tokens[(position, skill)] += 1
+        # ties go to the earlier skill, as in the eager loop
+        heapq.heappush(heaps[position], (-gain, skill_order[position][skill], tokens[(position, skill)],
+                                         weeks, skill, effect))
+
+    stop_reason = "target age"
+    while current_age.to_days() < target_age.to_days():
+        reason = control.stop_reason(weeks)
+        if reason is not None:
+            stop_reason = reason
+            break
+        for position, heap in heaps.items():
+            for skill in set(dirty[position]):
+                evaluate(position, skill)
+            dirty[position] = []
+            while heap:
+                neg_gain, _, token, computed_week, skill, effect = heap[0]
+                if token != tokens[(position, skill)]:
+                    heapq.heappop(heap)
+                elif computed_week != weeks:
+                    heapq.heappop(heap)
+                    evaluate(position, skill)
+                else:
+                    break
+            if not heap or heap[0][0] >= 0.:
+                chosen = None
+            else:
+                neg_gain, _, _, _, chosen, effect = heapq.heappop(heap)
+            if check:
+                check_lazy_choice(players, position, chosen, current_age, sector_weights)
+            if chosen is None:
+                continue
+            players[position][chosen] += effect
+            for sector, coefficient, _ in terms[(position, chosen)]:
+                sums[sector] += effect * coefficient
+                for other_position, other_skill in by_sector[sector]:
+                    dirty[other_position].append(other_skill)
+        current_age = current_age.plus_days(7)
+        weeks += 1
+        if control.progress is not None:
+            control.report(weeks, team_objective(players, sector_weights))
+
+    return {
+        "players": players,
+        "weeks": weeks,
+        "rating": team_objective(players, sector_weights),
+        "partial": stop_reason in PARTIAL_REASONS,
+        "stop_reason": stop_reason,
+        "evaluations": evaluations,
+    }
+
+def check_lazy_choice(players, position, chosen, current_age, sector_weights, tolerance=1e-9):
+    """Raise RuntimeError unless `chosen` is as good as the eager optimize_team choice."""
+    old_objective = team_objective(players, sector_weights)
+    deltas = {None: 0.}
+    for skill, level in players[position].items():
+        new_skills = dict(players[position])
+        new_skills[skill] += training.calculate_training(age=current_age, level=level, training=skill)
+        deltas[skill] = team_objective({**players, position: new_skills}, sector_weights) - old_objective
+    best = max(deltas.values())
+    if deltas[chosen] < best - tolerance * max(1., abs(best)):
+        raise RuntimeError(f"lazy greedy chose {chosen} for {position} at {current_age} "
+                           f"(gain {deltas[chosen]:.6g}) but the best gain is {best:.6g}")
 
 
 def main():
@@ -301,37 +1009,8 @@ def main3():
             "FW" : copy.deepcopy(starting_skills),
     }
 
-    current_age = Age(17,0)
-    target_age = Age(29,61)
-
-    while current_age.to_days() < target_age.to_days():
-        for position, skills in players.items():
-            best_delta = 0.
-            best_skill = None
-            best_training = 0.
-            for skill_type, skill_value in skills.items():
-                training_effect = training.calculate_training(
-                    age=current_age,
-                    level=skill_value,
-                    training=skill_type,
-                )
-                new_players = copy.deepcopy(players)
-                new_players[position][skill_type] += training_effect
-                old_ratings = ratings.calculate_team_ratings(players)
-                new_ratings = ratings.calculate_team_ratings(new_players)
-                old_delta = 0.
-                new_delta = 0.
-                for sector in sector_weights:
-                    old_delta += sector_weights[sector] * old_ratings[sector]
-                    new_delta += sector_weights[sector] * new_ratings[sector]
-                delta = new_delta - old_delta
-                if delta > best_delta:
-                    best_delta = delta
-                    best_skill = skill_type
-                    best_training = training_effect
-            players[position][best_skill] += best_training
-        current_age.add_days(7)
-    pprint(players)
+    result = optimize_team_lazy(players, Age(17,0), Age(29,61), sector_weights)
+    pprint(result["players"])
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,169 @@
+"""Immutable squad training states for comparing what-if schedules.
+
+A PlanState is a squad's skills after some weeks of training. Training a
+week returns a new state and leaves the old one as it was, so any state can
+be forked: take the state at week N of one branch, train it on another
+schedule and compare the two outcomes.
+
+States share structure instead of copying the squad. Each one stores its
+parent and only the (player, skill, effect) changes of its own week. Every
+optimization.CHECKPOINT_WEEKS weeks of depth it also keeps a snapshot: a
+tuple holding one tuple of levels per player. Players who did not train
+since the previous snapshot keep their tuple from it. A level is read from
+the nearest snapshot plus at most CHECKPOINT_WEEKS - 1 weeks of changes.
+A branch therefore costs memory and time in proportion to the weeks it
+trains, with one pointer per player every CHECKPOINT_WEEKS weeks, and never
+a copy of the whole squad.
+
+Training effects are optimization.get_cached_training at the squad's age,
+with every player the same age as in optimization.optimize_team.
+"""
+
+from age import Age
+import optimization
+
+
+class PlanState:
+    """Squad skills after `week` training weeks; never modified once built."""
+
+    __slots__ = ("parent", "week", "days", "changes", "snapshot", "positions", "skill_names")
+
+    def __init__(self, parent, week, days, changes, snapshot, positions, skill_names):
+        self.parent = parent
+        self.week = week
+        self.days = days
+        # ((player index, skill index, effect), ...) trained this week
+        self.changes = changes
+        self.snapshot = snapshot
+        self.positions = positions
+        self.skill_names = skill_names
+
+    @classmethod
+    def start(cls, players: dict, starting_age: Age) -> "PlanState":
+        """Week-0 state of a lineup (position code -> skills dict; not kept)."""
+        if not players:
+            raise ValueError("a plan state needs at least one player")
+        positions = tuple(players)
+        skill_names = tuple(next(iter(players.values())))
+        for position, skills in players.items():
+            if set(skills) != set(skill_names):
+                raise ValueError(f"{position} has skills {sorted(skills)}; expected {sorted(skill_names)}")
+        snapshot = tuple(tuple(float(players[position][skill]) for skill in skill_names)
+                         for position in positions)
+        return cls(None, 0, starting_age.to_days(), (), snapshot, positions, skill_names)
+
+    @property
+    def age(self) -> Age:
+        return Age(0, self.days)
+
+    def _checkpoint(self) -> "PlanState":
+        state = self
+        while state.snapshot is None:
+            state = state.parent
+        return state
+
+    def level(self, position: str, skill: str) -> float:
+        """One player's level of one skill in this state."""
+        player, index = self._indices(position, skill)
+        checkpoint = self._checkpoint()
+        level = checkpoint.snapshot[player][index]
+        state = self
+        while state is not checkpoint:
+            for changed_player, changed_skill, effect in state.changes:
+                if changed_player == player and changed_skill == index:
+                    level += effect
+            state = state.parent
+        return level
+
+    def _indices(self, position: str, skill: str) -> tuple[int, int]:
+        try:
+            return self.positions.index(position), self.skill_names.index(skill)
+        except ValueError:
+            raise ValueError(f"no skill {skill!r} for position {position!r} in this plan") from None
+
+    def _levels(self) -> list[list[float]]:
+        checkpoint = self._checkpoint()
+        levels = [list(player) for player in checkpoint.snapshot]
+        state = self
+        while state is not checkpoint:
+            for player, index, effect in state.changes:
+                levels[player][index] += effect
+            state = state.parent
+        return levels
+
+    def players(self) -> dict[str, dict[str, float]]:
+        """{position: {skill: level}} of this state, as fresh dicts."""
+        return {position: dict(zip(self.skill_names, levels))
+                for position, levels in zip(self.positions, self._levels())}
+
+    def rating(self, sector_weights: dict) -> float:
+        """Weighted team rating of the squad (optimization.team_objective)."""
+        return optimization.team_objective(self.players(), sector_weights)
+
+    def train(self, week_plan: dict) -> "PlanState":
+        """State after one more week in which each position in week_plan trains its skill.
+
+        week_plan maps position codes to a skill name; positions left out, or
+        mapped to None, do not train that week.
+        """
+        changes = []
+        age = self.age
+        for position, skill in week_plan.items():
+            if skill is None:
+                continue
+            player, index = self._indices(position, skill)
+            effect = optimization.get_cached_training(age, self.level(position, skill), skill)
+            changes.append((player, index, effect))
+        week = self.week + 1
+        snapshot = None
+        if week % optimization.CHECKPOINT_WEEKS == 0:
+            checkpoint = self._checkpoint()
+            levels = self._levels()
+            trained = {player for state in self._since(checkpoint) for player, _, _ in state.changes}
+            trained.update(player for player, _, _ in changes)
+            for player, index, effect in changes:
+                levels[player][index] += effect
+            snapshot = tuple(tuple(levels[player]) if player in trained else old
+                             for player, old in enumerate(checkpoint.snapshot))
+        return PlanState(self, week, self.days + 7, tuple(changes), snapshot,
+                         self.positions, self.skill_names)
+
+    def _since(self, ancestor: "PlanState"):
+        state = self
+        while state is not ancestor:
+            yield state
+            state = state.parent
+
+    def apply(self, schedule) -> "PlanState":
+        """State after training the weeks of schedule (an iterable of train() week plans) in turn."""
+        state = self
+        for week_plan in schedule:
+            state = state.train(week_plan)
+        return state
+
+    def at_week(self, week: int) -> "PlanState":
+        """The state this one was trained from after `week` weeks: the place to fork another schedule."""
+        if not 0 <= week <= self.week:
+            raise ValueError(f"week {week} is outside this plan (weeks 0-{self.week})")
+        state = self
+        while state.week > week:
+            state = state.parent
+        return state
+
+    def schedule(self) -> list[dict[str, str]]:
+        """Week plans that led to this state from week 0, as {position: skill} per week."""
+        weeks = [{self.positions[player]: self.skill_names[index] for player, index, _ in state.changes}
+                 for state in self._since(self.at_week(0))]
+        weeks.reverse()
+        return weeks
+
+
+def repeat(week_plan: dict, weeks: int) -> list[dict]:
+    """A schedule training the same week plan `weeks` times, e.g. repeat({"IM": "Passing"}, 10)."""
+    return [week_plan] * weeks
+
+
+def compare(branches: dict, sector_weights: dict) -> list[tuple[str, float]]:
+    """(name, weighted team rating) of {name: PlanState} branches, best first."""
+    return sorted(((name, state.rating(sector_weights)) for name, state in branches.items()),
+                  key=lambda item: item[1], reverse=True)
@@ -0,0 +1,189 @@
+"""Range and top-K queries over a parsed player export.
+
+Scouting questions like "Defending >= 14 and Playmaking >= 9, age < 24, ranked
+by central-defender total" are answered from sorted per-key columns: every
+condition is turned into an index range by binary search, the narrowest range
+supplies the candidates, the other conditions filter them, and only the
+surviving players are scored for the ranking.
+"""
+
+import argparse
+import array
+import bisect
+import heapq
+import math
+import re
+import sys
+
+import rank_players
+
+SKILLS = list(rank_players.SKILL_COLUMNS.values())
+KEYS = SKILLS + ["age", "form", "experience"]
+
+CONDITION_RE = re.compile(r"^\s*([A-Za-z][A-Za-z ]*?)\s*(>=|<=|==|=|>|<)\s*(-?[0-9]+(?:\.[0-9]+)?)\s*$")
+
+
+def normalize_key(name: str) -> str:
+    """Map a user-typed key ("set pieces", "SetPieces", "Exp", ...) to an index key."""
+    wanted = name.replace(" ", "").lower()
+    if wanted == "exp":
+        wanted = "experience"
+    for key in KEYS:
+        if key.replace(" ", "").lower() == wanted:
+            return key
+    raise ValueError(f"unknown key {name!r}; valid keys: {', '.join(KEYS)}")
+
+
+def parse_conditions(spec: str) -> list[tuple[str, str, float]]:
+    """Parse "Defending>=14,Playmaking>=9,age<24" into (key, operator, value) triples."""
+    conditions = []
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        match = CONDITION_RE.match(part)
+        if match is None:
+            raise ValueError(f"bad condition {part.strip()!r}; expected e.g. Defending>=14")
+        key, op, value = match.groups()
+        conditions.append((normalize_key(key), "==" if op == "=" else op, float(value)))
+    return conditions
+
+
+def age_years(player: dict) -> float:
+    """Age as fractional years from the export's "years.days" text; NaN when unknown."""
+    years, _, days = player["age"].partition(".")
+    try:
+        return int(years) + int(days) / 112
+    except ValueError:
+        return math.nan
+
+
+class PlayerIndex:
+    """Sorted columns for every skill, age, form and experience of a list of parsed players."""
+
+    def __init__(self, players: list[dict]):
+        self.players = players
+        self.values = {}
+        self.order = {}
+        self.sorted_values = {}
+        for key in KEYS:
+            if key in SKILLS:
+                column = array.array("d", (player["skills"][key] for player in players))
+            elif key == "age":
+                column = array.array("d", (age_years(player) for player in players))
+            else:
+                column = array.array("d", (player[key] for player in players))
+            # rows with an unknown value are left out of the order, so they never match
+            order = sorted((row for row, value in enumerate(column) if not math.isnan(value)),
+                           key=column.__getitem__)
+            self.values[key] = column
+            self.order[key] = array.array("l", order)
+            self.sorted_values[key] = array.array("d", (column[row] for row in order))
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def key_range(self, key: str, low: float, high: float,
+                  low_inclusive: bool = True, high_inclusive: bool = True) -> tuple[int, int]:
+        """Positions [start, stop) in the key's sorted order whose values lie between low and high."""
+        values = self.sorted_values[key]
+        start = (bisect.bisect_left if low_inclusive else bisect.bisect_right)(values, low)
+        stop = (bisect.bisect_right if high_inclusive else bisect.bisect_left)(values, high)
+        return start, max(start, stop)
+
+    def query(self, conditions: list[tuple[str, str, float]]) -> list[int]:
+        """Rows matching every (key, operator, value) condition, in no particular order."""
+        bounds = {}
+        for key, op, value in conditions:
+            low, low_inc, high, high_inc = bounds.get(key, (-math.inf, True, math.inf, True))
+            if op in (">=", ">", "==") and (value > low or (value == low and op == ">")):
+                low, low_inc = value, op != ">"
+            if op in ("<=", "<", "==") and (value < high or (value == high and op == "<")):
+                high, high_inc = value, op != "<"
+            bounds[key] = (low, low_inc, high, high_inc)
+        if not bounds:
+            return list(range(len(self.players)))
+
+        ranges = {key: self.key_range(key, low, high, low_inc, high_inc)
+                  for key, (low, low_inc, high, high_inc) in bounds.items()}
+        driver = min(ranges, key=lambda key: ranges[key][1] - ranges[key][0])
+        start, stop = ranges[driver]
+        others = [(self.values[key], *bounds[key]) for key in bounds if key != driver]
+        matches = []
+        for row in self.order[driver][start:stop]:
+            for column, low, low_inc, high, high_inc in others:
+                value = column[row]
+                if not ((value >= low if low_inc else value > low)
+                        and (value <= high if high_inc else value < high)):
+                    break
+            else:
+                matches.append(row)
+        return matches
+
+    def top(self, conditions: list[tuple[str, str, float]], position: str, order: str,
+            weights: dict[str, float], k: int = 10, use_form: bool = True) -> list[dict]:
+        """The k best matching players by one order's total, as rank_players-style entries."""
+        order_code = rank_players.POSITION_ORDERS[position][order]
+        scored = []
+        for row in self.query(conditions):
+            player = self.players[row]
+            form_mult = rank_players.form_multiplier(player["form"]) if use_form else 1.0
+            total = rank_players.order_total(player["skills"], form_mult, order_code, weights,
+                                             exp=player["experience"])
+            scored.append((total, -row))
+        entries = []
+        for total, neg_row in heapq.nlargest(k, scored):
+            entry = dict(self.players[-neg_row])
+            entry["totals"] = {order: total}
+            entry["best_order"] = order
+            entry["average"] = total
+            entries.append(entry)
+        return entries
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Find players matching skill/age/form thresholds, optionally ranked by an order.")
+    parser.add_argument("csv_file", help="semicolon-separated player export")
+    parser.add_argument("conditions",
+                        help="comma-separated thresholds, e.g. \"Defending>=14,Playmaking>=9,age<24\" "
+                             f"(keys: {', '.join(KEYS)})")
+    parser.add_argument("--rank", default=None, metavar="POSITION",
+                        help="rank matches by this position's order total (see rank_players.py)")
+    parser.add_argument("--order", default="normal", help="order of --rank (default: normal)")
+    parser.add_argument("--top", type=int, default=20, help="number of ranked players to show")
+    parser.add_argument("--weights", default=None, help="sector weight overrides, e.g. MB=1.2,M=3")
+    parser.add_argument("--ignore-form", action="store_true",
+                        help="treat every player as being at maximum form when ranking")
+    args = parser.parse_args(argv)
+
+    try:
+        conditions = parse_conditions(args.conditions)
+        weights = rank_players.parse_weights(args.weights)
+        position = rank_players.normalize_position(args.rank) if args.rank else None
+        order = args.order.strip().lower()
+        if position is not None and order not in rank_players.POSITION_ORDERS[position]:
+            valid = ", ".join(rank_players.POSITION_ORDERS[position])
+            raise ValueError(f"unknown order {order!r} for {position}; valid orders: {valid}")
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    players, warnings = rank_players.parse_players(args.csv_file)
+    for warning in warnings:
+        print(f"warning: {warning}", file=sys.stderr)
+    index = PlayerIndex(players)
+
+    if position is None:
+        rows = sorted(index.query(conditions))
+        for row in rows:
+            player = players[row]
+            print(f"{player['name']}  {player['age']}  form {player['form']:g}  "
+                  + "  ".join(f"{skill} {player['skills'][skill]:g}" for skill in SKILLS))
+        print(f"\n{len(rows)} of {len(index)} players match", file=sys.stderr)
+    else:
+        entries = index.top(conditions, position, order, weights, k=args.top,
+                            use_form=not args.ignore_form)
+        print(rank_players.format_table(entries, [order]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Per-phase timing, hot-function call counts and cache statistics for the CLIs.
+
+Code marks its phases with `with profiling.phase("name"):`. While no Profiler
+is running that returns a shared no-op context, and the call counters below
+are only installed (by wrapping the module attributes) while one runs, so the
+hooks cost nothing measurable when profiling is off. Nested phases are
+reported indented under their parent. Counts cover the profiling process
+only, not worker processes.
+"""
+
+import cProfile
+import contextlib
+import functools
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+import optimization
+import ratings
+import training
+
+# (module, function name) pairs whose calls are counted
+COUNTED = [
+    (ratings, "calculate_sector_rating_contribution"),
+    (training, "calculate_training"),
+    (optimization, "get_cached_training"),
+]
+# cache lookup function -> its cache's count of computed entries (misses)
+CACHES = {
+    "get_cached_training": lambda: optimization.training_cache.misses,
+}
+
+active = None
+_NO_PHASE = contextlib.nullcontext()
+
+
+def phase(name: str):
+    """Context manager timing a phase of the running Profiler (a no-op when none runs)."""
+    if active is None:
+        return _NO_PHASE
+    return active.phase(name)
+
+
+class Profiler:
+    """Collects phase times, call counts, cache hit rates and peak memory for one run.
+
+    Use as a context manager around the run; only one profiler can run at a
+    time. With dump_path set, a cProfile of the run is written there as well
+    (readable with pstats).
+    """
+
+    def __init__(self, dump_path: str | None = None):
+        self.dump_path = dump_path
+        self.phases = {}
+        self.stack = []
+        self.calls = {}
+        self.cache_start = {}
+        self.cache_added = {}
+        self.originals = []
+        self.profile = None
+        self.started = None
+        self.elapsed = None
+
+    def __enter__(self):
+        global active
+        if active is not None:
+            raise RuntimeError("a profiler is already running")
+        active = self
+        for module, name in COUNTED:
+            original = getattr(module, name)
+            self.calls[name] = 0
+            setattr(module, name, self._counting(name, original))
+            self.originals.append((module, name, original))
+        self.cache_start = {name: misses() for name, misses in CACHES.items()}
+        if self.dump_path:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        global active
+        self.elapsed = time.perf_counter() - self.started
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.dump_path)
+        for module, name, original in self.originals:
+            setattr(module, name, original)
+        self.originals = []
+        self.cache_added = {name: misses() - self.cache_start[name]
+                            for name, misses in CACHES.items()}
+        active = None
+        return False
+
+    def _counting(self, name, function):
+        calls = self.calls
+
+        @functools.wraps(function)
+        def counted(*args, **kwargs):
+            calls[name] += 1
+            return function(*args, **kwargs)
+        return counted
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        self.stack.append(name)
+        path = "/".join(self.stack)
+        self.phases.setdefault(path, (0., 0))  # report phases in the order they start
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds, count = self.phases[path]
+            self.phases[path] = (seconds + time.perf_counter() - start, count + 1)
+            self.stack.pop()
+
+    def cache_stats(self) -> dict[str, tuple[int, int]]:
+        """{lookup function: (lookups, hits)} over the profiled run."""
+        return {name: (self.calls[name], self.calls[name] - added)
+                for name, added in self.cache_added.items()}
+
+    def report(self) -> str:
+        lines = ["profile:", f"  total {self.elapsed:.3f}s"]
+        for path, (seconds, count) in self.phases.items():
+            indent = "  " * path.count("/")
+            name = path.rsplit("/", 1)[-1]
+            times = f" x{count}" if count > 1 else ""
+            lines.append(f"  {indent}{name} {seconds:.3f}s{times}")
+        lines.append("  calls:")
+        for name, count in self.calls.items():
+            lines.append(f"    {name} {count}")
+        lines.append("  caches:")
+        for name, (lookups, hits) in self.cache_stats().items():
+            rate = f"{100. * hits / lookups:.1f}%" if lookups else "n/a"
+            lines.append(f"    {name} {lookups} lookups, {hits} hits ({rate})")
+        lines.append(f"  peak memory {peak_memory()}")
+        if self.dump_path:
+            lines.append(f"  profile written to {self.dump_path}")
+        return "\n".join(lines)
+
+
+def peak_memory() -> str:
+    """Peak resident set size of this process, or "n/a" where it cannot be read."""
+    if resource is None:
+        return "n/a"
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    kib = peak / 1024 if sys.platform == "darwin" else peak
+    return f"{kib / 1024:.1f} MiB"
+
+
+def profiler_for(enabled: bool, dump_path: str | None = None):
+    """A Profiler when profiling was asked for (--profile or a dump file), else a no-op context."""
+    if enabled or dump_path:
+        return Profiler(dump_path)
+    return contextlib.nullcontext()
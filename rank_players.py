@@ -1,11 +1,24 @@
 """Rank players from a CSV export by rating contribution for a position."""
 
 import argparse
+import array
+import asyncio
+import collections.abc
+import concurrent.futures
 import csv
+import functools
+import itertools
+import json
+import math
+import struct
 import sys
 
 import contributions
+import exports
+import optimization
+import profiling
 import ratings
+from age import Age
 
 FORM_TABLE = [
     (1.5, 0.282), (2.0, 0.379), (2.5, 0.462), (3.0, 0.534),
@@ -106,34 +119,249 @@ def parse_float(value: str) -> float:
     return float(str(value).strip().replace(",", "."))
 
 
+def parse_price(row: dict) -> float | None:
+    """The optional Price column (market exports) as a number, None when absent or empty.
+
+    Spaces used as thousands separators are ignored; raises ValueError for
+    any other text.
+    """
+    raw = "".join((row.get("Price") or "").split())
+    return parse_float(raw) if raw else None
+
+
+def parse_player_id(row: dict) -> int | None:
+    """The PlayerID column as an int, or None when the export has no usable id."""
+    try:
+        return int((row.get("PlayerID") or "").strip())
+    except ValueError:
+        return None
+
+
 def parse_players(csv_path: str) -> tuple[list[dict], list[str]]:
-    """Read the player export; returns (players, warnings for skipped rows)."""
-    players = []
+    """Read the player export; returns (players, warnings for skipped rows).
+
+    The export may be gzip, bz2 or zip compressed (see exports.open_export).
+    """
+    with exports.open_export(csv_path) as f:
+        return read_players(f)
+
+
+async def load_exports(paths: list[str], concurrency: int = 4,
+                       table: bool = False) -> list[tuple]:
+    """Parse many exports on worker threads; returns parse_players results in path order.
+
+    At most `concurrency` files are open at once. With table=True each result
+    is parse_player_table's (PlayerTable, warnings) instead.
+    """
+    parse = parse_player_table if table else parse_players
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def load(path):
+        async with semaphore:
+            return await asyncio.to_thread(parse, path)
+
+    return await asyncio.gather(*(load(path) for path in paths))
+
+
+def read_players(lines) -> tuple[list[dict], list[str]]:
+    """Parse an export from any iterable of text lines (open file, StringIO, ...)."""
     warnings = []
-    with open(csv_path, encoding="utf-8") as f:
-        for row in csv.DictReader(f, delimiter=";"):
-            name = " ".join(
-                part for part in (row.get("FirstName"), row.get("NickName"), row.get("LastName"))
-                if part
-            )
-            try:
-                skills = {skill: parse_float(row[column]) for column, skill in SKILL_COLUMNS.items()}
-                form = parse_float(row["PlayerForm"])
-                experience = parse_float(row["Experience"])
-            except (KeyError, TypeError, ValueError) as exc:
-                warnings.append(f"skipping {name or '<unnamed row>'}: bad or missing value ({exc})")
-                continue
-            players.append({
-                "name": name,
-                "age": f"{row.get('Age', '?')}.{row.get('AgeDays', '?')}",
-                "form": form,
-                "experience": experience,
-                "specialty": parse_specialty(row),
-                "skills": skills,
-            })
+    players = list(iter_players(lines, warnings))
     return players, warnings
 
 
+def iter_players(lines, warnings: list[str]):
+    """Yield one player dict per valid row, appending a warning for each skipped row."""
+    for row in csv.DictReader(lines, delimiter=";"):
+        name = " ".join(
+            part for part in (row.get("FirstName"), row.get("NickName"), row.get("LastName"))
+            if part
+        )
+        try:
+            skills = {skill: parse_float(row[column]) for column, skill in SKILL_COLUMNS.items()}
+            form = parse_float(row["PlayerForm"])
+            experience = parse_float(row["Experience"])
+        except (KeyError, TypeError, ValueError) as exc:
+            warnings.append(f"skipping {name or '<unnamed row>'}: bad or missing value ({exc})")
+            continue
+        try:
+            price = parse_price(row)
+        except ValueError:
+            warnings.append(f"{name or '<unnamed row>'}: ignoring unreadable price {row['Price']!r}")
+            price = None
+        yield {
+            "player_id": parse_player_id(row),
+            "name": name,
+            "age": f"{row.get('Age', '?')}.{row.get('AgeDays', '?')}",
+            "form": form,
+            "experience": experience,
+            "specialty": parse_specialty(row),
+            "skills": skills,
+            "price": price,
+        }
+
+
+PLAYER_FIELDS = ("player_id", "name", "age", "form", "experience", "specialty", "skills", "price")
+
+
+class PlayerRecord(collections.abc.Mapping):
+    """Read-only view of one PlayerTable row with the keys of a read_players dict.
+
+    Fields are read from the table's columns on access, so a record costs two
+    references; dict(record) gives an ordinary player dict.
+    """
+
+    __slots__ = ("table", "row")
+
+    def __init__(self, table: "PlayerTable", row: int):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, key: str):
+        return self.table.field(key, self.row)
+
+    def __iter__(self):
+        return iter(PLAYER_FIELDS)
+
+    def __len__(self) -> int:
+        return len(PLAYER_FIELDS)
+
+    def __repr__(self) -> str:
+        return f"PlayerRecord({dict(self)!r})"
+
+
+class PlayerTable:
+    """Parsed players stored as one array per field instead of one dict per player.
+
+    Skills are float64 columns (skill_typecode="f" stores them as float32),
+    form and experience float64, PlayerID an int64 column (-1 when missing)
+    and age two integer columns (-1 for a part that is not a number).
+    Prices are a float64 column with NaN for players without one.
+    Names are kept as one UTF-8 buffer with end offsets and specialties as
+    codes into a list of distinct names. Indexing and iteration give
+    PlayerRecord views.
+    """
+
+    def __init__(self, skill_typecode: str = "d"):
+        if skill_typecode not in ("d", "f"):
+            raise ValueError(f"skill typecode must be 'd' or 'f', not {skill_typecode!r}")
+        self.player_ids = array.array("q")
+        self.name_ends = array.array("Q", [0])
+        self.name_bytes = bytearray()
+        self.years = array.array("l")
+        self.days = array.array("l")
+        self.form = array.array("d")
+        self.experience = array.array("d")
+        self.specialty_codes = array.array("H")
+        self.specialties = []
+        self._specialty_code = {}
+        self.skills = {skill: array.array(skill_typecode) for skill in SKILL_COLUMNS.values()}
+        self.prices = array.array("d")
+
+    @classmethod
+    def from_players(cls, players, skill_typecode: str = "d") -> "PlayerTable":
+        table = cls(skill_typecode)
+        for player in players:
+            table.append(player)
+        return table
+
+    def append(self, player) -> None:
+        """Add one read_players-style player dict (or record) as a new row."""
+        player_id = player.get("player_id")
+        self.player_ids.append(-1 if player_id is None else player_id)
+        self.name_bytes += player["name"].encode("utf-8")
+        self.name_ends.append(len(self.name_bytes))
+        years, _, days = player["age"].partition(".")
+        years, days = years.strip(), days.strip()
+        self.years.append(int(years) if years.isdigit() else -1)
+        self.days.append(int(days) if days.isdigit() else -1)
+        self.form.append(player["form"])
+        self.experience.append(player["experience"])
+        specialty = player["specialty"]
+        code = self._specialty_code.get(specialty)
+        if code is None:
+            code = self._specialty_code[specialty] = len(self.specialties)
+            self.specialties.append(specialty)
+        self.specialty_codes.append(code)
+        for skill, column in self.skills.items():
+            column.append(player["skills"][skill])
+        price = player.get("price")
+        self.prices.append(math.nan if price is None else price)
+
+    def __len__(self) -> int:
+        return len(self.form)
+
+    def __getitem__(self, row: int) -> PlayerRecord:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("player table row out of range")
+        return PlayerRecord(self, row)
+
+    def __iter__(self):
+        return (PlayerRecord(self, row) for row in range(len(self)))
+
+    def name(self, row: int) -> str:
+        return self.name_bytes[self.name_ends[row]:self.name_ends[row + 1]].decode("utf-8")
+
+    def age(self, row: int) -> str:
+        """Age as the export's "years.days" text, with "?" for an unknown part."""
+        years, days = self.years[row], self.days[row]
+        return f"{'?' if years < 0 else years}.{'?' if days < 0 else days}"
+
+    def skill_row(self, row: int) -> dict[str, float]:
+        return {skill: column[row] for skill, column in self.skills.items()}
+
+    def field(self, key: str, row: int):
+        if key == "player_id":
+            player_id = self.player_ids[row]
+            return None if player_id < 0 else player_id
+        if key == "name":
+            return self.name(row)
+        if key == "age":
+            return self.age(row)
+        if key == "form":
+            return self.form[row]
+        if key == "experience":
+            return self.experience[row]
+        if key == "specialty":
+            return self.specialties[self.specialty_codes[row]]
+        if key == "skills":
+            return self.skill_row(row)
+        if key == "price":
+            price = self.prices[row]
+            return None if math.isnan(price) else price
+        raise KeyError(key)
+
+    def nbytes(self) -> int:
+        """Bytes held by the column buffers (excluding the few distinct specialty names)."""
+        columns = [self.player_ids, self.name_ends, self.years, self.days, self.form,
+                   self.experience, self.specialty_codes, self.prices, *self.skills.values()]
+        return len(self.name_bytes) + sum(len(c) * c.itemsize for c in columns)
+
+
+def parse_player_table(csv_path: str, skill_typecode: str = "d") -> tuple[PlayerTable, list[str]]:
+    """parse_players into a PlayerTable; returns (table, warnings for skipped rows)."""
+    with exports.open_export(csv_path) as f:
+        return read_player_table(f, skill_typecode)
+
+
+def read_player_table(lines, skill_typecode: str = "d") -> tuple[PlayerTable, list[str]]:
+    """read_players into a PlayerTable; each row's dict is dropped once appended."""
+    warnings = []
+    table = PlayerTable(skill_typecode)
+    for player in iter_players(lines, warnings):
+        table.append(player)
+    return table, warnings
+
+
+@functools.lru_cache(maxsize=None)
+def order_terms(order_code: str) -> tuple[tuple[str, str], ...]:
+    """The (skill, sector) pairs an order contributes to, in contributions-table order."""
+    return tuple((skill, sector) for (position, skill, sector) in contributions.contributions
+                 if position == order_code)
+
+
 def order_total(skills: dict[str, float], form_mult: float,
                 order_code: str, weights: dict[str, float],
                 exp: float = 0.0) -> float:
@@ -148,11 +376,9 @@ def order_total(skills: dict[str, float], form_mult: float,
     ratings.calculate_team_ratings (rating**1.2 / 4 + 1).
     """
     total = 0.0
-    exp_sectors = set()
-    for (position, skill, sector) in contributions.contributions:
-        if position != order_code:
-            continue
-        exp_sectors.add(sector)
+    terms = order_terms(order_code)
+    exp_sectors = {sector for (_, sector) in terms}
+    for (skill, sector) in terms:
         total += weights[sector] * ratings.calculate_sector_rating_contribution(
             skill_level=skills[skill],
             skill_type=skill,
@@ -166,10 +392,59 @@ def order_total(skills: dict[str, float], form_mult: float,
     return total / 4.0
 
 
+def project_skills(job: tuple) -> dict[str, dict[str, float]]:
+    """Worker task: {order code: skills at the target age} for one player.
+
+    job is (age in days, skills, order codes, target age in days, weights).
+    The optimizer trains toward each order separately; a player already at or
+    past the target age keeps their current skills.
+    """
+    age_days, skills, codes, target_days, weights = job
+    if age_days >= target_days:
+        return {code: dict(skills) for code in codes}
+    projected = {}
+    for code in codes:
+        projected[code], _ = optimization.calculate_optimal_skills(
+            Age(0, age_days), Age(0, target_days), dict(skills), code, weights)
+    return projected
+
+
+def project_players(players: list[dict], codes: list[str], target_age: Age,
+                    weights: dict[str, float], workers: int = 1) -> list[dict]:
+    """Projected skills ({order code: skills}) for every player, in input order.
+
+    Players with the same age and skills share one optimizer run, and with
+    workers > 1 the runs are spread over a process pool in chunks. Players
+    whose age cannot be parsed are not projected: their projected skills are
+    their current ones (main warns about them).
+    """
+    target_days = target_age.to_days()
+    jobs = {}
+    keys = []
+    for player in players:
+        age_days = age_in_days(player["age"])
+        if age_days < 0:
+            age_days = target_days
+        key = (age_days, tuple(sorted(player["skills"].items())))
+        jobs.setdefault(key, (age_days, player["skills"], tuple(codes), target_days, weights))
+        keys.append(key)
+    if workers > 1 and len(jobs) > 1:
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=optimization.warm_tables) as executor:
+            results = dict(zip(jobs, executor.map(project_skills, jobs.values(),
+                                                  chunksize=chunksize)))
+    else:
+        results = {key: project_skills(job) for key, job in jobs.items()}
+    return [results[key] for key in keys]
+
+
 def rank_players(players: list[dict], position: str,
                  weights: dict[str, float],
                  use_form: bool = True,
-                 orders: list[str] | None = None) -> list[dict]:
+                 orders: list[str] | None = None,
+                 project_to: Age | None = None,
+                 workers: int = 1) -> list[dict]:
     """Return players sorted best-first for the position.
 
     Comparison is lexicographic on each player's descending per-order totals:
@@ -177,25 +452,32 @@ def rank_players(players: list[dict], position: str,
     With use_form=False every player is treated as being at maximum form.
     `orders` restricts which of the position's orders are considered
     (labels like "normal", "defensive"); None means all of them.
+    With project_to set, each order's total uses the skills the training
+    optimizer reaches for that order by the given age (see project_players),
+    keeping current form and experience; entries then carry "projected",
+    {order label: skills}.
     """
     all_orders = POSITION_ORDERS[position]
-    if orders is None:
-        orders = list(all_orders)
-    else:
-        unknown = [label for label in orders if label not in all_orders]
-        if unknown:
-            valid = ", ".join(all_orders)
-            raise ValueError(
-                f"unknown order(s) {', '.join(unknown)} for {position}; valid orders: {valid}")
+    orders = resolve_orders(position, orders)
+    projections = None
+    if project_to is not None:
+        projections = project_players(players, [all_orders[label] for label in orders],
+                                      project_to, weights, workers)
     ranked = []
-    for player in players:
+    for i, player in enumerate(players):
         form_mult = form_multiplier(player["form"]) if use_form else 1.0
+        if projections is None:
+            order_skills = {label: player["skills"] for label in orders}
+        else:
+            order_skills = {label: projections[i][all_orders[label]] for label in orders}
         totals = {
-            label: order_total(player["skills"], form_mult, all_orders[label], weights,
+            label: order_total(order_skills[label], form_mult, all_orders[label], weights,
                                exp=player["experience"])
             for label in orders
         }
         entry = dict(player)
+        if projections is not None:
+            entry["projected"] = order_skills
         entry["totals"] = totals
         entry["best_order"] = max(totals, key=totals.get)
         entry["average"] = sum(totals.values()) / len(totals)
@@ -204,6 +486,115 @@ def rank_players(players: list[dict], position: str,
     return ranked
 
 
+def resolve_orders(position: str, orders: list[str] | None) -> list[str]:
+    """The order labels to rank on: all of the position's, or the validated given ones."""
+    all_orders = POSITION_ORDERS[position]
+    if orders is None:
+        return list(all_orders)
+    unknown = [label for label in orders if label not in all_orders]
+    if unknown:
+        valid = ", ".join(all_orders)
+        raise ValueError(
+            f"unknown order(s) {', '.join(unknown)} for {position}; valid orders: {valid}")
+    return list(orders)
+
+
+def column_order_totals(table: PlayerTable, form_mults: array.array, order_code: str,
+                        weights: dict[str, float]) -> array.array:
+    """order_total for every row of the table, accumulated one term at a time."""
+    totals = [0.0] * len(table)
+    terms = order_terms(order_code)
+    for (skill, sector) in terms:
+        weight = weights[sector]
+        totals = [
+            total + weight * ratings.calculate_sector_rating_contribution(
+                skill_level=level,
+                skill_type=skill,
+                sector=sector,
+                position=order_code,
+                form=form_mult,
+            )
+            for total, level, form_mult in zip(totals, table.skills[skill], form_mults)
+        ]
+    for sector in {sector for (_, sector) in terms}:
+        weight = weights[sector]
+        factor = ratings.get_sector_factor(sector)
+        totals = [total + weight * (experience_effect(exp, sector) * factor) ** 1.2
+                  for total, exp in zip(totals, table.experience)]
+    return array.array("d", (total / 4.0 for total in totals))
+
+
+class TableRanking:
+    """rank_players' result for a PlayerTable, kept as columns.
+
+    totals maps each order label to an array of per-row totals and rows lists
+    table rows best-first. Iterating yields rank_players-style entry dicts one
+    at a time, so the output writers stream from it without holding them all.
+    """
+
+    def __init__(self, table: PlayerTable, order_labels: list[str],
+                 totals: dict[str, array.array], projected: list[dict] | None = None):
+        self.table = table
+        self.order_labels = order_labels
+        self.totals = totals
+        self.projected = projected
+        columns = [totals[label] for label in order_labels]
+        self.average = array.array("d", (sum(values) / len(values) for values in zip(*columns)))
+        self.best = array.array("H", (max(range(len(values)), key=values.__getitem__)
+                                      for values in zip(*columns)))
+        keys = [sorted(values, reverse=True) for values in zip(*columns)]
+        self.rows = array.array("l", sorted(range(len(table)), key=keys.__getitem__,
+                                            reverse=True))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self):
+        return (self.entry(row) for row in self.rows)
+
+    def entry(self, row: int) -> dict:
+        entry = dict(self.table[row])
+        entry["totals"] = {label: self.totals[label][row] for label in self.order_labels}
+        entry["best_order"] = self.order_labels[self.best[row]]
+        entry["average"] = self.average[row]
+        if self.projected is not None:
+            entry["projected"] = self.projected[row]
+        return entry
+
+
+def rank_table(table: PlayerTable, position: str, weights: dict[str, float],
+               use_form: bool = True, orders: list[str] | None = None,
+               project_to: Age | None = None, workers: int = 1) -> TableRanking:
+    """rank_players over a PlayerTable, computing each order's totals column by column."""
+    all_orders = POSITION_ORDERS[position]
+    orders = resolve_orders(position, orders)
+    if project_to is None:
+        with profiling.phase("form"):
+            form_mults = array.array("d", (form_multiplier(form) if use_form else 1.0
+                                           for form in table.form))
+        with profiling.phase("contributions"):
+            totals = {label: column_order_totals(table, form_mults, all_orders[label], weights)
+                      for label in orders}
+        with profiling.phase("sort"):
+            return TableRanking(table, orders, totals)
+    with profiling.phase("projection"):
+        projections = project_players(list(table), [all_orders[label] for label in orders],
+                                      project_to, weights, workers)
+    with profiling.phase("contributions"):
+        totals = {label: array.array("d") for label in orders}
+        projected = []
+        for player, projection in zip(table, projections):
+            form_mult = form_multiplier(player["form"]) if use_form else 1.0
+            order_skills = {label: projection[all_orders[label]] for label in orders}
+            for label in orders:
+                totals[label].append(order_total(order_skills[label], form_mult,
+                                                 all_orders[label], weights,
+                                                 exp=player["experience"]))
+            projected.append(order_skills)
+    with profiling.phase("sort"):
+        return TableRanking(table, orders, totals, projected)
+
+
 def format_table(ranked: list[dict], order_labels: list[str]) -> str:
     headers = (["Rank", "Player", "Age", "Form", "Exp", "Spec"]
                + order_labels + ["Avg", "Best"])
@@ -226,24 +617,186 @@ def format_table(ranked: list[dict], order_labels: list[str]) -> str:
     return "\n".join(lines)
 
 
+OUTPUT_FORMATS = ("table", "ndjson", "csv", "tsv", "binary-columnar")
+
+COLUMNAR_MAGIC = b"HTRC"
+COLUMNAR_VERSION = 1
+COLUMNAR_BLOCK_ROWS = 4096
+# column kind -> binary typecode; "total" is a float shown with four decimals in text
+COLUMNAR_TYPECODES = {"int": "q", "float": "d", "total": "d", "str": "s"}
+
+
+def output_columns(order_labels: list[str], numeric: bool = False) -> list[tuple[str, str]]:
+    """(name, kind) of every output column; numeric mode keeps numbers only.
+
+    Kinds are "int", "float", "total" (a float rounded to four decimals in
+    text output) and "str". In numeric mode Best is the index of the best
+    order in order_labels and age is given in days (-1 when unknown).
+    """
+    if numeric:
+        return ([("Rank", "int"), ("PlayerID", "int"), ("AgeDays", "int"),
+                 ("Form", "float"), ("Exp", "float")]
+                + [(label, "float") for label in order_labels]
+                + [("Avg", "float"), ("Best", "int")])
+    return ([("Rank", "int"), ("Player", "str"), ("Age", "str"), ("Form", "float"),
+             ("Exp", "float"), ("Spec", "str")]
+            + [(label, "total") for label in order_labels]
+            + [("Avg", "total"), ("Best", "str")])
+
+
+def age_in_days(age: str) -> int:
+    try:
+        return Age.parse(age).to_days()
+    except ValueError:
+        return -1
+
+
+def iter_output_rows(ranked, order_labels: list[str], numeric: bool = False):
+    """Yield one tuple of unformatted values per ranked entry, matching output_columns."""
+    for rank, entry in enumerate(ranked, start=1):
+        totals = [entry["totals"][label] for label in order_labels]
+        if numeric:
+            player_id = entry.get("player_id")
+            yield (rank, -1 if player_id is None else player_id, age_in_days(entry["age"]),
+                   entry["form"], entry["experience"], *totals, entry["average"],
+                   order_labels.index(entry["best_order"]))
+        else:
+            yield (rank, entry["name"], entry["age"], entry["form"], entry["experience"],
+                   entry["specialty"], *totals, entry["average"], entry["best_order"])
+
+
+def write_delimited(stream, columns: list[tuple[str, str]], rows, delimiter: str = ",",
+                    lineterminator: str = "\r\n") -> None:
+    writer = csv.writer(stream, delimiter=delimiter, lineterminator=lineterminator)
+    writer.writerow([name for name, _ in columns])
+    totals = [i for i, (_, kind) in enumerate(columns) if kind == "total"]
+    for row in rows:
+        if totals:
+            row = list(row)
+            for i in totals:
+                row[i] = f"{row[i]:.4f}"
+        writer.writerow(row)
+
+
+def write_ndjson(stream, columns: list[tuple[str, str]], rows) -> None:
+    names = [name for name, _ in columns]
+    for row in rows:
+        stream.write(json.dumps(dict(zip(names, row)), ensure_ascii=False))
+        stream.write("\n")
+
+
+def write_columnar(stream, columns: list[tuple[str, str]], rows,
+                   block_rows: int = COLUMNAR_BLOCK_ROWS) -> None:
+    """Write rows to a binary stream as blocks of little-endian column arrays.
+
+    Layout: magic, version and column count, then each column's typecode
+    ("q", "d" or "s") and UTF-8 name. Blocks follow: a row count, then every
+    column's values. A string column is stored as row count + 1 end offsets
+    followed by the concatenated UTF-8 bytes. A block with zero rows ends the
+    stream. Only one block is held in memory at a time.
+    """
+    typecodes = [COLUMNAR_TYPECODES[kind] for _, kind in columns]
+    stream.write(COLUMNAR_MAGIC + struct.pack("<HH", COLUMNAR_VERSION, len(columns)))
+    for (name, _), typecode in zip(columns, typecodes):
+        encoded = name.encode("utf-8")
+        stream.write(typecode.encode("ascii") + struct.pack("<H", len(encoded)) + encoded)
+    block = []
+    for row in rows:
+        block.append(row)
+        if len(block) == block_rows:
+            _write_columnar_block(stream, typecodes, block)
+            block = []
+    if block:
+        _write_columnar_block(stream, typecodes, block)
+    stream.write(struct.pack("<I", 0))
+
+
+def _little_endian(values: array.array) -> bytes:
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _write_columnar_block(stream, typecodes: list[str], block: list[tuple]) -> None:
+    stream.write(struct.pack("<I", len(block)))
+    for i, typecode in enumerate(typecodes):
+        if typecode == "s":
+            encoded = [row[i].encode("utf-8") for row in block]
+            ends = array.array("Q", itertools.accumulate(map(len, encoded), initial=0))
+            stream.write(_little_endian(ends))
+            stream.write(b"".join(encoded))
+        else:
+            stream.write(_little_endian(array.array(typecode, (row[i] for row in block))))
+
+
+def read_columnar(stream):
+    """Read a write_columnar stream; yields each block as {column name: list of values}."""
+    def read_exact(size):
+        data = stream.read(size)
+        if len(data) != size:
+            raise ValueError("truncated columnar stream")
+        return data
+
+    if read_exact(4) != COLUMNAR_MAGIC:
+        raise ValueError("not a columnar ranking stream")
+    version, count = struct.unpack("<HH", read_exact(4))
+    if version != COLUMNAR_VERSION:
+        raise ValueError(f"unsupported columnar version {version}")
+    columns = []
+    for _ in range(count):
+        typecode = read_exact(1).decode("ascii")
+        (length,) = struct.unpack("<H", read_exact(2))
+        columns.append((read_exact(length).decode("utf-8"), typecode))
+    while True:
+        (rows,) = struct.unpack("<I", read_exact(4))
+        if not rows:
+            return
+        block = {}
+        for name, typecode in columns:
+            if typecode == "s":
+                ends = array.array("Q")
+                ends.frombytes(read_exact((rows + 1) * ends.itemsize))
+                if sys.byteorder == "big":
+                    ends.byteswap()
+                data = read_exact(ends[-1])
+                block[name] = [data[start:end].decode("utf-8") for start, end in zip(ends, ends[1:])]
+            else:
+                values = array.array(typecode)
+                values.frombytes(read_exact(rows * values.itemsize))
+                if sys.byteorder == "big":
+                    values.byteswap()
+                block[name] = values.tolist()
+        yield block
+
+
+def write_ranking(stream, output_format: str, ranked, order_labels: list[str],
+                  numeric: bool = False) -> None:
+    """Stream the ranking in a machine-readable format; binary-columnar needs a binary stream."""
+    columns = output_columns(order_labels, numeric)
+    rows = iter_output_rows(ranked, order_labels, numeric)
+    if output_format == "ndjson":
+        write_ndjson(stream, columns, rows)
+    elif output_format == "csv":
+        write_delimited(stream, columns, rows)
+    elif output_format == "tsv":
+        write_delimited(stream, columns, rows, delimiter="\t", lineterminator="\n")
+    elif output_format == "binary-columnar":
+        write_columnar(stream, columns, rows)
+    else:
+        raise ValueError(f"unknown output format {output_format!r}")
+
+
 def write_output_csv(path: str, ranked: list[dict], order_labels: list[str]) -> None:
     with open(path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["Rank", "Player", "Age", "Form", "Exp", "Spec"]
-                        + order_labels + ["Avg", "Best"])
-        for rank, entry in enumerate(ranked, start=1):
-            writer.writerow(
-                [rank, entry["name"], entry["age"], entry["form"], entry["experience"],
-                 entry["specialty"]]
-                + [f"{entry['totals'][label]:.4f}" for label in order_labels]
-                + [f"{entry['average']:.4f}", entry["best_order"]]
-            )
+        write_delimited(f, output_columns(order_labels), iter_output_rows(ranked, order_labels))
 
 
 def main(argv: list[str] | None = None) -> None:
     parser = argparse.ArgumentParser(
         description="Rank players from a CSV export by rating contribution for a position.")
-    parser.add_argument("csv_file", help="semicolon-separated player export")
+    parser.add_argument("csv_file",
+                        help="semicolon-separated player export, optionally gzip, bz2 or zip "
+                             "compressed")
     parser.add_argument("position",
                         help="goalkeeper, wingback, central defender, inner midfielder, "
                              "winger or forward (case-insensitive; _ or - work as spaces)")
@@ -256,7 +809,33 @@ def main(argv: list[str] | None = None) -> None:
     parser.add_argument("--orders", default=None,
                         help="comma-separated orders to consider, e.g. \"normal,defensive\" "
                              "(default: all orders of the position)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="table",
+                        help="stdout format; everything but table is streamed row by row "
+                             "(binary-columnar is read back with rank_players.read_columnar)")
+    parser.add_argument("--numeric", action="store_true",
+                        help="machine-readable formats only: emit numeric columns unformatted "
+                             "(PlayerID and AgeDays instead of name and age, Best as an order index)")
+    parser.add_argument("--project-to", default=None, metavar="AGE",
+                        help="rank by the order totals each player reaches by this age "
+                             "(years.days, e.g. 23.0) under the training optimizer")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes used for --project-to (default 1)")
+    parser.add_argument("--profile", action="store_true",
+                        help="print per-phase times, hot-function call counts, cache hit rates "
+                             "and peak memory to stderr")
+    parser.add_argument("--profile-dump", default=None, metavar="FILE",
+                        help="also write a cProfile dump of the run to FILE (implies --profile)")
     args = parser.parse_args(argv)
+    if args.numeric and args.format == "table":
+        parser.error("--numeric needs a machine-readable --format")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    project_to = None
+    if args.project_to is not None:
+        try:
+            project_to = Age.parse(args.project_to)
+        except ValueError:
+            parser.error(f"bad --project-to age {args.project_to!r}; expected years.days")
 
     order_labels = None
     if args.orders:
@@ -268,22 +847,40 @@ def main(argv: list[str] | None = None) -> None:
     except ValueError as exc:
         parser.error(str(exc))
 
-    players, warnings = parse_players(args.csv_file)
-    for warning in warnings:
-        print(f"warning: {warning}", file=sys.stderr)
-
-    try:
-        ranked = rank_players(players, position, weights,
-                              use_form=not args.ignore_form, orders=order_labels)
-    except ValueError as exc:
-        parser.error(str(exc))
-
-    if order_labels is None:
-        order_labels = list(POSITION_ORDERS[position])
-    print(format_table(ranked, order_labels))
-    if args.out:
-        write_output_csv(args.out, ranked, order_labels)
-        print(f"\nwrote {args.out}", file=sys.stderr)
+    with profiling.profiler_for(args.profile, args.profile_dump) as profiler:
+        with profiling.phase("parse"):
+            table, warnings = parse_player_table(args.csv_file)
+        for warning in warnings:
+            print(f"warning: {warning}", file=sys.stderr)
+        if project_to is not None:
+            for row in range(len(table)):
+                if age_in_days(table.age(row)) < 0:
+                    print(f"warning: {table.name(row)}: unreadable age {table.age(row)}; ranked on "
+                          f"current skills instead of projected to {args.project_to}", file=sys.stderr)
+
+        try:
+            with profiling.phase("rank"):
+                ranked = rank_table(table, position, weights,
+                                    use_form=not args.ignore_form, orders=order_labels,
+                                    project_to=project_to, workers=args.workers)
+        except ValueError as exc:
+            parser.error(str(exc))
+
+        if order_labels is None:
+            order_labels = list(POSITION_ORDERS[position])
+        with profiling.phase("output"):
+            if args.format == "table":
+                print(format_table(ranked, order_labels))
+            elif args.format == "binary-columnar":
+                write_ranking(sys.stdout.buffer, args.format, ranked, order_labels, args.numeric)
+                sys.stdout.buffer.flush()
+            else:
+                write_ranking(sys.stdout, args.format, ranked, order_labels, args.numeric)
+            if args.out:
+                write_output_csv(args.out, ranked, order_labels)
+                print(f"\nwrote {args.out}", file=sys.stderr)
+    if profiler is not None:
+        print(profiler.report(), file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -70,19 +70,7 @@ def calculate_team_ratings(players: dict[str, dict]) -> dict[str, float]:
         "RF": 0.,
     }
 
-    overcrowding = {
-        "IM": 0,
-        "CD": 0,
-        "FW": 0,
-    }
-
-    for player in players.keys():
-        if "IM" in player:
-            overcrowding["IM"] += 1
-        elif "CD" in player:
-            overcrowding["CD"] += 1 
-        elif "FW" in player or "FTW" in player or "DF" in player:
-            overcrowding["FW"] += 1
+    overcrowding = count_overcrowding(players.keys())
 
     for sector in team_ratings.keys():
         rating = 0.
@@ -97,6 +85,30 @@ def calculate_team_ratings(players: dict[str, dict]) -> dict[str, float]:
     
     return team_ratings
 
+def count_overcrowding(positions) -> dict[str, int]:
+    """Count the players in each overcrowding group (inner midfield, central defence, forwards).
+
+    Args:
+        positions: The position codes of the lineup.
+
+    Returns:
+        dict[str, int]: Player counts keyed by "IM", "CD" and "FW".
+    """
+    overcrowding = {
+        "IM": 0,
+        "CD": 0,
+        "FW": 0,
+    }
+
+    for player in positions:
+        if "IM" in player:
+            overcrowding["IM"] += 1
+        elif "CD" in player:
+            overcrowding["CD"] += 1 
+        elif "FW" in player or "FTW" in player or "DF" in player:
+            overcrowding["FW"] += 1
+    return overcrowding
+
 def get_overcowding_factor(position: str, overcrowding: dict[str, int]) -> float:
     """Calculate the overcrowding factor for a given position.
 
@@ -0,0 +1,322 @@
+"""Local HTTP/JSON service for player ranking and training optimization.
+
+A long-running asyncio server, so callers stop paying interpreter start-up and
+table construction on every request. CPU-bound work runs in a process pool
+(or, with --threads, a thread pool) whose workers keep the contribution
+tables and the size-capped training cache (see optimization.TrainingCache)
+warm between requests. Identical concurrent requests share one computation,
+recent results are answered from an LRU cache, and GET /metrics reports
+latency and queue depth.
+
+Endpoints:
+    POST /rank      JSON {"csv": "<export text>", "position": ..., "weights": ...,
+                    "orders": [...], "ignore_form": false}, or a raw text/csv body
+                    with the options in the query string (?position=winger&weights=RF=2)
+    POST /optimize  one optimization job, see optimization.parse_job
+    GET  /metrics   request counts, latency percentiles, cache and pool state
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+import urllib.parse
+
+import optimization
+import rank_players
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+ENDPOINTS = ("/rank", "/optimize", "/metrics")
+LATENCY_WINDOW = 1024
+
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def rank_csv(csv_text: str, position: str, weights: dict[str, float],
+             orders: list[str] | None, use_form: bool) -> dict:
+    """Worker task: parse an export held in memory and rank it."""
+    players, warnings = rank_players.read_players(io.StringIO(csv_text))
+    ranked = rank_players.rank_players(players, position, weights,
+                                       use_form=use_form, orders=orders)
+    return {
+        "position": position,
+        "orders": orders or list(rank_players.POSITION_ORDERS[position]),
+        "warnings": warnings,
+        "ranking": [
+            {"rank": rank, "name": entry["name"], "age": entry["age"], "form": entry["form"],
+             "experience": entry["experience"], "specialty": entry["specialty"],
+             "totals": entry["totals"], "average": entry["average"],
+             "best_order": entry["best_order"]}
+            for rank, entry in enumerate(ranked, start=1)
+        ],
+    }
+
+
+class Metrics:
+    """Per-endpoint request counts and a sliding window of latencies."""
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.errors = collections.Counter()
+        self.latencies = collections.defaultdict(
+            lambda: collections.deque(maxlen=LATENCY_WINDOW))
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        self.counts[endpoint] += 1
+        if not ok:
+            self.errors[endpoint] += 1
+        self.latencies[endpoint].append(seconds * 1000.)
+
+    def snapshot(self) -> dict:
+        report = {}
+        for endpoint, count in self.counts.items():
+            window = sorted(self.latencies[endpoint])
+            report[endpoint] = {
+                "count": count,
+                "errors": self.errors[endpoint],
+                "mean_ms": sum(window) / len(window),
+                "p50_ms": window[len(window) // 2],
+                "p95_ms": window[min(len(window) - 1, int(len(window) * 0.95))],
+                "max_ms": window[-1],
+            }
+        return report
+
+
+class Service:
+    """Request routing, coalescing and caching in front of an executor."""
+
+    def __init__(self, executor: concurrent.futures.Executor, workers: int,
+                 cache_size: int = 256, cache_ttl: float = 300.):
+        self.executor = executor
+        self.workers = workers
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.cache = collections.OrderedDict()  # key -> (expires_at, result)
+        self.in_flight = {}  # key -> asyncio.Task shared by identical requests
+        self.queue_depth = 0
+        self.stats = collections.Counter()
+        self.metrics = Metrics()
+
+    async def submit(self, endpoint: str, fn, *args):
+        """Run fn(*args) in the pool, sharing in-flight work and cached results."""
+        key = hashlib.sha256(
+            json.dumps([endpoint, args], sort_keys=True).encode()).hexdigest()
+        cached = self.cache.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                self.cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return cached[1]
+            del self.cache[key]
+        self.stats["cache_misses"] += 1
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(key, fn, args))
+            self.in_flight[key] = task
+        else:
+            self.stats["coalesced"] += 1
+        # shield: one caller disconnecting must not cancel the shared computation
+        return await asyncio.shield(task)
+
+    async def _run(self, key: str, fn, args: tuple):
+        loop = asyncio.get_running_loop()
+        self.queue_depth += 1
+        try:
+            result = await loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            self.queue_depth -= 1
+            del self.in_flight[key]
+        self.cache[key] = (time.monotonic() + self.cache_ttl, result)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+    async def dispatch(self, method: str, target: str, headers: dict, body: bytes) -> dict:
+        url = urllib.parse.urlsplit(target)
+        routes = {
+            "/rank": ("POST", self.handle_rank),
+            "/optimize": ("POST", self.handle_optimize),
+            "/metrics": ("GET", self.handle_metrics),
+        }
+        if url.path not in routes:
+            raise HTTPError(404, f"no such endpoint {url.path}")
+        allowed, handler = routes[url.path]
+        if method != allowed:
+            raise HTTPError(405, f"{url.path} only accepts {allowed}")
+        query = dict(urllib.parse.parse_qsl(url.query))
+        return await handler(query, headers, body)
+
+    async def handle_rank(self, query: dict, headers: dict, body: bytes) -> dict:
+        if headers.get("content-type", "").startswith("text/csv"):
+            options = dict(query)
+            try:
+                options["csv"] = body.decode("utf-8")
+            except UnicodeDecodeError as exc:
+                raise HTTPError(400, f"CSV body is not UTF-8: {exc}")
+            options["ignore_form"] = query.get("ignore_form", "").lower() in ("1", "true", "yes")
+        else:
+            options = parse_json(body)
+        if not isinstance(options, dict):
+            raise HTTPError(400, "ranking request must be a JSON object")
+        try:
+            position = rank_players.normalize_position(str(options["position"]))
+            weights = options.get("weights")
+            if isinstance(weights, dict):
+                weights = ",".join(f"{sector}={value}" for sector, value in weights.items())
+            weights = rank_players.parse_weights(weights)
+            orders = options.get("orders")
+            if isinstance(orders, str):
+                orders = orders.split(",")
+            if orders is not None:
+                orders = [label.strip().lower() for label in orders]
+            csv_text = options["csv"]
+        except KeyError as exc:
+            raise HTTPError(400, f"missing field {exc}")
+        except (TypeError, ValueError) as exc:
+            raise HTTPError(400, str(exc))
+        try:
+            return await self.submit("rank", rank_csv, csv_text, position, weights, orders,
+                                     not options.get("ignore_form", False))
+        except ValueError as exc:
+            raise HTTPError(400, str(exc))
+
+    async def handle_optimize(self, query: dict, headers: dict, body: bytes) -> dict:
+        job = parse_json(body)
+        if not isinstance(job, dict):
+            raise HTTPError(400, "optimization job must be a JSON object")
+        try:
+            optimization.parse_job(job)
+        except ValueError as exc:
+            raise HTTPError(400, str(exc))
+        # the job id is not part of the computation, so it must not defeat coalescing
+        spec = {key: value for key, value in job.items() if key != "id"}
+        try:
+            result = await self.submit("optimize", optimization.run_job, spec)
+        except ValueError as exc:
+            raise HTTPError(400, str(exc))
+        if "id" in job:
+            result = {"id": job["id"], **result}
+        return result
+
+    async def handle_metrics(self, query: dict, headers: dict, body: bytes) -> dict:
+        return {
+            "endpoints": self.metrics.snapshot(),
+            "queue_depth": self.queue_depth,
+            "in_flight": len(self.in_flight),
+            "workers": self.workers,
+            "cache": {"size": len(self.cache), "hits": self.stats["cache_hits"],
+                      "misses": self.stats["cache_misses"]},
+            "coalesced": self.stats["coalesced"],
+        }
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        started = time.monotonic()
+        endpoint = "?"
+        status = 200
+        try:
+            try:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                try:
+                    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    raise HTTPError(400, "malformed request line")
+                endpoint = urllib.parse.urlsplit(target).path
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    raise HTTPError(400, "bad Content-Length")
+                if length > MAX_BODY_BYTES:
+                    raise HTTPError(413, f"body larger than {MAX_BODY_BYTES} bytes")
+                body = await reader.readexactly(length) if length else b""
+                payload = await self.dispatch(method, target, headers, body)
+            except HTTPError as exc:
+                status, payload = exc.status, {"error": str(exc)}
+            except asyncio.IncompleteReadError:
+                status, payload = 400, {"error": "body shorter than Content-Length"}
+            except Exception as exc:  # keep serving; report the failure to the caller
+                status, payload = 500, {"error": f"{type(exc).__name__}: {exc}"}
+            data = json.dumps(payload).encode()
+            writer.write(
+                f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + data)
+            await writer.drain()
+        finally:
+            writer.close()
+            if endpoint in ENDPOINTS:
+                self.metrics.record(endpoint, time.monotonic() - started, status < 400)
+
+
+def parse_json(body: bytes):
+    try:
+        return json.loads(body or b"null")
+    except ValueError as exc:
+        raise HTTPError(400, f"invalid JSON body: {exc}")
+
+
+async def serve(host: str, port: int, workers: int, cache_size: int, cache_ttl: float,
+                threads: bool = False) -> None:
+    with optimization.worker_pool(workers, threads) as executor:
+        service = Service(executor, workers, cache_size=cache_size, cache_ttl=cache_ttl)
+        server = await asyncio.start_server(service.handle_connection, host, port)
+        address = server.sockets[0].getsockname()
+        kind = "threads" if threads else "workers"
+        print(f"serving on http://{address[0]}:{address[1]} with {workers} {kind}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Serve player ranking and training optimization over local HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="interface to bind (default: loopback only)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes for ranking and optimization")
+    parser.add_argument("--threads", action="store_true",
+                        help="run the workers as threads of the server process, sharing its warm "
+                             "caches (parallel only on a free-threaded Python)")
+    parser.add_argument("--cache-size", type=int, default=256,
+                        help="number of recent results to keep")
+    parser.add_argument("--cache-ttl", type=float, default=300.,
+                        help="seconds a cached result stays valid")
+    args = parser.parse_args(argv)
+    if args.threads and args.workers > 1 and optimization.gil_enabled():
+        print("warning: the GIL is enabled, so --threads runs one request at a time; "
+              "use worker processes or a free-threaded Python", file=sys.stderr)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.cache_size, args.cache_ttl,
+                          args.threads))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Find the players whose skill profile for an order is most like a given player's.
+
+Each player becomes a point with one coordinate per skill the order is rated
+on: that skill's share of the order total at full form, i.e.
+coefficient * (level - 1)**1.2 with the sector-weighted coefficients of
+optimization.skill_coefficients divided by 4 (the coordinates add up to the
+order total without form and experience). Skills the order ignores are left
+out, so distances only reflect what matters for the order.
+
+The points go into a k-d tree: nodes split their rows at the median of the
+widest coordinate until at most LEAF_SIZE rows remain. A k-nearest-neighbour
+query descends toward the target first and skips every subtree whose
+splitting plane is farther away than the k-th best match found so far, so it
+reads a small part of the tree instead of scoring every player. Age and form
+filters are checked on the rows the search reaches.
+"""
+
+import argparse
+import array
+import heapq
+import math
+import sys
+
+import optimization
+import rank_players
+
+SKILLS = list(rank_players.SKILL_COLUMNS.values())
+LEAF_SIZE = 32
+
+
+def profile_coefficients(order_code: str, weights: dict[str, float]) -> dict[str, float]:
+    """{skill: coefficient} of the skills an order is rated on (form 1, divided by 4 like order_total)."""
+    coefficients = {}
+    for skill, terms in optimization.skill_coefficients(order_code).items():
+        coefficient = sum(weights[sector] * value for sector, value in terms) / 4.0
+        if coefficient:
+            coefficients[skill] = coefficient
+    return coefficients
+
+
+class SimilarityIndex:
+    """k-d tree over the contribution profiles of a PlayerTable's players for one order."""
+
+    def __init__(self, table: rank_players.PlayerTable, order_code: str,
+                 weights: dict[str, float], leaf_size: int = LEAF_SIZE):
+        self.table = table
+        coefficients = profile_coefficients(order_code, weights)
+        self.skills = [skill for skill in SKILLS if skill in coefficients]
+        self.coefficients = [coefficients[skill] for skill in self.skills]
+        self.columns = [array.array("d", (coefficient * max(level - 1.0, 0.0) ** 1.2
+                                          for level in table.skills[skill]))
+                        for skill, coefficient in zip(self.skills, self.coefficients)]
+        self.rows = array.array("l", range(len(table)))
+        # node i covers rows[start[i]:stop[i]]; inner nodes split on dim at value
+        self.start = array.array("l")
+        self.stop = array.array("l")
+        self.dim = array.array("l")
+        self.split = array.array("d")
+        self.left = array.array("l")
+        self.right = array.array("l")
+        if len(table):
+            self._build(leaf_size)
+
+    def _new_node(self, start: int, stop: int) -> int:
+        self.start.append(start)
+        self.stop.append(stop)
+        self.dim.append(-1)
+        self.split.append(0.0)
+        self.left.append(-1)
+        self.right.append(-1)
+        return len(self.start) - 1
+
+    def _build(self, leaf_size: int) -> None:
+        pending = [self._new_node(0, len(self.rows))]
+        while pending:
+            node = pending.pop()
+            start, stop = self.start[node], self.stop[node]
+            if stop - start <= leaf_size or not self.columns:
+                continue
+            rows = self.rows[start:stop]
+            spreads = []
+            for column in self.columns:
+                values = [column[row] for row in rows]
+                spreads.append(max(values) - min(values))
+            dim = max(range(len(spreads)), key=spreads.__getitem__)
+            if spreads[dim] == 0.0:
+                continue
+            column = self.columns[dim]
+            rows = sorted(rows, key=column.__getitem__)
+            self.rows[start:stop] = array.array("l", rows)
+            middle = (start + stop) // 2
+            self.dim[node] = dim
+            self.split[node] = column[rows[middle - start]]
+            self.left[node] = self._new_node(start, middle)
+            self.right[node] = self._new_node(middle, stop)
+            pending.extend((self.left[node], self.right[node]))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def profile(self, skills: dict[str, float]) -> tuple[float, ...]:
+        """The point of a skill set in this index's coordinates."""
+        return tuple(coefficient * max(skills[skill] - 1.0, 0.0) ** 1.2
+                     for skill, coefficient in zip(self.skills, self.coefficients))
+
+    def row_profile(self, row: int) -> tuple[float, ...]:
+        return tuple(column[row] for column in self.columns)
+
+    def accepts(self, min_age: float | None = None, max_age: float | None = None,
+                min_form: float | None = None, exclude=()):
+        """A row filter for query(), or None when nothing is filtered. Ages are in years."""
+        if min_age is None and max_age is None and min_form is None and not exclude:
+            return None
+        table = self.table
+        excluded = set(exclude)
+
+        def accept(row):
+            if row in excluded:
+                return False
+            if min_form is not None and table.form[row] < min_form:
+                return False
+            if min_age is not None or max_age is not None:
+                years, days = table.years[row], table.days[row]
+                if years < 0:
+                    return False
+                age = years + max(days, 0) / 112
+                if (min_age is not None and age < min_age) or (max_age is not None and age > max_age):
+                    return False
+            return True
+        return accept
+
+    def query(self, point: tuple[float, ...], k: int = 10, accept=None) -> list[tuple[float, int]]:
+        """(distance, row) of the k accepted rows nearest to point, nearest first."""
+        if k <= 0 or not len(self.rows):
+            return []
+        columns = self.columns
+        best = []  # max-heap of (-squared distance, -row)
+        pending = [(0.0, 0)]
+        while pending:
+            plane, node = pending.pop()
+            if len(best) == k and plane >= -best[0][0]:
+                continue
+            dim = self.dim[node]
+            if dim < 0:
+                for row in self.rows[self.start[node]:self.stop[node]]:
+                    distance = 0.0
+                    for column, value in zip(columns, point):
+                        diff = column[row] - value
+                        distance += diff * diff
+                    if len(best) == k and (distance, row) >= (-best[0][0], -best[0][1]):
+                        continue
+                    if accept is not None and not accept(row):
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, -row))
+                    else:
+                        heapq.heapreplace(best, (-distance, -row))
+                continue
+            diff = point[dim] - self.split[node]
+            near, far = (self.left[node], self.right[node]) if diff < 0 else (self.right[node], self.left[node])
+            # far side is at least the squared distance to the splitting plane away
+            pending.append((max(plane, diff * diff), far))
+            pending.append((plane, near))
+        return [(math.sqrt(-distance), -row) for distance, row in sorted(best, reverse=True)]
+
+    def similar(self, row: int, k: int = 10, **filters) -> list[tuple[float, int]]:
+        """The k players most like the table's row `row` (never the player itself)."""
+        accept = self.accepts(exclude={row} | set(filters.pop("exclude", ())), **filters)
+        return self.query(self.row_profile(row), k, accept)
+
+
+def find_player(table: rank_players.PlayerTable, spec: str) -> int:
+    """Row of the player given by PlayerID or by full name (case-insensitive)."""
+    spec = spec.strip()
+    if spec.isdigit():
+        matches = [row for row in range(len(table)) if table.player_ids[row] == int(spec)]
+    else:
+        matches = [row for row in range(len(table)) if table.name(row).lower() == spec.lower()]
+    if not matches:
+        raise ValueError(f"no player {spec!r} in the export")
+    if len(matches) > 1:
+        raise ValueError(f"{len(matches)} players match {spec!r}; use the PlayerID")
+    return matches[0]
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="List the players whose skill profile for an order is closest to a player's.")
+    parser.add_argument("csv_file", help="semicolon-separated player export")
+    parser.add_argument("position", help="position of the order, e.g. wingback")
+    parser.add_argument("player", help="PlayerID or full name of the player to match")
+    parser.add_argument("--order", default="normal", help="order to compare profiles for (default: normal)")
+    parser.add_argument("-k", "--top", type=int, default=10, help="number of players to list")
+    parser.add_argument("--weights", default=None, help="sector weight overrides, e.g. MB=1.2,M=3")
+    parser.add_argument("--min-age", type=float, default=None, help="youngest age in years")
+    parser.add_argument("--max-age", type=float, default=None, help="oldest age in years")
+    parser.add_argument("--min-form", type=float, default=None, help="lowest form")
+    args = parser.parse_args(argv)
+
+    try:
+        position = rank_players.normalize_position(args.position)
+        weights = rank_players.parse_weights(args.weights)
+        order = args.order.strip().lower()
+        if order not in rank_players.POSITION_ORDERS[position]:
+            valid = ", ".join(rank_players.POSITION_ORDERS[position])
+            raise ValueError(f"unknown order {order!r} for {position}; valid orders: {valid}")
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    table, warnings = rank_players.parse_player_table(args.csv_file)
+    for warning in warnings:
+        print(f"warning: {warning}", file=sys.stderr)
+    try:
+        target = find_player(table, args.player)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    index = SimilarityIndex(table, rank_players.POSITION_ORDERS[position][order], weights)
+    matches = index.similar(target, args.top, min_age=args.min_age, max_age=args.max_age,
+                            min_form=args.min_form)
+    print(f"most like {table.name(target)} ({table.age(target)}) as {position} {order}:")
+    for rank, (distance, row) in enumerate(matches, start=1):
+        skills = "  ".join(f"{skill} {table.skills[skill][row]:g}" for skill in index.skills)
+        print(f"{rank:>3}  {table.name(row)}  {table.age(row)}  form {table.form[row]:g}  "
+              f"distance {distance:.3f}  {skills}")
+
+
+if __name__ == "__main__":
+    main()
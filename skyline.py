@@ -0,0 +1,120 @@
+"""Pareto frontier (skyline) of players across several position orders.
+
+A player is on the frontier when no other player is at least as good in every
+chosen (position, order) total and strictly better in one. The frontier is
+computed with sort-filter-skyline: points are visited by descending sum of
+objectives, so a point can only be dominated by one already on the frontier,
+and each point is compared against the frontier alone instead of every other
+player.
+"""
+
+import argparse
+import operator
+import sys
+
+import rank_players
+
+
+def pareto_frontier(points: list[tuple[float, ...]]) -> list[int]:
+    """Indices of the non-dominated points (every objective maximized), best sum first.
+
+    Identical points do not dominate each other, so duplicates all stay.
+    """
+    order = sorted(range(len(points)), key=lambda i: sum(points[i]), reverse=True)
+    frontier = []
+    window = []  # frontier points; the last one to dominate something is moved to the front
+    ge = operator.ge
+    for i in order:
+        point = points[i]
+        for position, candidate in enumerate(window):
+            if all(map(ge, candidate, point)) and candidate != point:
+                if position:
+                    window.insert(0, window.pop(position))
+                break
+        else:
+            frontier.append(i)
+            window.append(point)
+    return frontier
+
+
+def parse_targets(specs: list[str]) -> list[tuple[str, str]]:
+    """Turn "position[:order]" specs into (position, order) pairs; no order means all of them."""
+    targets = []
+    for spec in specs:
+        position, _, order = spec.partition(":")
+        position = rank_players.normalize_position(position)
+        if order.strip():
+            orders = [order.strip().lower()]
+        else:
+            orders = list(rank_players.POSITION_ORDERS[position])
+        for label in orders:
+            if label not in rank_players.POSITION_ORDERS[position]:
+                valid = ", ".join(rank_players.POSITION_ORDERS[position])
+                raise ValueError(f"unknown order {label!r} for {position}; valid orders: {valid}")
+            if (position, label) not in targets:
+                targets.append((position, label))
+    return targets
+
+
+def objective_label(position: str, order: str) -> str:
+    return f"{position}/{order}"
+
+
+def skyline(players: list[dict], targets: list[tuple[str, str]],
+            weights: dict[str, float], use_form: bool = True) -> list[dict]:
+    """Players on the Pareto frontier of the targets' order totals, as rank_players-style entries.
+
+    Each entry's "totals" is keyed by "position/order"; entries come best sum first.
+    """
+    codes = [rank_players.POSITION_ORDERS[position][order] for position, order in targets]
+    labels = [objective_label(position, order) for position, order in targets]
+    points = []
+    for player in players:
+        form_mult = rank_players.form_multiplier(player["form"]) if use_form else 1.0
+        points.append(tuple(
+            rank_players.order_total(player["skills"], form_mult, code, weights,
+                                     exp=player["experience"])
+            for code in codes))
+    entries = []
+    for i in pareto_frontier(points):
+        entry = dict(players[i])
+        entry["totals"] = dict(zip(labels, points[i]))
+        entry["best_order"] = max(entry["totals"], key=entry["totals"].get)
+        entry["average"] = sum(points[i]) / len(points[i])
+        entries.append(entry)
+    return entries
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="List the players not dominated across several position orders.")
+    parser.add_argument("csv_file", help="semicolon-separated player export")
+    parser.add_argument("targets", nargs="+",
+                        help="objectives as position[:order], e.g. \"central defender:normal\" "
+                             "\"winger:offensive\" or just \"wingback\" for all its orders")
+    parser.add_argument("--weights", default=None, help="sector weight overrides, e.g. MB=1.2,M=3")
+    parser.add_argument("--ignore-form", action="store_true",
+                        help="treat every player as being at maximum form")
+    parser.add_argument("--out", default=None, help="also write the frontier to this CSV file")
+    args = parser.parse_args(argv)
+
+    try:
+        targets = parse_targets(args.targets)
+        weights = rank_players.parse_weights(args.weights)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    players, warnings = rank_players.parse_players(args.csv_file)
+    for warning in warnings:
+        print(f"warning: {warning}", file=sys.stderr)
+    entries = skyline(players, targets, weights, use_form=not args.ignore_form)
+    labels = [objective_label(position, order) for position, order in targets]
+    print(rank_players.format_table(entries, labels))
+    print(f"\n{len(entries)} of {len(players)} players on the frontier", file=sys.stderr)
+    if args.out:
+        rank_players.write_output_csv(args.out, entries, labels)
+        print(f"wrote {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import concurrent.futures
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import batch_optimize
+import optimization
+
+JOB = {
+    "age": [17, 0], "target_age": "17.50",
+    "skills": {skill: 5.0 for skill in optimization.SKILLS},
+    "position": "RW", "sector_weights": {"RF": 2.0},
+}
+
+
+class CountingExecutor(concurrent.futures.ThreadPoolExecutor):
+    """Thread pool that records the largest number of unfinished submissions."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.futures = []
+        self.peak = 0
+
+    def submit(self, fn, *args, **kwargs):
+        unfinished = sum(not future.done() for future in self.futures) + 1
+        self.peak = max(self.peak, unfinished)
+        future = super().submit(fn, *args, **kwargs)
+        self.futures.append(future)
+        return future
+
+
+class TestRunBatch(unittest.TestCase):
+    def run_lines(self, lines, max_pending=2):
+        out = io.StringIO()
+        with CountingExecutor(max_workers=2) as executor:
+            counts = batch_optimize.run_batch(lines, out, executor, max_pending)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        return records, counts, executor
+
+    def test_results_tagged_with_ids(self):
+        lines = [json.dumps(dict(JOB, id="a")), json.dumps(dict(JOB, position="LWB"))]
+        records, counts, _ = self.run_lines(lines)
+        self.assertEqual(counts, {"jobs": 2, "errors": 0})
+        by_id = {record["id"]: record for record in records}
+        self.assertEqual(set(by_id), {"a", 2})
+        self.assertEqual(by_id["a"]["sessions"], optimization.run_job(JOB)["sessions"])
+
+    def test_bad_lines_become_error_records(self):
+        lines = ["not json", "[1, 2]", "", json.dumps({"id": "x", "position": "RW"})]
+        records, counts, _ = self.run_lines(lines)
+        self.assertEqual(counts, {"jobs": 3, "errors": 3})
+        self.assertEqual({record["id"] for record in records}, {1, 2, "x"})
+        self.assertTrue(all("error" in record for record in records))
+
+    def test_unexpected_failure_becomes_error_record(self):
+        with mock.patch("optimization.run_job", side_effect=ZeroDivisionError("boom")):
+            record = batch_optimize.safe_run_job(dict(JOB, id="z"))
+        self.assertEqual(record, {"id": "z", "error": "ZeroDivisionError: boom"})
+
+    def test_job_time_budget_applies_to_jobs_without_one(self):
+        lines = [json.dumps(dict(JOB, id="own", time_budget=5)), json.dumps(dict(JOB, id="default"))]
+        budgets = {}
+
+        def run_job(job):
+            budgets[job["id"]] = job["time_budget"]
+            return {"id": job["id"]}
+
+        with mock.patch("optimization.run_job", run_job):
+            batch_optimize.run_batch(lines, io.StringIO(), batch_optimize.InlineExecutor(), 2,
+                                     job_time_budget=0.5)
+        self.assertEqual(budgets, {"own": 5, "default": 0.5})
+
+    def test_read_ahead_is_bounded(self):
+        lines = (json.dumps(dict(JOB, id=i)) for i in range(12))
+        records, counts, executor = self.run_lines(lines, max_pending=3)
+        self.assertEqual(counts["jobs"], 12)
+        self.assertEqual(sorted(record["id"] for record in records), list(range(12)))
+        self.assertLessEqual(executor.peak, 3)
+
+
+class TestMain(unittest.TestCase):
+    def test_file_in_file_out(self):
+        fd, jobs_path = tempfile.mkstemp(suffix=".jsonl")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(json.dumps(dict(JOB, id=1)) + "\n")
+        self.addCleanup(os.remove, jobs_path)
+        out_path = jobs_path + ".out"
+        self.addCleanup(os.remove, out_path)
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            batch_optimize.main([jobs_path, "--out", out_path, "--workers", "1"])
+        with open(out_path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["id"], 1)
+        self.assertIn("1 jobs, 0 errors", stderr.getvalue())
+
+    def test_thread_pool(self):
+        lines = [json.dumps(dict(JOB, id=i, target_age=f"17.{20 + i}")) for i in range(4)]
+        fd, jobs_path = tempfile.mkstemp(suffix=".jsonl")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        self.addCleanup(os.remove, jobs_path)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()) as stderr:
+            batch_optimize.main([jobs_path, "--workers", "2", "--threads"])
+        records = sorted((json.loads(line) for line in stdout.getvalue().splitlines()),
+                         key=lambda record: record["id"])
+        self.assertEqual(records, [optimization.run_job(json.loads(line)) for line in lines])
+        self.assertIn("4 jobs, 0 errors", stderr.getvalue())
+        if optimization.gil_enabled():
+            self.assertIn("warning: the GIL is enabled", stderr.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
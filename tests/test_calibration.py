@@ -0,0 +1,119 @@
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import unittest
+
+import calibration
+import training
+from age import Age
+
+
+def synthetic(params, n=3000, seed=0):
+    rng = random.Random(seed)
+    observations = calibration.Observations()
+    rows = []
+    for _ in range(n):
+        age = Age(rng.randint(17, 33), rng.randint(0, 111))
+        skill = rng.choice(training.TRAINING_TYPES)
+        level = rng.uniform(1, 23)
+        coaching = dict(coach=rng.randint(1, 5), assistant=rng.randint(0, 10),
+                        intensity=rng.choice([90, 100]), stamina=rng.choice([10, 20]),
+                        minutes=rng.choice([45, 90]))
+        gain = training.calculate_training(age, level, skill, params=params, **coaching)
+        observations.add(age, skill, level, gain, **coaching)
+        rows.append((age, skill, level, gain, coaching))
+    return observations, rows
+
+
+class TestEvaluate(unittest.TestCase):
+    def test_predictions_match_calculate_training(self):
+        params = dict(training.PARAMS, Defending=0.03, age_offset=36.0)
+        observations, rows = synthetic(params, n=500)
+        residuals, _ = calibration.evaluate(observations, training.PARAMS)
+        for residual, (age, skill, level, gain, coaching) in zip(residuals, rows):
+            expected = training.calculate_training(age, level, skill, **coaching)
+            self.assertAlmostEqual(residual + gain, expected, places=12)
+
+    def test_derivatives_match_finite_differences(self):
+        observations, _ = synthetic(training.PARAMS, n=300, seed=1)
+        names = calibration.FIT_DEFAULT + ("under_9_scale", "age_numerator", "drop_shift_over_20")
+        residuals, columns = calibration.evaluate(observations, training.PARAMS, names)
+        for name in names:
+            step = abs(training.PARAMS[name]) * 1e-6
+            shifted, _ = calibration.evaluate(
+                observations, dict(training.PARAMS, **{name: training.PARAMS[name] + step}))
+            for i in range(0, len(residuals), 7):
+                numeric = (shifted[i] - residuals[i]) / step
+                self.assertAlmostEqual(columns[name][i], numeric, delta=1e-4 * (1 + abs(numeric)),
+                                       msg=name)
+
+
+class TestFit(unittest.TestCase):
+    def test_recovers_perturbed_constants(self):
+        names = ("under_9_rate", "over_9_scale", "over_9_offset", "Winger", "Scoring",
+                 "age_offset")
+        true = dict(training.PARAMS, under_9_rate=-0.15, over_9_scale=52.0, over_9_offset=1.5,
+                    Winger=0.05, Scoring=0.03, age_offset=35.0)
+        observations, _ = synthetic(true)
+        params, info = calibration.fit(observations, names=names)
+        self.assertLess(info["rmse"], 1e-9)
+        for name in names:
+            self.assertAlmostEqual(params[name] / true[name], 1.0, places=6, msg=name)
+
+    def test_constants_without_observations_are_not_fitted(self):
+        observations = calibration.Observations()
+        observations.add(Age(18, 0), "Passing", 5.0, 0.2)
+        observations.add(Age(19, 0), "Passing", 6.0, 0.18)
+        _, info = calibration.fit(observations, names=("Passing", "Scoring"))
+        self.assertEqual(info["fitted"], ["Passing"])
+
+    def test_rejects_unfittable_constants(self):
+        observations, _ = synthetic(training.PARAMS, n=10)
+        with self.assertRaises(ValueError):
+            calibration.fit(observations, names=("drop_start",))
+        with self.assertRaises(ValueError):
+            calibration.fit(calibration.Observations())
+
+
+class TestParameterFiles(unittest.TestCase):
+    def test_round_trip_through_load_parameters(self):
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        params = dict(training.PARAMS, Defending=0.031)
+        calibration.write_parameters(path, params, {"rmse": 0.0})
+        loaded = training.load_parameters(path)
+        self.assertEqual(loaded, params)
+        effect = training.calculate_training(Age(18, 0), 7.0, "Defending", params=loaded)
+        self.assertGreater(effect, training.calculate_training(Age(18, 0), 7.0, "Defending"))
+
+    def test_load_rejects_other_versions(self):
+        fd, path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"format": training.PARAMETERS_FORMAT, "version": 99, "params": {}}, f)
+        self.addCleanup(os.remove, path)
+        with self.assertRaises(ValueError):
+            training.load_parameters(path)
+
+    def test_main_fits_observation_file(self):
+        _, rows = synthetic(dict(training.PARAMS, Passing=0.04), n=400)
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("Age;Skill;Level;Gain;Coach;Assistant;Intensity;Stamina;Minutes\n")
+            for age, skill, level, gain, c in rows:
+                f.write(f"{age.years}.{age.days};{skill};{level!r};{gain!r};{c['coach']};"
+                        f"{c['assistant']};{c['intensity']};{c['stamina']};{c['minutes']}\n")
+            f.write("17.0;Stamina;5;0.1;;;;;\n")
+        out = path + ".json"
+        self.addCleanup(os.remove, path)
+        self.addCleanup(os.remove, out)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            calibration.main([path, "--out", out, "--fit", "Passing"])
+        self.assertAlmostEqual(training.load_parameters(out)["Passing"], 0.04, places=9)
+
+
+if __name__ == "__main__":
+    unittest.main()
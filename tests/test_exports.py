@@ -0,0 +1,140 @@
+import asyncio
+import bz2
+import contextlib
+import gzip
+import io
+import os
+import tempfile
+import threading
+import unittest
+import zipfile
+from unittest import mock
+
+import exports
+import rank_players
+from tests.test_rank_players import FULL_ROW, FULL_ROW_2, write_csv
+
+
+def compressed_copy(path, kind, members=None):
+    with open(path, "rb") as f:
+        data = f.read()
+    fd, out = tempfile.mkstemp(suffix=".export")
+    os.close(fd)
+    if kind == "gzip":
+        with gzip.open(out, "wb") as f:
+            f.write(data)
+    elif kind == "bz2":
+        with bz2.open(out, "wb") as f:
+            f.write(data)
+    else:
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name in members or ["players.csv"]:
+                archive.writestr(name, data)
+    return out
+
+
+class TestOpenExport(unittest.TestCase):
+    def setUp(self):
+        rows = [FULL_ROW.replace("Ako", f"Ako{i}", 1) for i in range(2000)] + [FULL_ROW_2]
+        self.path = write_csv(rows)
+        self.addCleanup(os.remove, self.path)
+        self.expected = rank_players.parse_players(self.path)
+
+    def copy(self, kind, members=None):
+        path = compressed_copy(self.path, kind, members)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_compressed_exports_parse_like_plain(self):
+        self.assertIsNone(exports.detect_compression(self.path))
+        for kind in ("gzip", "bz2", "zip"):
+            path = self.copy(kind)
+            self.assertEqual(exports.detect_compression(path), kind)
+            self.assertEqual(rank_players.parse_players(path), self.expected)
+
+    def test_small_chunks_and_queue(self):
+        path = self.copy("gzip")
+        with exports.open_export(path, chunk_size=7, max_chunks=1) as f:
+            players, _ = rank_players.read_players(f)
+        self.assertEqual(players, self.expected[0])
+
+    def test_closing_early_stops_the_background_thread(self):
+        path = self.copy("bz2")
+        before = threading.active_count()
+        with exports.open_export(path, chunk_size=16, max_chunks=1) as f:
+            f.readline()
+        self.assertEqual(threading.active_count(), before)
+
+    def test_small_reads_return_every_byte(self):
+        data = bytes(range(256)) * 40
+        reader = exports.QueueReader(io.BytesIO(data), chunk_size=1000)
+        self.addCleanup(reader.close)
+        pieces = []
+        buffer = bytearray(3)
+        while True:
+            size = reader.readinto(buffer)
+            if not size:
+                break
+            pieces.append(bytes(buffer[:size]))
+        self.assertEqual(b"".join(pieces), data)
+        self.assertTrue(all(len(piece) <= 3 for piece in pieces))
+
+    def test_raw_file_closed_when_the_reader_cannot_start(self):
+        path = self.copy("gzip")
+        opened = []
+        real_open = gzip.open
+
+        def tracking_open(*args, **kwargs):
+            opened.append(real_open(*args, **kwargs))
+            return opened[-1]
+
+        with mock.patch("gzip.open", tracking_open), \
+                mock.patch.object(threading.Thread, "start", side_effect=RuntimeError("no threads")):
+            with self.assertRaises(RuntimeError):
+                with exports.open_export(path):
+                    pass
+        self.assertTrue(opened[0].closed)
+
+    def test_zip_member_choice(self):
+        path = self.copy("zip", ["notes.txt", "players.csv"])
+        self.assertEqual(rank_players.parse_players(path), self.expected)
+        path = self.copy("zip", ["a.csv", "b.csv"])
+        with self.assertRaises(ValueError):
+            rank_players.parse_players(path)
+
+    def test_corrupt_data_raises_in_reader(self):
+        path = self.copy("gzip")
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) // 2)
+        with self.assertRaises(EOFError):
+            rank_players.parse_players(path)
+
+
+class TestLoadExports(unittest.TestCase):
+    def test_loads_many_archives_in_order(self):
+        paths = []
+        for i in range(5):
+            plain = write_csv([FULL_ROW.replace("Ako", f"Week{i}", 1)])
+            self.addCleanup(os.remove, plain)
+            paths.append(compressed_copy(plain, ("gzip", "bz2", "zip")[i % 3]))
+            self.addCleanup(os.remove, paths[-1])
+        results = asyncio.run(rank_players.load_exports(paths, concurrency=2))
+        self.assertEqual([players[0]["name"] for players, _ in results],
+                         [f"Week{i} Jansons" for i in range(5)])
+        tables = asyncio.run(rank_players.load_exports(paths, table=True))
+        self.assertEqual([table[0]["name"] for table, _ in tables],
+                         [f"Week{i} Jansons" for i in range(5)])
+
+    def test_cli_reads_compressed_export(self):
+        plain = write_csv([FULL_ROW, FULL_ROW_2])
+        self.addCleanup(os.remove, plain)
+        path = compressed_copy(plain, "gzip")
+        self.addCleanup(os.remove, path)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            rank_players.main([path, "wingback"])
+        self.assertIn("Ako Jansons", stdout.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import history
+from tests.test_rank_players import FULL_ROW, base_skills, write_csv
+
+
+def player(player_id, name="P", age="20.10", form=6.0, **skills):
+    return {"player_id": player_id, "name": name, "age": age, "form": form, "experience": 3.0,
+            "specialty": "", "skills": base_skills(**skills)}
+
+
+class TestHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def test_unchanged_players_are_not_appended(self):
+        store = history.HistoryStore(self.path)
+        store.ingest([player(1, Defending=10.0), player(2, Winger=8.0)], week=1)
+        stats = store.ingest([player(1, age="20.17", Defending=10.0),
+                              player(2, Winger=8.4)], week=2)
+        self.assertEqual((stats["appended"], stats["unchanged"], stats["rows"]), (1, 1, 3))
+        self.assertEqual(store.weeks(), [(1, 0, 2), (2, 2, 1)])
+
+    def test_progression_and_popped_survive_reopening(self):
+        store = history.HistoryStore(self.path)
+        store.ingest([player(7, name="Ako", Defending=9.6), player(8, Passing=4.0)], week=1)
+        store.ingest([player(7, name="Ako", age="20.17", Defending=10.1),
+                      player(8, Passing=4.5)], week=2)
+        store.ingest([player(8, Passing=4.9, Scoring=2.0)], week=3)
+
+        store = history.HistoryStore(self.path)
+        progression = store.progression(7)
+        self.assertEqual([record["week"] for record in progression], [1, 2])
+        self.assertEqual([record["skills"]["Defending"] for record in progression], [9.6, 10.1])
+        self.assertEqual(progression[1]["age"], "20.17")
+        self.assertEqual(progression[1]["name"], "Ako")
+
+        self.assertEqual([(r["player_id"], r["popped"]) for r in store.popped(2)],
+                         [(7, ["Defending"])])
+        self.assertEqual([(r["player_id"], r["popped"]) for r in store.popped()],
+                         [(8, ["Scoring"])])
+        self.assertEqual(store.progression(99), [])
+
+    def test_weeks_must_increase_and_default_to_next(self):
+        store = history.HistoryStore(self.path)
+        self.assertEqual(store.ingest([player(1)])["week"], 0)
+        self.assertEqual(store.ingest([player(1, form=7.0)])["week"], 1)
+        with self.assertRaises(ValueError):
+            store.ingest([player(1)], week=1)
+        with self.assertRaises(ValueError):
+            store.popped(5)
+
+    def test_rows_without_id_are_skipped(self):
+        store = history.HistoryStore(self.path)
+        stats = store.ingest([player(None), player(3), player(3)], week=1)
+        self.assertEqual((stats["appended"], stats["skipped"], stats["duplicates"]), (1, 1, 1))
+
+    def test_interrupted_ingest_is_discarded(self):
+        store = history.HistoryStore(self.path)
+        store.ingest([player(1)], week=1)
+        # rows past meta.json's count, as left by a crash before meta was replaced
+        with open(os.path.join(self.path, "defending.col"), "ab") as f:
+            f.write(b"\0" * 64)
+        store = history.HistoryStore(self.path)
+        store.ingest([player(1, Defending=6.0)], week=2)
+        self.assertEqual([r["skills"]["Defending"] for r in store.progression(1)], [1.0, 6.0])
+
+    def test_crash_between_latest_and_meta_is_recovered(self):
+        store = history.HistoryStore(self.path)
+        store.ingest([player(1, name="Ako"), player(2)], week=1)
+        write_json = store._write_json
+
+        def crash_before_meta(name, data):
+            if name == "meta.json":
+                raise OSError("crashed")
+            write_json(name, data)
+
+        store._write_json = crash_before_meta
+        with self.assertRaises(OSError):
+            store.ingest([player(1, name="Ako", Defending=6.0), player(3)], week=2)
+
+        store = history.HistoryStore(self.path)
+        self.assertEqual(store.rows, 2)
+        self.assertEqual(sorted(store.latest), [1, 2])
+        self.assertEqual(store.latest[1]["row"], 0)
+        stats = store.ingest([player(1, name="Ako", Defending=7.0), player(2)], week=2)
+        self.assertEqual((stats["appended"], stats["unchanged"]), (1, 1))
+        progression = store.progression(1)
+        self.assertEqual([r["skills"]["Defending"] for r in progression], [1.0, 7.0])
+        self.assertEqual(progression[1]["name"], "Ako")
+
+    def test_ingest_appends_to_the_log_and_compacts(self):
+        store = history.HistoryStore(self.path)
+        store.ingest([player(player_id) for player_id in range(1, 51)], week=0)
+        log_path = os.path.join(self.path, "latest.log")
+        first_ingest = os.path.getsize(log_path)
+        for week in range(1, history.LOG_COMPACT_INGESTS - 1):
+            before = os.path.getsize(log_path)
+            store.ingest([player(1, form=float(week % 7 + 1))], week=week)
+            # only the changed player is written, never the whole map
+            self.assertLess(os.path.getsize(log_path) - before, first_ingest / 10)
+        self.assertFalse(os.path.exists(os.path.join(self.path, "latest.json")))
+        self.assertEqual(history.HistoryStore(self.path).latest, store.latest)
+        store.ingest([player(2, form=3.0)], week=history.LOG_COMPACT_INGESTS)
+        self.assertEqual(os.path.getsize(log_path), 0)
+        reopened = history.HistoryStore(self.path)
+        self.assertEqual(reopened.latest, store.latest)
+        self.assertEqual([r["form"] for r in reopened.progression(2)], [6.0, 3.0])
+
+    def test_reads_a_latest_json_without_log(self):
+        store = history.HistoryStore(self.path)
+        store.ingest([player(1), player(2)], week=1)
+        # the layout before latest.log: latest.json is the whole map
+        with open(os.path.join(self.path, "latest.json"), "w", encoding="utf-8") as f:
+            json.dump({str(player_id): record for player_id, record in store.latest.items()}, f)
+        os.remove(os.path.join(self.path, "latest.log"))
+        store = history.HistoryStore(self.path)
+        store.ingest([player(2, form=3.0)], week=2)
+        self.assertEqual(history.HistoryStore(self.path).latest[2]["row"], 2)
+
+
+class TestMain(unittest.TestCase):
+    def test_ingest_and_query(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        first = write_csv([FULL_ROW])
+        second = write_csv([FULL_ROW.replace("15.3045", "16.1")])
+        self.addCleanup(os.remove, first)
+        self.addCleanup(os.remove, second)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+            history.main(["ingest", path, first, "--week", "4"])
+            history.main(["ingest", path, second])
+            history.main(["popped", path])
+        out = stdout.getvalue()
+        self.assertIn("week 5: 1 rows appended", out)
+        self.assertIn("popped: Defending", out)
+
+
+if __name__ == "__main__":
+    unittest.main()
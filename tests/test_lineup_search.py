@@ -0,0 +1,161 @@
+import contextlib
+import io
+import itertools
+import os
+import random
+import unittest
+
+import lineup_search
+import ratings
+from tests.test_player_index import random_players
+from tests.test_rank_players import ALL_ONE_WEIGHTS, write_csv
+
+
+def brute_force(squad, formation, weights):
+    """Best weighted team rating over every player and order choice, via ratings directly."""
+    best = float("-inf")
+    codes = [lineup_search.SLOT_ORDERS[slot] for slot in formation]
+    for players in itertools.permutations(range(len(squad)), len(formation)):
+        for orders in itertools.product(*codes):
+            team = ratings.calculate_team_ratings(
+                {code: squad[player] for code, player in zip(orders, players)})
+            best = max(best, sum(weights[sector] * team[sector] for sector in team))
+    return best
+
+
+def weighted_team_rating(squad, lineup, weights):
+    team = ratings.calculate_team_ratings({code: squad[player] for _, player, code in lineup})
+    return sum(weights[sector] * team[sector] for sector in team)
+
+
+FOUR_FOUR_TWO = ("GK", "LWB", "RWB", "LCD", "RCD", "LW", "RW", "LIM", "RIM", "LFW", "RFW")
+
+
+class TestAssign(unittest.TestCase):
+    def test_matches_permutations(self):
+        rng = random.Random(4)
+        for rows, columns in ((1, 1), (3, 3), (3, 6), (5, 7)):
+            values = [[rng.uniform(-5, 5) for _ in range(columns)] for _ in range(rows)]
+            total, chosen = lineup_search.assign(values)
+            self.assertEqual(len(set(chosen)), rows)
+            self.assertAlmostEqual(total, sum(values[row][chosen[row]] for row in range(rows)))
+            expected = max(sum(values[row][column] for row, column in enumerate(permutation))
+                           for permutation in itertools.permutations(range(columns), rows))
+            self.assertAlmostEqual(total, expected)
+
+
+class TestFormations(unittest.TestCase):
+    def test_every_formation_has_eleven_slots(self):
+        formations = lineup_search.enumerate_formations()
+        self.assertEqual(len(formations), len(set(formations)))
+        for formation in formations:
+            self.assertEqual(len(formation), 11)
+            self.assertEqual(len(set(formation)), 11)
+            self.assertEqual(formation[0], "GK")
+        labels = {lineup_search.formation_label(formation) for formation in formations}
+        self.assertTrue({"4-4-2", "3-5-2", "5-5-0", "2-5-3", "4-3-3"} <= labels)
+        self.assertNotIn("2-4-4", labels)
+
+    def test_mirror(self):
+        self.assertEqual(lineup_search.mirror("LIMTW"), "RIMTW")
+        self.assertEqual(lineup_search.mirror("RWBD"), "LWBD")
+        self.assertEqual(lineup_search.mirror("IMO"), "IMO")
+        self.assertEqual(lineup_search.SLOT_ORDERS["RW"], ("RW", "RWD", "RWO", "RWTM"))
+        self.assertEqual(lineup_search.mirror_formation(FOUR_FOUR_TWO), tuple(sorted(FOUR_FOUR_TWO)))
+
+    def test_contribution_vector_matches_team_ratings(self):
+        skills = random_players(1, seed=9)[0]["skills"]
+        vector = lineup_search.contribution_vector(skills, "LWO", 1.0)
+        team = ratings.calculate_team_ratings({"LWO": skills})
+        for sector, total in zip(lineup_search.SECTORS, vector):
+            self.assertAlmostEqual(lineup_search.sector_rating(total) / 4. + 1., team[sector])
+
+
+class TestFormationSearch(unittest.TestCase):
+    def test_matches_brute_force(self):
+        formation = ("GK", "CD", "LW", "FW")
+        for seed, weights in ((1, ALL_ONE_WEIGHTS), (2, dict(ALL_ONE_WEIGHTS, M=3.0, RB=0.5))):
+            squad = [player["skills"] for player in random_players(6, seed=seed)]
+            value, lineup = lineup_search.FormationSearch(squad, formation, weights).run()
+            self.assertAlmostEqual(value, brute_force(squad, formation, weights))
+            self.assertAlmostEqual(value, weighted_team_rating(squad, lineup, weights))
+
+    def test_floor_above_best_finds_nothing(self):
+        squad = [player["skills"] for player in random_players(12, seed=3)]
+        search = lineup_search.FormationSearch(squad, FOUR_FOUR_TWO, ALL_ONE_WEIGHTS)
+        search.gradient_lineup()
+        floor = search.best + 5.
+        self.assertEqual(lineup_search.FormationSearch(squad, FOUR_FOUR_TWO, ALL_ONE_WEIGHTS)
+                         .run(floor), (floor, None))
+
+    def test_player_worse_than_eleven_others_is_dropped(self):
+        squad = [player["skills"] for player in random_players(12, seed=5)]
+        squad.append({skill: 1.0 for skill in squad[0]})
+        search = lineup_search.FormationSearch(squad, FOUR_FOUR_TWO, ALL_ONE_WEIGHTS)
+        self.assertEqual(search.players, list(range(12)))
+
+
+class TestBestLineup(unittest.TestCase):
+    def test_result_is_a_real_lineup(self):
+        squad = [player["skills"] for player in random_players(14, seed=6)]
+        formations = [f for f in lineup_search.enumerate_formations()
+                      if lineup_search.formation_label(f) in ("4-4-2", "3-5-2")]
+        result = lineup_search.best_lineup(squad, ALL_ONE_WEIGHTS, formations=formations)
+        self.assertIn(result["formation"], ("4-4-2", "3-5-2"))
+        self.assertEqual(len({player for _, player, _ in result["lineup"]}), 11)
+        self.assertEqual(result["lineup"][0][0], "GK")
+        self.assertAlmostEqual(result["objective"],
+                               weighted_team_rating(squad, result["lineup"], ALL_ONE_WEIGHTS))
+        for formation in formations:
+            search = lineup_search.FormationSearch(squad, formation, ALL_ONE_WEIGHTS)
+            search.gradient_lineup()
+            self.assertLessEqual(search.best, result["objective"] + 1e-9)
+
+    def test_symmetric_weights_search_one_of_each_mirror_pair(self):
+        squad = [player["skills"] for player in random_players(11, seed=8)]
+        formations = [f for f in lineup_search.enumerate_formations()
+                      if lineup_search.formation_label(f) == "4-5-1"]
+        symmetric = lineup_search.best_lineup(squad, ALL_ONE_WEIGHTS, formations=formations)
+        self.assertLess(symmetric["formations"], len(formations))
+        lopsided = lineup_search.best_lineup(squad, dict(ALL_ONE_WEIGHTS, LF=1.5),
+                                             formations=formations)
+        self.assertEqual(lopsided["formations"], len(formations))
+        self.assertAlmostEqual(
+            lopsided["objective"],
+            weighted_team_rating(squad, lopsided["lineup"], dict(ALL_ONE_WEIGHTS, LF=1.5)))
+
+    def test_workers_give_the_same_result(self):
+        squad = [player["skills"] for player in random_players(12, seed=10)]
+        formations = [FOUR_FOUR_TWO, lineup_search.enumerate_formations()[0]]
+        serial = lineup_search.best_lineup(squad, ALL_ONE_WEIGHTS, formations=formations)
+        parallel = lineup_search.best_lineup(squad, ALL_ONE_WEIGHTS, workers=2,
+                                             formations=formations)
+        self.assertAlmostEqual(serial["objective"], parallel["objective"])
+
+    def test_rejects_bad_input(self):
+        squad = [player["skills"] for player in random_players(10, seed=1)]
+        with self.assertRaises(ValueError):
+            lineup_search.best_lineup(squad, ALL_ONE_WEIGHTS)
+        with self.assertRaises(ValueError):
+            lineup_search.best_lineup(squad * 2, dict(ALL_ONE_WEIGHTS, M=-1.0))
+
+
+class TestMain(unittest.TestCase):
+    def test_prints_lineup(self):
+        rng = random.Random(2)
+        rows = [f"{i};First{i};;Last{i};{rng.randint(18, 30)};10;5;3;;6;7;"
+                + ";".join(f"{rng.randint(2, 16)}.0" for _ in range(7)) + ";"
+                for i in range(1, 13)]
+        path = write_csv(rows)
+        self.addCleanup(os.remove, path)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+            lineup_search.main([path, "--formation", "4-4-2"])
+        lines = stdout.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith("formation 4-4-2"))
+        self.assertEqual(len(lines), 13)
+        self.assertTrue(lines[1].split()[0] == "GK")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import contextlib
+import csv
+import io
+import os
+import unittest
+
+import marginals
+import rank_players
+from tests.test_player_index import random_players
+from tests.test_rank_players import ALL_ONE_WEIGHTS, FULL_ROW, FULL_ROW_2, write_csv
+
+
+def finite_difference(skills, form_mult, code, weights, skill, step=1e-6):
+    bumped = dict(skills, **{skill: skills[skill] + step})
+    return (rank_players.order_total(bumped, form_mult, code, weights)
+            - rank_players.order_total(skills, form_mult, code, weights)) / step
+
+
+class TestOrderMarginals(unittest.TestCase):
+    def test_matches_finite_differences(self):
+        weights = dict(ALL_ONE_WEIGHTS, M=3.0, LB=0.5)
+        for player in random_players(20, seed=4):
+            form_mult = rank_players.form_multiplier(player["form"])
+            for code in ("RWB", "RIMTW", "ROCD", "GK"):
+                values = marginals.order_marginals(player["skills"], form_mult, code, weights)
+                for skill, value in values.items():
+                    self.assertAlmostEqual(
+                        value, finite_difference(player["skills"], form_mult, code, weights, skill),
+                        places=4)
+
+    def test_unused_skills_and_level_one_are_zero(self):
+        skills = {skill: 1.0 for skill in marginals.SKILLS}
+        skills["Playmaking"] = 7.0
+        values = marginals.order_marginals(skills, 1.0, "RCD", ALL_ONE_WEIGHTS)
+        self.assertEqual(values["Scoring"], 0.0)
+        self.assertEqual(values["Defending"], 0.0)
+        self.assertGreater(values["Playmaking"], 0.0)
+
+
+class TestMarginalReport(unittest.TestCase):
+    def test_columns_match_scalar_marginals(self):
+        players = random_players(30, seed=7)
+        table = rank_players.PlayerTable.from_players(players)
+        ranking, report = marginals.marginal_report(table, "winger", ALL_ONE_WEIGHTS)
+        self.assertEqual(set(report), set(rank_players.POSITION_ORDERS["winger"]))
+        for label, code in rank_players.POSITION_ORDERS["winger"].items():
+            for row, player in enumerate(players):
+                expected = marginals.order_marginals(
+                    player["skills"], rank_players.form_multiplier(player["form"]), code,
+                    ALL_ONE_WEIGHTS)
+                for skill in marginals.SKILLS:
+                    self.assertAlmostEqual(report[label][skill][row], expected[skill])
+        rows = list(marginals.iter_report_rows(ranking, report))
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(len(list(marginals.iter_report_rows(ranking, report, all_orders=True))),
+                         30 * 4)
+        rank, name, label, total, *values, best_skill = rows[0]
+        self.assertEqual(name, ranking.table.name(ranking.rows[0]))
+        self.assertEqual(values[marginals.SKILLS.index(best_skill)], max(values))
+
+
+class TestMain(unittest.TestCase):
+    def test_prints_and_writes_report(self):
+        path = write_csv([FULL_ROW, FULL_ROW_2])
+        self.addCleanup(os.remove, path)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            marginals.main([path, "wingback", "--orders", "normal,offensive"])
+        lines = stdout.getvalue().splitlines()
+        self.assertIn("Best skill", lines[0])
+        self.assertIn("Ako Jansons", lines[2])
+        out_path = path + ".marginals.csv"
+        self.addCleanup(os.remove, out_path)
+        with contextlib.redirect_stderr(io.StringIO()):
+            marginals.main([path, "wingback", "--all-orders", "--out", out_path])
+        with open(out_path, encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 2 * 4)
+        self.assertEqual(rows[0]["Player"], "Ako Jansons")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import match
+
+HOME = {"LB": 6.0, "MB": 7.0, "RB": 6.0, "M": 8.0, "LF": 6.0, "MF": 7.0, "RF": 5.0}
+AWAY = {"LB": 5.0, "MB": 6.0, "RB": 6.5, "M": 7.0, "LF": 5.0, "MF": 6.0, "RF": 6.0}
+
+
+class TestPredict(unittest.TestCase):
+    def test_distribution_sums_to_one(self):
+        distribution = match.score_distribution(HOME, AWAY)
+        self.assertAlmostEqual(sum(distribution.values()), 1.0)
+        self.assertEqual(len(distribution), (match.EVENTS + 1) * (match.EVENTS + 2) // 2)
+
+    def test_expected_goals_match_event_probabilities(self):
+        p_home, p_away = match.goal_probabilities(HOME, AWAY)
+        result = match.predict(HOME, AWAY)
+        self.assertAlmostEqual(result["home_goals"], match.EVENTS * p_home)
+        self.assertAlmostEqual(result["away_goals"], match.EVENTS * p_away)
+        self.assertAlmostEqual(result["win"] + result["draw"] + result["loss"], 1.0)
+
+    def test_symmetric_teams(self):
+        result = match.predict(HOME, HOME)
+        self.assertAlmostEqual(result["win"], result["loss"])
+        swapped = match.predict(AWAY, HOME)
+        self.assertAlmostEqual(swapped["win"], match.predict(HOME, AWAY)["loss"])
+
+    def test_stronger_midfield_helps(self):
+        better = dict(HOME, M=10.0)
+        self.assertGreater(match.predict(better, AWAY)["win"], match.predict(HOME, AWAY)["win"])
+
+
+class TestSimulate(unittest.TestCase):
+    def test_converges_to_exact_prediction(self):
+        exact = match.predict(HOME, AWAY)
+        sampled = match.simulate(HOME, AWAY, 200_000, seed=3)
+        for key in ("win", "draw", "loss"):
+            self.assertAlmostEqual(sampled[key], exact[key], delta=0.005)
+        self.assertEqual(sum(sampled["scores"].values()), 200_000)
+
+    def test_reproducible_and_independent_of_workers(self):
+        first = match.simulate(HOME, AWAY, 250_000, seed=7)
+        second = match.simulate(HOME, AWAY, 250_000, seed=7, workers=2)
+        self.assertEqual(first["scores"], second["scores"])
+        other = match.simulate(HOME, AWAY, 250_000, seed=8)
+        self.assertNotEqual(first["scores"], other["scores"])
+
+
+class TestMain(unittest.TestCase):
+    def test_ratings_and_lineup_file(self):
+        fd, path = tempfile.mkstemp(suffix=".json")
+        skills = {"Goalkeeping": 8.0, "Defending": 10.0, "Playmaking": 9.0, "Passing": 7.0,
+                  "Winger": 6.0, "Scoring": 8.0, "Set Pieces": 5.0}
+        with os.fdopen(fd, "w") as f:
+            json.dump({position: skills for position in
+                       ("GK", "LWB", "LCD", "RCD", "RWB", "LW", "LIM", "RIM", "RW", "LFW", "RFW")},
+                      f)
+        self.addCleanup(os.remove, path)
+        home = ",".join(f"{sector}={value}" for sector, value in HOME.items())
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            match.main([home, path, "--matches", "1000"])
+        self.assertIn("exact:", stdout.getvalue())
+        self.assertIn("simulated:", stdout.getvalue())
+
+    def test_incomplete_ratings_exit(self):
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            match.main(["M=5", "M=6"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,457 @@
+import ast
+import contextlib
+import io
+import threading
+import unittest
+from unittest import mock
+
+import contributions
+import optimization
+import ratings
+import training
+from age import Age
+
+WEIGHTS = {"LB": 0.99, "MB": 1.32, "RB": 0.99, "M": 3.0, "LF": 0.9, "MF": 1.2, "RF": 0.9}
+
+
+def start_skills(level=5.0):
+    return {skill: level for skill in optimization.SKILLS}
+
+
+def plan(**kwargs):
+    args = dict(starting_age=Age(17, 0), target_age=Age(20, 0), starting_skills=start_skills(),
+                position="LWB", sector_weights=WEIGHTS, min_target_skills={"Set Pieces": 8.0},
+                max_skills={"Scoring": 18.0})
+    args.update(kwargs)
+    return optimization.optimize_plan(**args)
+
+
+class TestContributionTable(unittest.TestCase):
+    def test_matches_sector_rating_contribution(self):
+        self.assertEqual(len(optimization.TERM_COEFFICIENTS), len(contributions.contributions))
+        for (position, skill, sector) in contributions.contributions:
+            coefficient = dict(optimization.skill_coefficients(position)[skill])[sector]
+            for level in (1.0, 1.0004, 6.37, 19.999):
+                expected = ratings.calculate_sector_rating_contribution(level, skill, sector, position)
+                self.assertAlmostEqual(coefficient * (level - 1.) ** 1.2, expected,
+                                       delta=1e-12 * max(1.0, expected))
+
+    def test_delta_and_weighted_rating_agree(self):
+        skills = start_skills(6.2)
+        before = optimization.weighted_rating(skills, "RIMTW", WEIGHTS)
+        after = optimization.weighted_rating(dict(skills, Playmaking=6.9), "RIMTW", WEIGHTS)
+        terms = optimization.position_terms("RIMTW", WEIGHTS)
+        self.assertAlmostEqual(optimization.multi_rating_delta("Playmaking", 6.2, 6.9, terms), after - before)
+        self.assertEqual(optimization.multi_rating_delta("Goalkeeping", 6.2, 6.9, terms), 0.)
+        expected = sum(WEIGHTS[sector] * ratings.calculate_sector_rating_contribution(
+                           skills[skill], skill, sector, "RIMTW")
+                       for (skill, sector) in optimization.relevant_contributions("RIMTW"))
+        self.assertAlmostEqual(before, expected)
+
+
+class TestOptimizePlan(unittest.TestCase):
+    def test_full_run_matches_calculate_optimal_skills(self):
+        result = plan()
+        skills, sessions = optimization.calculate_optimal_skills(
+            Age(17, 0), Age(20, 0), start_skills(), "LWB", WEIGHTS,
+            {"Set Pieces": 8.0}, {"Scoring": 18.0})
+        self.assertEqual(result["skills"], skills)
+        self.assertEqual(result["sessions"], sessions)
+        self.assertFalse(result["partial"])
+        self.assertEqual(result["stop_reason"], "target age")
+        self.assertEqual(result["weeks"], 3 * 16)
+        self.assertEqual(len(result["schedule"]), result["weeks"])
+        self.assertEqual(result["schedule"][0], "Set Pieces")
+
+    def test_schedule_and_effects_replay_to_final_skills(self):
+        result = plan()
+        replayed = start_skills()
+        for skill, effect in zip(result["schedule"], result["effects"]):
+            replayed[skill] += effect
+        for skill, level in result["skills"].items():
+            self.assertAlmostEqual(replayed[skill], level)
+
+    def test_week_budget_returns_partial_prefix(self):
+        full = plan()
+        partial = plan(max_weeks=10)
+        self.assertTrue(partial["partial"])
+        self.assertEqual(partial["stop_reason"], "week budget")
+        self.assertEqual(partial["schedule"], full["schedule"][:10])
+        self.assertLess(partial["rating"], full["rating"])
+
+    def test_week_budget_applies_during_minimum_phase(self):
+        result = plan(max_weeks=1)
+        self.assertEqual(result["schedule"], ["Set Pieces"])
+        self.assertTrue(result["partial"])
+
+    def test_time_budget(self):
+        clock = iter(range(100))
+        with mock.patch("optimization.time.monotonic", lambda: next(clock)):
+            result = plan(time_budget=5)
+        self.assertEqual(result["stop_reason"], "time budget")
+        self.assertEqual(result["weeks"], 4)
+
+    def test_progress_reports_every_week_with_rising_objective(self):
+        seen = []
+        result = plan(progress=lambda week, objective: seen.append((week, objective)))
+        self.assertEqual([week for week, _ in seen], list(range(1, result["weeks"] + 1)))
+        objectives = [objective for _, objective in seen]
+        self.assertEqual(objectives, sorted(objectives))
+        self.assertAlmostEqual(objectives[-1], result["rating"])
+
+    def test_cancellation_from_progress_callback(self):
+        cancel = threading.Event()
+
+        def progress(week, objective):
+            if week == 7:
+                cancel.set()
+
+        result = plan(progress=progress, cancel=cancel)
+        self.assertEqual(result["stop_reason"], "cancelled")
+        self.assertEqual(result["weeks"], 7)
+        self.assertTrue(result["partial"])
+
+    def test_unreachable_minimum_stops_the_run(self):
+        result = plan(min_target_skills={"Defending": 25.0})
+        self.assertEqual(result["stop_reason"], "min skill unreachable")
+        self.assertFalse(result["partial"])
+        self.assertEqual(set(result["schedule"]), {"Defending"})
+        self.assertLess(result["skills"]["Defending"], 25.0)
+
+    def test_minimum_skills_are_reached_past_the_target_age(self):
+        # as calculate_optimal_skills always has, the target age does not cut the minimum phase short
+        short = plan(min_target_skills={"Set Pieces": 8.0}, target_age=Age(17, 7))
+        self.assertEqual(short["stop_reason"], "target age")
+        self.assertGreater(short["weeks"], 1)
+        self.assertEqual(set(short["schedule"]), {"Set Pieces"})
+        self.assertGreaterEqual(short["skills"]["Set Pieces"], 8.0)
+
+    def test_unreachable_gain_is_complete_not_partial(self):
+        result = plan(max_skills={skill: 5.0 for skill in optimization.SKILLS},
+                      min_target_skills=None)
+        self.assertEqual(result["stop_reason"], "no gain")
+        self.assertFalse(result["partial"])
+
+
+class TestReplan(unittest.TestCase):
+    def setUp(self):
+        self.plan = plan(target_age=Age(21, 0))
+
+    def test_matching_observation_reuses_plan(self):
+        observed = optimization.plan_skills_at(self.plan, 30)
+        with mock.patch("optimization.optimize_plan") as rerun:
+            updated = optimization.replan(self.plan, 30, observed)
+        rerun.assert_not_called()
+        self.assertEqual(updated["schedule"], self.plan["schedule"])
+        self.assertEqual(updated["skills"], self.plan["skills"])
+        self.assertEqual(updated["start_week"], 30)
+
+    def test_deviation_in_unrated_skill_is_carried_through(self):
+        observed = optimization.plan_skills_at(self.plan, 30)
+        observed["Goalkeeping"] += 0.5  # LWB is not rated on goalkeeping
+        updated = optimization.replan(self.plan, 30, observed)
+        self.assertEqual(updated["schedule"], self.plan["schedule"])
+        self.assertAlmostEqual(updated["skills"]["Goalkeeping"],
+                               self.plan["skills"]["Goalkeeping"] + 0.5)
+
+    def test_deviation_recomputes_only_remaining_horizon(self):
+        observed = optimization.plan_skills_at(self.plan, 30)
+        observed["Defending"] += 0.8
+        updated = optimization.replan(self.plan, 30, observed)
+        fresh = optimization.optimize_plan(
+            Age(17, 30 * 7), Age(21, 0), observed, "LWB", WEIGHTS,
+            {"Set Pieces": 8.0}, {"Scoring": 18.0})
+        self.assertEqual(updated["schedule"][:30], self.plan["schedule"][:30])
+        self.assertEqual(updated["schedule"][30:], fresh["schedule"])
+        self.assertEqual(updated["skills"], fresh["skills"])
+        self.assertEqual(updated["weeks"], self.plan["weeks"])
+        self.assertEqual(sum(updated["sessions"].values()), updated["weeks"])
+        self.assertEqual(optimization.plan_skills_at(updated, 30), observed)
+
+    def test_replan_can_be_chained(self):
+        observed = optimization.plan_skills_at(self.plan, 10)
+        observed["Winger"] += 1.0
+        first = optimization.replan(self.plan, 10, observed)
+        later = optimization.plan_skills_at(first, 40)
+        second = optimization.replan(first, 40, later)
+        self.assertEqual(second["schedule"], first["schedule"])
+        with self.assertRaises(ValueError):
+            optimization.plan_skills_at(second, 20)
+
+    def test_week_outside_plan_raises(self):
+        with self.assertRaises(ValueError):
+            optimization.replan(self.plan, self.plan["weeks"] + 1, start_skills())
+
+    def test_partial_plan_is_extended(self):
+        partial = plan(target_age=Age(21, 0), max_weeks=20)
+        updated = optimization.replan(partial, 20, optimization.plan_skills_at(partial, 20))
+        self.assertFalse(updated["partial"])
+        self.assertEqual(updated["schedule"], self.plan["schedule"])
+
+
+class TestTrajectory(unittest.TestCase):
+    def setUp(self):
+        self.args = dict(starting_age=Age(17, 30), starting_skills=start_skills(),
+                         position="LWB", sector_weights=WEIGHTS,
+                         min_target_skills={"Set Pieces": 8.0}, max_skills={"Scoring": 18.0})
+        self.trajectory = optimization.rating_trajectory(horizon_age=Age(24, 0), **self.args)
+
+    def test_matches_separate_runs_for_every_target(self):
+        for target in (Age(17, 30), Age(17, 31), Age(18, 5), Age(19, 0), Age(21, 100), Age(24, 0)):
+            skills, _ = optimization.calculate_optimal_skills(target_age=target, **self.args)
+            self.assertEqual(self.trajectory.skills_at(target), skills)
+            self.assertEqual(self.trajectory.rating_at(target),
+                             optimization.weighted_rating(skills, "LWB", WEIGHTS))
+
+    def test_earliest_age_reaching_a_rating(self):
+        ratings = self.trajectory.ratings
+        self.assertEqual(list(ratings), sorted(ratings))
+        goal = (ratings[0] + ratings[-1]) / 2
+        age = self.trajectory.earliest_age(goal)
+        self.assertGreaterEqual(self.trajectory.rating_at(age), goal)
+        self.assertLess(self.trajectory.rating_at(Age(0, age.to_days() - 7)), goal)
+        self.assertGreater(self.trajectory.minimum_weeks, 0)
+        self.assertEqual(self.trajectory.rating_at(Age(17, 30)),
+                         ratings[self.trajectory.minimum_weeks])
+        self.assertEqual(self.trajectory.earliest_age(ratings[0]).to_days(), Age(17, 30).to_days())
+        self.assertIsNone(self.trajectory.earliest_age(ratings[-1] + 1.0))
+
+    def test_curve_and_bounds(self):
+        curve = self.trajectory.curve()
+        self.assertEqual(len(curve), self.trajectory.weeks + 1)
+        self.assertEqual(curve[-1][1], self.trajectory.rating_at(Age(24, 0)))
+        with self.assertRaises(ValueError):
+            self.trajectory.skills_at(Age(24, 1))
+        with self.assertRaises(ValueError):
+            self.trajectory.skills_at_week(self.trajectory.weeks + 1)
+        plan = optimization.optimize_plan(target_age=Age(20, 0), **self.args)
+        replanned = optimization.replan(plan, 5, optimization.plan_skills_at(plan, 5))
+        with self.assertRaises(ValueError):
+            optimization.Trajectory(replanned)
+
+    def test_partial_plan_refuses_untrained_weeks(self):
+        stopped = optimization.Trajectory(optimization.optimize_plan(
+            target_age=Age(20, 0), max_weeks=10, **self.args))
+        self.assertEqual(stopped.stop_reason, "week budget")
+        self.assertTrue(stopped.partial)
+        self.assertTrue(stopped.is_trained(Age(17, 100)))
+        self.assertEqual(stopped.skills_at(Age(17, 100)), self.trajectory.skills_at(Age(17, 100)))
+        self.assertFalse(stopped.is_trained(Age(17, 101)))
+        with self.assertRaises(ValueError):
+            stopped.rating_at(Age(19, 0))
+        with self.assertRaises(ValueError):
+            stopped.earliest_age(stopped.ratings[-1] + 1.0)
+        self.assertFalse(self.trajectory.partial)
+        self.assertEqual(self.trajectory.stop_reason, "target age")
+
+
+class TestOptimizeMultiPlan(unittest.TestCase):
+    def args(self, **kwargs):
+        args = dict(starting_age=Age(17, 0), target_age=Age(20, 0), starting_skills=start_skills(),
+                    min_target_skills={"Set Pieces": 8.0}, max_skills={"Scoring": 18.0})
+        args.update(kwargs)
+        return args
+
+    def test_single_target_matches_optimize_plan(self):
+        single = plan()
+        multi = optimization.optimize_multi_plan(targets=[("LWB", WEIGHTS, 1.0)], **self.args())
+        self.assertEqual(multi["schedule"], single["schedule"])
+        self.assertEqual(multi["skills"], single["skills"])
+        self.assertEqual(multi["ratings"], [single["rating"]])
+
+    def test_zero_importance_target_is_ignored(self):
+        single = plan(position="RIM")
+        multi = optimization.optimize_multi_plan(
+            targets=[("RIM", WEIGHTS, 1.0), ("LWB", WEIGHTS, 0.0)], **self.args())
+        self.assertEqual(multi["schedule"], single["schedule"])
+
+    def test_two_positions_balance_their_ratings(self):
+        targets = [("LWB", WEIGHTS, 1.0), ("RIM", WEIGHTS, 1.0)]
+        multi = optimization.optimize_multi_plan(targets=targets, **self.args())
+        self.assertAlmostEqual(multi["objective"], sum(multi["ratings"]))
+        for i, (position, _, _) in enumerate(targets):
+            alone = plan(position=position)
+            self.assertLessEqual(multi["ratings"][i], alone["rating"] + 1e-9)
+            other = optimization.weighted_rating(alone["skills"], targets[1 - i][0], WEIGHTS)
+            self.assertGreater(multi["objective"], alone["rating"] + other)
+
+    def test_budget_and_unknown_position(self):
+        partial = optimization.optimize_multi_plan(
+            targets=[("LWB", WEIGHTS, 1.0), ("FW", WEIGHTS, 2.0)], max_weeks=3, **self.args())
+        self.assertTrue(partial["partial"])
+        self.assertEqual(partial["weeks"], 3)
+        with self.assertRaises(ValueError):
+            optimization.optimize_multi_plan(targets=[("XX", WEIGHTS, 1.0)], **self.args())
+
+
+class TestOptimizeTeam(unittest.TestCase):
+    def lineup(self):
+        return {position: start_skills() for position in ("GK", "LOCD", "RWB", "IM", "FW")}
+
+    def test_does_not_modify_input_and_improves_rating(self):
+        players = self.lineup()
+        result = optimization.optimize_team(players, Age(17, 0), Age(17, 56), WEIGHTS)
+        self.assertEqual(players, self.lineup())
+        self.assertEqual(result["weeks"], 8)
+        self.assertFalse(result["partial"])
+        self.assertGreater(result["rating"], optimization.team_objective(players, WEIGHTS))
+
+    def test_budget_and_progress(self):
+        seen = []
+        result = optimization.optimize_team(
+            self.lineup(), Age(17, 0), Age(20, 0), WEIGHTS, max_weeks=3,
+            progress=lambda week, objective: seen.append(week))
+        self.assertEqual(seen, [1, 2, 3])
+        self.assertEqual(result["stop_reason"], "week budget")
+        self.assertTrue(result["partial"])
+        prefix = optimization.optimize_team(self.lineup(), Age(17, 0), Age(17, 21), WEIGHTS)
+        self.assertEqual(result["players"], prefix["players"])
+
+class TestOptimizeTeamLazy(unittest.TestCase):
+    def lineup(self):
+        skills = start_skills()
+        players = {position: dict(skills) for position in
+                   ("GK", "LCD", "CD", "RCD", "RWB", "LWTM", "IM", "RIMO", "LFW", "RDF", "FW")}
+        players["CD"]["Defending"] = 9.5
+        players["IM"]["Playmaking"] = 8.0
+        players["LFW"]["Scoring"] = 7.25
+        return players
+
+    def test_matches_eager_greedy(self):
+        eager = optimization.optimize_team(self.lineup(), Age(17, 0), Age(18, 0), WEIGHTS)
+        lazy = optimization.optimize_team_lazy(self.lineup(), Age(17, 0), Age(18, 0), WEIGHTS)
+        self.assertEqual(lazy["weeks"], eager["weeks"])
+        for position, skills in eager["players"].items():
+            for skill, level in skills.items():
+                self.assertAlmostEqual(lazy["players"][position][skill], level)
+        self.assertAlmostEqual(lazy["rating"], eager["rating"])
+        self.assertLess(lazy["evaluations"], eager["evaluations"])
+
+    def test_check_mode_validates_every_choice(self):
+        result = optimization.optimize_team_lazy(
+            self.lineup(), Age(17, 0), Age(17, 70), WEIGHTS, check=True)
+        self.assertFalse(result["partial"])
+
+    def test_check_mode_detects_a_wrong_choice(self):
+        players = self.lineup()
+        with self.assertRaises(RuntimeError):
+            optimization.check_lazy_choice(players, "CD", "Goalkeeping", Age(17, 0), WEIGHTS)
+
+    def test_budget_and_progress(self):
+        seen = []
+        result = optimization.optimize_team_lazy(
+            self.lineup(), Age(17, 0), Age(20, 0), WEIGHTS, max_weeks=2,
+            progress=lambda week, objective: seen.append(week))
+        self.assertEqual(seen, [1, 2])
+        self.assertTrue(result["partial"])
+        eager = optimization.optimize_team(self.lineup(), Age(17, 0), Age(20, 0), WEIGHTS, max_weeks=2)
+        self.assertAlmostEqual(result["rating"], eager["rating"])
+
+
+class TestJobs(unittest.TestCase):
+    def job(self, **overrides):
+        job = {"age": "17.0", "target_age": "19.0", "skills": start_skills(), "position": "RW"}
+        job.update(overrides)
+        return job
+
+    def test_budget_fields_reach_the_optimizer(self):
+        result = optimization.run_job(self.job(id="j", max_weeks=5))
+        self.assertEqual(result["id"], "j")
+        self.assertEqual(result["weeks"], 5)
+        self.assertTrue(result["partial"])
+
+    def test_ages_and_rating_goal_come_from_the_same_run(self):
+        result = optimization.run_job(self.job(ages=["17.50", "19.0"], rating_goal=1e9))
+        self.assertEqual([entry["age"] for entry in result["at_ages"]], ["17.50", "19.0"])
+        self.assertEqual(result["at_ages"][1]["skills"], result["skills"])
+        skills, _ = optimization.calculate_optimal_skills(
+            **dict(optimization.parse_job(self.job()), target_age=Age(17, 50)))
+        self.assertEqual(result["at_ages"][0]["skills"], skills)
+        self.assertIsNone(result["earliest_age"])
+        with self.assertRaises(ValueError):
+            optimization.run_job(self.job(ages=["20.0"]))
+
+    def test_ages_past_a_stopped_run_are_null(self):
+        result = optimization.run_job(self.job(max_weeks=5, ages=["17.20", "18.0"], rating_goal=1e9))
+        self.assertTrue(result["partial"])
+        self.assertIsNotNone(result["at_ages"][0]["skills"])
+        self.assertEqual(result["at_ages"][1], {"age": "18.0", "skills": None, "rating": None})
+        self.assertIsNone(result["earliest_age"])
+
+    def test_validation_errors(self):
+        for job in (self.job(position="XX"), self.job(sector_weights={"ZZ": 1}),
+                    self.job(max_skills={"Speed": 3}), self.job(skills={"Winger": 5}),
+                    self.job(min_skills={"Passing": 12}, max_skills={"Passing": 10}),
+                    self.job(age=None)):
+            with self.assertRaises(ValueError):
+                optimization.parse_job(job)
+
+
+class TestBestRatingsPos(unittest.TestCase):
+    def test_ranks_every_listed_code(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            optimization.best_ratings_pos()
+        ratings_by_position = ast.literal_eval(stdout.getvalue())
+        self.assertEqual(len(ratings_by_position), 19)
+        self.assertEqual(next(iter(ratings_by_position)), "GK")
+        self.assertGreater(ratings_by_position["IM"], 0.)
+        # codes without contribution terms rate 0, as before the shared greedy loop
+        self.assertEqual(ratings_by_position["CDTW"], 0.)
+
+
+class TestThreads(unittest.TestCase):
+    def test_training_cache_shared_between_threads(self):
+        cache = optimization.TrainingCache(shards=4)
+        keys = [(Age(17, day), 4.0 + level / 3., skill) for day in range(0, 40, 7)
+                for level in range(6) for skill in optimization.SKILLS]
+        results = []
+
+        def lookup():
+            results.append([cache.get(*key) for key in keys])
+
+        threads = [threading.Thread(target=lookup) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        expected = [training.calculate_training(age=age, level=level, training=skill)
+                    for age, level, skill in keys]
+        self.assertEqual(results, [expected] * 8)
+        self.assertEqual(len(cache), len(keys))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        with self.assertRaises(ValueError):
+            optimization.TrainingCache(shards=0)
+
+    def test_training_cache_is_bounded(self):
+        cache = optimization.TrainingCache(shards=2, max_entries=10)
+        keys = [(Age(17, day), 5.0, skill) for day in range(0, 70, 7) for skill in optimization.SKILLS]
+        for _ in range(2):
+            for age, level, skill in keys:
+                self.assertEqual(cache.get(age, level, skill),
+                                 training.calculate_training(age=age, level=level, training=skill))
+                self.assertLessEqual(len(cache), 10)
+        self.assertGreater(cache.misses, len(keys))
+        with self.assertRaises(ValueError):
+            optimization.TrainingCache(shards=4, max_entries=3)
+
+    def test_runs_leave_ages_alone(self):
+        age = Age(17, 0)
+        self.assertEqual(age.plus_days(120).to_days(), age.to_days() + 120)
+        plan(starting_age=age)
+        optimization.optimize_team_lazy({"IM": start_skills()}, age, Age(17, 70), WEIGHTS)
+        self.assertEqual((age.years, age.days), (17, 0))
+
+    def test_thread_pool_matches_serial_runs(self):
+        jobs = [{"age": "17.0", "target_age": f"18.{days}", "skills": start_skills(4.0 + i % 3),
+                 "position": position, "id": i}
+                for i, (position, days) in enumerate(
+                    [("RW", 10), ("IM", 40), ("CD", 5), ("GK", 90), ("FW", 60), ("RW", 30)])]
+        with optimization.worker_pool(4, threads=True) as executor:
+            threaded = list(executor.map(optimization.run_job, jobs))
+        self.assertEqual(threaded, [optimization.run_job(job) for job in jobs])
+
+
+if __name__ == "__main__":
+    unittest.main()
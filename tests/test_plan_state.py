@@ -0,0 +1,87 @@
+import unittest
+
+import optimization
+import plan_state
+from age import Age
+from tests.test_optimization import WEIGHTS, start_skills
+
+SQUAD = ("GK", "LWB", "RCD", "IM", "LFW")
+
+
+def squad():
+    return {position: start_skills(4.0 + i) for i, position in enumerate(SQUAD)}
+
+
+def train_directly(players, starting_age, schedule):
+    """Skills after the schedule, trained on plain dicts week by week."""
+    players = {position: dict(skills) for position, skills in players.items()}
+    age = Age(starting_age.years, starting_age.days)
+    for week_plan in schedule:
+        effects = {position: optimization.get_cached_training(age, players[position][skill], skill)
+                   for position, skill in week_plan.items()}
+        for position, effect in effects.items():
+            players[position][week_plan[position]] += effect
+        age.add_days(7)
+    return players
+
+
+class TestPlanState(unittest.TestCase):
+    def setUp(self):
+        self.root = plan_state.PlanState.start(squad(), Age(17, 10))
+        self.passing = (plan_state.repeat({"IM": "Passing", "LWB": "Winger"}, 10)
+                        + plan_state.repeat({"IM": "Winger", "GK": "Goalkeeping"}, 30))
+
+    def test_matches_training_plain_dicts(self):
+        state = self.root.apply(self.passing)
+        self.assertEqual(state.week, 40)
+        self.assertEqual(state.age.to_days(), Age(17, 10).to_days() + 280)
+        expected = train_directly(squad(), Age(17, 10), self.passing)
+        for position, skills in state.players().items():
+            for skill, level in skills.items():
+                self.assertAlmostEqual(level, expected[position][skill])
+                self.assertAlmostEqual(state.level(position, skill), expected[position][skill])
+        self.assertAlmostEqual(state.rating(WEIGHTS), optimization.team_objective(expected, WEIGHTS))
+        self.assertEqual(state.schedule(), self.passing)
+
+    def test_fork_leaves_the_original_branch_alone(self):
+        first = self.root.apply(self.passing)
+        before = first.players()
+        fork = first.at_week(10)
+        self.assertIs(fork.at_week(0), self.root)
+        scoring = fork.apply(plan_state.repeat({"IM": "Scoring"}, 30))
+        self.assertEqual(first.players(), before)
+        self.assertEqual(scoring.schedule(), self.passing[:10] + [{"IM": "Scoring"}] * 30)
+        expected = train_directly(squad(), Age(17, 10), scoring.schedule())
+        self.assertAlmostEqual(scoring.level("IM", "Scoring"), expected["IM"]["Scoring"])
+        self.assertEqual(scoring.level("GK", "Goalkeeping"), 4.0)
+        ranked = plan_state.compare({"passing": first, "scoring": scoring}, WEIGHTS)
+        self.assertEqual(sorted(name for name, _ in ranked), ["passing", "scoring"])
+        self.assertGreaterEqual(ranked[0][1], ranked[1][1])
+
+    def test_snapshots_share_untrained_players(self):
+        state = self.root.apply(plan_state.repeat({"IM": "Passing"}, optimization.CHECKPOINT_WEEKS))
+        snapshot = state.snapshot
+        self.assertIsNotNone(snapshot)
+        for player, position in enumerate(SQUAD):
+            if position == "IM":
+                self.assertIsNot(snapshot[player], self.root.snapshot[player])
+            else:
+                self.assertIs(snapshot[player], self.root.snapshot[player])
+        self.assertIsNone(state.parent.snapshot)
+        self.assertEqual(len(state.changes), 1)
+
+    def test_rejects_bad_input(self):
+        with self.assertRaises(ValueError):
+            self.root.train({"CD": "Defending"})
+        with self.assertRaises(ValueError):
+            self.root.train({"IM": "Stamina"})
+        with self.assertRaises(ValueError):
+            self.root.at_week(1)
+        with self.assertRaises(ValueError):
+            plan_state.PlanState.start({}, Age(17, 0))
+        with self.assertRaises(ValueError):
+            plan_state.PlanState.start({"GK": start_skills(), "IM": {"Passing": 5.0}}, Age(17, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
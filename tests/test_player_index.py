@@ -0,0 +1,118 @@
+import contextlib
+import io
+import os
+import random
+import unittest
+
+import player_index
+import rank_players
+from tests.test_rank_players import ALL_ONE_WEIGHTS, FULL_ROW, FULL_ROW_2, write_csv
+
+
+def random_players(n, seed=1):
+    rng = random.Random(seed)
+    players = []
+    for i in range(n):
+        players.append({
+            "name": f"P{i}", "age": f"{rng.randint(17, 33)}.{rng.randint(0, 111)}",
+            "form": float(rng.randint(1, 8)), "experience": float(rng.randint(0, 12)),
+            "specialty": "",
+            "skills": {skill: round(rng.uniform(1, 20), 1) for skill in player_index.SKILLS},
+        })
+    return players
+
+
+def brute_force(players, conditions):
+    ops = {">=": float.__ge__, ">": float.__gt__, "<=": float.__le__, "<": float.__lt__,
+           "==": float.__eq__}
+    rows = []
+    for row, player in enumerate(players):
+        values = dict(player["skills"], age=player_index.age_years(player),
+                      form=player["form"], experience=player["experience"])
+        if all(ops[op](values[key], value) for key, op, value in conditions):
+            rows.append(row)
+    return rows
+
+
+class TestParseConditions(unittest.TestCase):
+    def test_keys_and_operators(self):
+        self.assertEqual(
+            player_index.parse_conditions("Defending>=14, set pieces < 9,AGE=21,exp>2,form<=6.5"),
+            [("Defending", ">=", 14.0), ("Set Pieces", "<", 9.0), ("age", "==", 21.0),
+             ("experience", ">", 2.0), ("form", "<=", 6.5)])
+
+    def test_errors(self):
+        # a decimal comma would be ambiguous with the condition separator
+        for spec in ("Speed>3", "Defending~3", "Defending>=high", "Passing>=7,5"):
+            with self.assertRaises(ValueError):
+                player_index.parse_conditions(spec)
+
+
+class TestQuery(unittest.TestCase):
+    def setUp(self):
+        self.players = random_players(2000)
+        self.index = player_index.PlayerIndex(self.players)
+
+    def test_matches_brute_force(self):
+        for conditions in (
+            [("Defending", ">=", 14.0), ("Playmaking", ">=", 9.0), ("age", "<", 24.0)],
+            [("Winger", ">", 10.0), ("Winger", "<=", 12.5), ("form", "==", 7.0)],
+            [("Scoring", ">=", 19.9)],
+            [("Passing", ">", 30.0)],
+            [("Defending", ">=", 5.0), ("Defending", ">", 5.0)],
+        ):
+            self.assertEqual(sorted(self.index.query(conditions)),
+                             brute_force(self.players, conditions))
+
+    def test_no_conditions_returns_everyone(self):
+        self.assertEqual(len(self.index.query([])), len(self.players))
+
+    def test_unknown_age_never_matches(self):
+        players = random_players(3)
+        players[1]["age"] = "?.?"
+        index = player_index.PlayerIndex(players)
+        self.assertNotIn(1, index.query([("age", ">", 0.0)]))
+        self.assertNotIn(1, index.query([("age", "<", 99.0)]))
+
+    def test_top_k_matches_rank_players(self):
+        conditions = [("Defending", ">=", 10.0), ("age", "<", 26.0)]
+        top = self.index.top(conditions, "central defender", "normal", ALL_ONE_WEIGHTS, k=5)
+        matching = [self.players[row] for row in brute_force(self.players, conditions)]
+        ranked = rank_players.rank_players(matching, "central defender", ALL_ONE_WEIGHTS,
+                                           orders=["normal"])
+        self.assertEqual([entry["name"] for entry in top],
+                         [entry["name"] for entry in ranked[:5]])
+        self.assertAlmostEqual(top[0]["totals"]["normal"], ranked[0]["totals"]["normal"])
+
+
+class TestMain(unittest.TestCase):
+    def run_main(self, argv):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+            player_index.main(argv)
+        return stdout.getvalue()
+
+    def test_filter_only(self):
+        path = write_csv([FULL_ROW, FULL_ROW_2])
+        self.addCleanup(os.remove, path)
+        out = self.run_main([path, "Defending>=10"])
+        self.assertIn("Ako Jansons", out)
+        self.assertNotIn("Weak Player", out)
+
+    def test_ranked(self):
+        path = write_csv([FULL_ROW, FULL_ROW_2])
+        self.addCleanup(os.remove, path)
+        out = self.run_main([path, "age<25", "--rank", "wingback", "--order", "defensive"])
+        lines = out.splitlines()
+        self.assertIn("defensive", lines[0])
+        self.assertIn("Ako Jansons", lines[2])
+
+    def test_bad_order_exits(self):
+        path = write_csv([FULL_ROW])
+        self.addCleanup(os.remove, path)
+        with self.assertRaises(SystemExit):
+            self.run_main([path, "age<25", "--rank", "wingback", "--order", "sweeper"])
+
+
+if __name__ == "__main__":
+    unittest.main()
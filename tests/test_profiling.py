@@ -0,0 +1,91 @@
+import contextlib
+import io
+import json
+import os
+import pstats
+import tempfile
+import unittest
+
+import batch_optimize
+import optimization
+import profiling
+import rank_players
+import ratings
+from age import Age
+from tests.test_rank_players import FULL_ROW, FULL_ROW_2, write_csv
+
+
+def temp_path(test, suffix):
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    test.addCleanup(os.remove, path)
+    return path
+
+
+class TestProfiler(unittest.TestCase):
+    def test_phase_is_a_shared_no_op_when_inactive(self):
+        self.assertIsNone(profiling.active)
+        self.assertIs(profiling.phase("a"), profiling.phase("b"))
+        original = ratings.calculate_sector_rating_contribution
+        with profiling.Profiler():
+            self.assertIsNot(ratings.calculate_sector_rating_contribution, original)
+        self.assertIs(ratings.calculate_sector_rating_contribution, original)
+        self.assertIsNone(profiling.active)
+
+    def test_phases_calls_and_cache_hits(self):
+        skills = {skill: 5.0 for skill in optimization.SKILLS}
+        weights = {sector: 1.0 for sector in optimization.SECTORS}
+        optimization.calculate_optimal_skills(Age(17, 0), Age(18, 0), skills, "RW", weights)
+        with profiling.Profiler() as profiler:
+            with profiling.phase("outer"):
+                for _ in range(2):
+                    with profiling.phase("inner"):
+                        optimization.calculate_optimal_skills(Age(17, 0), Age(18, 0), skills,
+                                                              "RW", weights)
+        self.assertEqual(list(profiler.phases), ["outer", "outer/inner"])
+        self.assertEqual(profiler.phases["outer/inner"][1], 2)
+        lookups, hits = profiler.cache_stats()["get_cached_training"]
+        self.assertGreater(lookups, 0)
+        self.assertEqual(lookups, hits)
+        self.assertEqual(profiler.calls["calculate_training"], 0)
+        report = profiler.report()
+        self.assertIn("    inner", report)
+        self.assertIn("(100.0%)", report)
+
+    def test_nested_profilers_are_rejected(self):
+        with profiling.Profiler():
+            with self.assertRaises(RuntimeError):
+                with profiling.Profiler():
+                    pass
+
+
+class TestCommandLine(unittest.TestCase):
+    def test_rank_players_profile_and_dump(self):
+        path = write_csv([FULL_ROW, FULL_ROW_2])
+        self.addCleanup(os.remove, path)
+        dump = temp_path(self, ".prof")
+        stderr = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(stderr):
+            rank_players.main([path, "wingback", "--profile-dump", dump])
+        report = stderr.getvalue()
+        for phase in ("parse", "rank", "  contributions", "output", "peak memory"):
+            self.assertIn(phase, report)
+        self.assertIn("calculate_sector_rating_contribution", report)
+        pstats.Stats(dump)
+
+    def test_batch_optimize_profiles_jobs_in_process(self):
+        job = {"age": "17.0", "target_age": "17.50", "position": "RW",
+               "skills": {skill: 5.0 for skill in optimization.SKILLS}}
+        jobs = temp_path(self, ".jsonl")
+        with open(jobs, "w", encoding="utf-8") as f:
+            f.write(json.dumps(job) + "\n" + json.dumps(dict(job, position="XX")) + "\n")
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            batch_optimize.main([jobs, "--profile"])
+        self.assertEqual(len(stdout.getvalue().splitlines()), 2)
+        self.assertIn("optimize", stderr.getvalue())
+        self.assertIn("x2", stderr.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,14 @@
 import contextlib
 import csv
 import io
+import json
 import os
 import tempfile
 import unittest
 
 import rank_players
 import ratings
+from age import Age
 
 
 class TestFormMultiplier(unittest.TestCase):
@@ -123,6 +125,26 @@ class TestParsePlayers(unittest.TestCase):
         self.assertEqual(len(warnings), 1)
         self.assertIn("Bad", warnings[0])
 
+    def test_price_column_parsed(self):
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(CSV_HEADER + "Price\n")
+            for price in ("1 250 000", "", "lots"):
+                f.write("4;Good;;Row;20;5;3;0;;7;8;1.0;3.0;4.0;4.0;5.0;15.0;2.0;" + price + "\n")
+        self.addCleanup(os.remove, path)
+        players, warnings = rank_players.parse_players(path)
+        self.assertEqual([player["price"] for player in players], [1250000.0, None, None])
+        self.assertEqual(len(warnings), 1)
+        self.assertIn("'lots'", warnings[0])
+        table, _ = rank_players.parse_player_table(path)
+        self.assertEqual([record["price"] for record in table], [1250000.0, None, None])
+
+    def test_missing_price_column_gives_no_price(self):
+        path = write_csv([FULL_ROW])
+        self.addCleanup(os.remove, path)
+        players, _ = rank_players.parse_players(path)
+        self.assertIsNone(players[0]["price"])
+
 
 ALL_ONE_WEIGHTS = {s: 1.0 for s in ["LB", "MB", "RB", "M", "LF", "MF", "RF"]}
 
@@ -286,6 +308,92 @@ class TestRankOptions(unittest.TestCase):
         self.assertAlmostEqual(entry["average"], expected)
 
 
+class TestProjection(unittest.TestCase):
+    def make_players(self):
+        return [
+            {"name": "Youth", "age": "17.10", "form": 7.0, "experience": 0.0,
+             "specialty": "", "skills": base_skills(Defending=6.0, Winger=4.0)},
+            {"name": "Veteran", "age": "31.0", "form": 7.0, "experience": 8.0,
+             "specialty": "", "skills": base_skills(Defending=9.0, Winger=6.0)},
+        ]
+
+    def test_young_player_projects_past_current_totals(self):
+        players = self.make_players()
+        current = rank_players.rank_players(players, "wingback", ALL_ONE_WEIGHTS)
+        projected = rank_players.rank_players(players, "wingback", ALL_ONE_WEIGHTS,
+                                              project_to=Age(23, 0))
+        self.assertEqual(projected[0]["name"], "Youth")
+        youth_now = next(e for e in current if e["name"] == "Youth")
+        for label, total in projected[0]["totals"].items():
+            self.assertGreater(total, youth_now["totals"][label])
+        self.assertEqual(set(projected[0]["projected"]), set(projected[0]["totals"]))
+        self.assertNotEqual(projected[0]["projected"]["normal"],
+                            projected[0]["projected"]["offensive"])
+
+    def test_player_past_target_age_keeps_current_totals(self):
+        players = self.make_players()
+        current = rank_players.rank_players(players, "wingback", ALL_ONE_WEIGHTS)
+        projected = rank_players.rank_players(players, "wingback", ALL_ONE_WEIGHTS,
+                                              project_to=Age(23, 0))
+        veteran = [next(e for e in ranked if e["name"] == "Veteran")
+                   for ranked in (current, projected)]
+        self.assertEqual(veteran[0]["totals"], veteran[1]["totals"])
+
+    def test_workers_match_serial(self):
+        players = self.make_players() * 3
+        serial = rank_players.rank_players(players, "winger", ALL_ONE_WEIGHTS,
+                                           project_to=Age(20, 0))
+        parallel = rank_players.rank_players(players, "winger", ALL_ONE_WEIGHTS,
+                                             project_to=Age(20, 0), workers=2)
+        self.assertEqual([e["totals"] for e in serial], [e["totals"] for e in parallel])
+
+
+class TestPlayerTable(unittest.TestCase):
+    def setUp(self):
+        path = write_csv([FULL_ROW, FULL_ROW_2, "3;Bad;;Row;20;1;1;0;;x;5;1;1;1;1;1;1;1;"])
+        self.addCleanup(os.remove, path)
+        self.players, self.warnings = rank_players.parse_players(path)
+        self.table, self.table_warnings = rank_players.parse_player_table(path)
+
+    def test_records_match_parsed_dicts(self):
+        self.assertEqual(self.table_warnings, self.warnings)
+        self.assertEqual(len(self.table), 2)
+        self.assertEqual([dict(record) for record in self.table], self.players)
+        self.assertEqual(self.table[-1]["name"], "Weak Player")
+        self.assertEqual(self.table.specialties, ["Quick", ""])
+        with self.assertRaises(IndexError):
+            self.table[2]
+
+    def test_unknown_age_and_id_round_trip(self):
+        player = dict(self.players[0], player_id=None, age="?.?")
+        record = rank_players.PlayerTable.from_players([player])[0]
+        self.assertIsNone(record["player_id"])
+        self.assertEqual(record["age"], "?.?")
+
+    def test_age_with_surrounding_spaces_is_read(self):
+        player = dict(self.players[0], age=" 17. 5 ")
+        record = rank_players.PlayerTable.from_players([player])[0]
+        self.assertEqual(record["age"], "17.5")
+        self.assertEqual(rank_players.age_in_days(record["age"]), rank_players.age_in_days(" 17. 5 "))
+
+    def test_rank_table_matches_rank_players(self):
+        weights = dict(ALL_ONE_WEIGHTS, RB=2.0)
+        for use_form in (True, False):
+            expected = rank_players.rank_players(self.players, "wingback", weights,
+                                                 use_form=use_form)
+            ranking = rank_players.rank_table(self.table, "wingback", weights,
+                                              use_form=use_form)
+            self.assertEqual(list(ranking), expected)
+
+    def test_float32_skills_halve_skill_columns(self):
+        table = rank_players.PlayerTable.from_players(self.players, skill_typecode="f")
+        self.assertEqual(self.table.nbytes() - table.nbytes(), 2 * 7 * 4)
+        ranking = rank_players.rank_table(table, "wingback", ALL_ONE_WEIGHTS)
+        self.assertEqual([e["name"] for e in ranking], [p["name"] for p in self.players])
+        with self.assertRaises(ValueError):
+            rank_players.PlayerTable(skill_typecode="i")
+
+
 FULL_ROW = "1;Ako;;Jansons;21;77;4;2;Q;7;8;1.0;3.0;4.0;4.0;5.0;15.3045;2.0;"
 FULL_ROW_2 = "2;Weak;;Player;19;10;2;0;;5;6;1.0;2.0;2.0;2.0;3.0;6.0;1.0;"
 
@@ -353,6 +461,27 @@ class TestMain(unittest.TestCase):
         self.assertIn("Avg", header)
         self.assertIn("Quick", out)
 
+    def test_project_to_flag(self):
+        path = write_csv([FULL_ROW, FULL_ROW_2])
+        self.addCleanup(os.remove, path)
+        out = self.run_main([path, "wingback", "--project-to", "25.0", "--orders", "normal"])
+        self.assertIn("Weak Player", out)
+        self.assertNotEqual(out, self.run_main([path, "wingback", "--orders", "normal"]))
+        with self.assertRaises(SystemExit):
+            with contextlib.redirect_stderr(io.StringIO()):
+                self.run_main([path, "wingback", "--project-to", "soon"])
+
+    def test_project_to_warns_about_unreadable_ages(self):
+        path = write_csv([FULL_ROW, "3;No;;Age;21;;4;2;Q;7;8;1.0;3.0;4.0;4.0;5.0;15.3045;2.0;"])
+        self.addCleanup(os.remove, path)
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            out = self.run_main([path, "wingback", "--project-to", "25.0"])
+            self.run_main([path, "wingback"])
+        self.assertIn("No Age", out)
+        self.assertEqual(stderr.getvalue().count("warning:"), 1)
+        self.assertIn("No Age: unreadable age 21.?", stderr.getvalue())
+
     def test_unknown_position_exits_with_error(self):
         path = write_csv([FULL_ROW])
         self.addCleanup(os.remove, path)
@@ -361,5 +490,72 @@ class TestMain(unittest.TestCase):
                 self.run_main([path, "libero"])
 
 
+class TestOutputFormats(unittest.TestCase):
+    def ranked(self):
+        players, _ = rank_players.read_players(io.StringIO(
+            "\n".join([CSV_HEADER, FULL_ROW, FULL_ROW_2, FULL_ROW.replace("Ako", "Āva", 1)])))
+        players[2]["player_id"] = None
+        players[2]["age"] = "?.?"
+        return rank_players.rank_players(players, "wingback", ALL_ONE_WEIGHTS)
+
+    def test_ndjson_rows(self):
+        ranked = self.ranked()
+        out = io.StringIO()
+        rank_players.write_ranking(out, "ndjson", ranked, ["normal", "defensive"])
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]["Rank"], 1)
+        self.assertEqual(rows[0]["normal"], ranked[0]["totals"]["normal"])
+        self.assertIn("Player", rows[0])
+
+    def test_numeric_mode_keeps_numbers_only(self):
+        ranked = self.ranked()
+        out = io.StringIO()
+        rank_players.write_ranking(out, "tsv", ranked, ["normal", "defensive"], numeric=True)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0].split("\t"), ["Rank", "PlayerID", "AgeDays", "Form", "Exp",
+                                                "normal", "defensive", "Avg", "Best"])
+        for line in lines[1:]:
+            [float(value) for value in line.split("\t")]
+        ako = next(line.split("\t") for line in lines[1:] if line.split("\t")[2] == "2429")
+        self.assertEqual(ako[1], "1")
+        self.assertEqual(float(ako[5]), ranked[0]["totals"]["normal"])
+
+    def test_binary_columnar_round_trip(self):
+        ranked = self.ranked() * 3
+        labels = ["normal", "defensive", "offensive"]
+        for numeric in (False, True):
+            out = io.BytesIO()
+            rank_players.write_columnar(out, rank_players.output_columns(labels, numeric),
+                                        rank_players.iter_output_rows(ranked, labels, numeric),
+                                        block_rows=4)
+            out.seek(0)
+            blocks = list(rank_players.read_columnar(out))
+            self.assertEqual([len(block["Rank"]) for block in blocks], [4, 4, 1])
+            rows = [row for block in blocks for row in zip(*block.values())]
+            self.assertEqual(rows, list(rank_players.iter_output_rows(ranked, labels, numeric)))
+
+    def test_columnar_rejects_other_streams(self):
+        with self.assertRaises(ValueError):
+            list(rank_players.read_columnar(io.BytesIO(b"Rank,Player\n")))
+
+    def test_main_streams_format(self):
+        path = write_csv([FULL_ROW, FULL_ROW_2])
+        self.addCleanup(os.remove, path)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            rank_players.main([path, "wingback", "--format", "csv"])
+        rows = list(csv.DictReader(io.StringIO(stdout.getvalue())))
+        self.assertEqual(rows[0]["Player"], "Ako Jansons")
+        binary = io.TextIOWrapper(io.BytesIO())
+        with contextlib.redirect_stdout(binary):
+            rank_players.main([path, "wingback", "--format", "binary-columnar", "--numeric"])
+        binary.buffer.seek(0)
+        block = next(rank_players.read_columnar(binary.buffer))
+        self.assertEqual(block["PlayerID"], [1, 2])
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            rank_players.main([path, "wingback", "--numeric"])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,163 @@
+import asyncio
+import concurrent.futures
+import json
+import threading
+import unittest
+
+import optimization
+import service
+from tests.test_rank_players import CSV_HEADER, FULL_ROW, FULL_ROW_2
+
+SKILLS_AT_5 = {skill: 5.0 for skill in optimization.SKILLS}
+
+OPTIMIZE_JOB = {
+    "age": "17.0", "target_age": "17.70", "skills": SKILLS_AT_5,
+    "position": "LWB", "max_skills": {"Scoring": 18.0},
+}
+
+
+class ServiceTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self.service = service.Service(self.executor, workers=2)
+        self.server = await asyncio.start_server(
+            self.service.handle_connection, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.executor.shutdown(wait=True)
+
+    async def request(self, method, path, body=b"", content_type="application/json"):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+            + body)
+        await writer.drain()
+        raw = await reader.read()
+        writer.close()
+        head, _, payload = raw.partition(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        return status, json.loads(payload)
+
+
+class TestRankEndpoint(ServiceTestCase):
+    async def test_json_upload_ranks_players(self):
+        csv_text = "\n".join([CSV_HEADER, FULL_ROW_2, FULL_ROW]) + "\n"
+        status, payload = await self.request(
+            "POST", "/rank", {"csv": csv_text, "position": "wingback", "weights": {"M": 2}})
+        self.assertEqual(status, 200)
+        self.assertEqual([row["name"] for row in payload["ranking"]],
+                         ["Ako Jansons", "Weak Player"])
+        self.assertEqual(payload["ranking"][0]["rank"], 1)
+        self.assertIn("towards middle", payload["orders"])
+
+    async def test_raw_csv_upload_with_query_options(self):
+        body = ("\n".join([CSV_HEADER, FULL_ROW]) + "\n").encode()
+        status, payload = await self.request(
+            "POST", "/rank?position=winger&orders=normal,offensive", body,
+            content_type="text/csv")
+        self.assertEqual(status, 200)
+        self.assertEqual(set(payload["ranking"][0]["totals"]), {"normal", "offensive"})
+
+    async def test_bad_position_is_client_error(self):
+        status, payload = await self.request("POST", "/rank", {"csv": "", "position": "libero"})
+        self.assertEqual(status, 400)
+        self.assertIn("libero", payload["error"])
+
+    async def test_unknown_order_is_client_error(self):
+        csv_text = "\n".join([CSV_HEADER, FULL_ROW]) + "\n"
+        status, _ = await self.request(
+            "POST", "/rank", {"csv": csv_text, "position": "winger", "orders": ["sweeper"]})
+        self.assertEqual(status, 400)
+
+
+class TestOptimizeEndpoint(ServiceTestCase):
+    async def test_matches_direct_run(self):
+        status, payload = await self.request("POST", "/optimize", dict(OPTIMIZE_JOB, id=7))
+        self.assertEqual(status, 200)
+        expected = optimization.run_job(OPTIMIZE_JOB)
+        self.assertEqual(payload["id"], 7)
+        self.assertEqual(payload["sessions"], expected["sessions"])
+        self.assertAlmostEqual(payload["rating"], expected["rating"])
+
+    async def test_invalid_job_is_client_error(self):
+        status, payload = await self.request("POST", "/optimize", {"position": "LWB"})
+        self.assertEqual(status, 400)
+        self.assertIn("missing field", payload["error"])
+
+    async def test_job_failing_in_the_run_is_client_error(self):
+        status, payload = await self.request("POST", "/optimize", dict(OPTIMIZE_JOB, ages=["18.0"]))
+        self.assertEqual(status, 400)
+        self.assertIn("past the trajectory horizon", payload["error"])
+
+    async def test_wrong_method_and_path(self):
+        self.assertEqual((await self.request("GET", "/optimize"))[0], 405)
+        self.assertEqual((await self.request("GET", "/nowhere"))[0], 404)
+
+
+class TestCoalescingAndCache(ServiceTestCase):
+    async def test_identical_concurrent_requests_run_once(self):
+        calls = []
+        release = threading.Event()
+
+        def slow_square(x):
+            calls.append(x)
+            release.wait(5)
+            return x * x
+
+        first = asyncio.ensure_future(self.service.submit("test", slow_square, 3))
+        second = asyncio.ensure_future(self.service.submit("test", slow_square, 3))
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.service.queue_depth, 1)
+        release.set()
+        self.assertEqual(await asyncio.gather(first, second), [9, 9])
+        self.assertEqual(calls, [3])
+        self.assertEqual(self.service.stats["coalesced"], 1)
+
+        # a later identical request is answered from the cache
+        self.assertEqual(await self.service.submit("test", slow_square, 3), 9)
+        self.assertEqual(calls, [3])
+        self.assertEqual(self.service.stats["cache_hits"], 1)
+
+    async def test_cache_evicts_least_recent(self):
+        self.service.cache_size = 2
+        for x in (1, 2, 3):
+            await self.service.submit("test", abs, x)
+        self.assertEqual(len(self.service.cache), 2)
+
+    async def test_failures_are_not_cached(self):
+        with self.assertRaises(ZeroDivisionError):
+            await self.service.submit("test", divmod, 1, 0)
+        self.assertEqual(len(self.service.cache), 0)
+        self.assertEqual(self.service.in_flight, {})
+
+
+class TestMetricsEndpoint(ServiceTestCase):
+    async def test_reports_latency_and_queue_depth(self):
+        await self.request("POST", "/optimize", OPTIMIZE_JOB)
+        await self.request("POST", "/optimize", {"bad": True})
+        status, payload = await self.request("GET", "/metrics")
+        self.assertEqual(status, 200)
+        stats = payload["endpoints"]["/optimize"]
+        self.assertEqual(stats["count"], 2)
+        self.assertEqual(stats["errors"], 1)
+        self.assertGreaterEqual(stats["max_ms"], stats["p50_ms"])
+        self.assertEqual(payload["queue_depth"], 0)
+        self.assertEqual(payload["workers"], 2)
+
+
+class TestProcessPool(unittest.TestCase):
+    def test_warm_workers_run_jobs(self):
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=1, initializer=optimization.warm_tables) as executor:
+            result = executor.submit(optimization.run_job, OPTIMIZE_JOB).result()
+        self.assertEqual(result, optimization.run_job(OPTIMIZE_JOB))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import contextlib
+import io
+import math
+import os
+import unittest
+
+import rank_players
+import similar
+from tests.test_player_index import random_players
+from tests.test_rank_players import ALL_ONE_WEIGHTS, FULL_ROW, FULL_ROW_2, write_csv
+
+
+def brute_force(index, point, k, accept=None):
+    scored = sorted((math.dist(index.row_profile(row), point), row) for row in range(len(index))
+                    if accept is None or accept(row))
+    return scored[:k]
+
+
+class TestSimilarityIndex(unittest.TestCase):
+    def setUp(self):
+        self.players = random_players(700, seed=21)
+        self.table = rank_players.PlayerTable.from_players(self.players)
+
+    def test_profile_sums_to_order_total_at_full_form(self):
+        index = similar.SimilarityIndex(self.table, "RWB", ALL_ONE_WEIGHTS)
+        self.assertNotIn("Goalkeeping", index.skills)
+        skills = self.players[3]["skills"]
+        self.assertAlmostEqual(sum(index.profile(skills)),
+                               rank_players.order_total(skills, 1.0, "RWB", ALL_ONE_WEIGHTS))
+        self.assertEqual(index.profile(skills), index.row_profile(3))
+
+    def test_matches_brute_force(self):
+        for code, leaf_size in (("RWB", 32), ("RIMTW", 4), ("GK", 8)):
+            index = similar.SimilarityIndex(self.table, code, ALL_ONE_WEIGHTS, leaf_size=leaf_size)
+            for row in (0, 17, 399):
+                point = index.row_profile(row)
+                for k in (1, 5, 30):
+                    got = index.query(point, k)
+                    expected = brute_force(index, point, k)
+                    self.assertEqual([r for _, r in got], [r for _, r in expected])
+                    for (d1, _), (d2, _) in zip(got, expected):
+                        self.assertAlmostEqual(d1, d2)
+
+    def test_filters_and_self_exclusion(self):
+        index = similar.SimilarityIndex(self.table, "RFW", ALL_ONE_WEIGHTS)
+        filters = dict(min_age=19.0, max_age=24.5, min_form=4.0)
+        got = index.similar(10, 8, **filters)
+        accept = index.accepts(exclude={10}, **filters)
+        expected = brute_force(index, index.row_profile(10), 8, accept)
+        self.assertEqual([row for _, row in got], [row for _, row in expected])
+        self.assertNotIn(10, [row for _, row in got])
+        for _, row in got:
+            self.assertGreaterEqual(self.table.form[row], 4.0)
+        self.assertEqual(index.similar(10, 5, min_form=99.0), [])
+
+    def test_empty_table(self):
+        index = similar.SimilarityIndex(rank_players.PlayerTable(), "RW", ALL_ONE_WEIGHTS)
+        self.assertEqual(index.query((0.0,) * len(index.skills), 3), [])
+
+
+class TestMain(unittest.TestCase):
+    def test_lists_similar_players(self):
+        path = write_csv([FULL_ROW, FULL_ROW_2])
+        self.addCleanup(os.remove, path)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            similar.main([path, "wingback", "Ako Jansons", "--order", "offensive"])
+        lines = stdout.getvalue().splitlines()
+        self.assertIn("most like Ako Jansons", lines[0])
+        self.assertEqual(len(lines), 2)
+        self.assertIn("Weak Player", lines[1])
+        with self.assertRaises(SystemExit):
+            with contextlib.redirect_stderr(io.StringIO()):
+                similar.main([path, "wingback", "Nobody"])
+
+
+if __name__ == "__main__":
+    unittest.main()
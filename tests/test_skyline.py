@@ -0,0 +1,79 @@
+import contextlib
+import io
+import os
+import random
+import unittest
+
+import skyline
+from tests.test_player_index import random_players
+from tests.test_rank_players import ALL_ONE_WEIGHTS, FULL_ROW, FULL_ROW_2, write_csv
+
+
+def dominates(a, b):
+    return all(x >= y for x, y in zip(a, b)) and a != b
+
+
+def brute_force(points):
+    return sorted(i for i, p in enumerate(points)
+                  if not any(dominates(q, p) for q in points))
+
+
+class TestParetoFrontier(unittest.TestCase):
+    def test_matches_pairwise_definition(self):
+        rng = random.Random(3)
+        for dims in (1, 2, 3, 6):
+            points = [tuple(rng.randint(0, 9) for _ in range(dims)) for _ in range(300)]
+            self.assertEqual(sorted(skyline.pareto_frontier(points)), brute_force(points))
+
+    def test_duplicates_are_kept(self):
+        points = [(1.0, 2.0), (2.0, 1.0), (1.0, 2.0), (0.5, 0.5)]
+        self.assertEqual(sorted(skyline.pareto_frontier(points)), [0, 1, 2])
+
+    def test_best_sum_first(self):
+        points = [(1.0, 1.0), (3.0, 0.0), (0.0, 5.0), (0.5, 1.0)]
+        self.assertEqual(skyline.pareto_frontier(points), [2, 1, 0])
+
+    def test_empty(self):
+        self.assertEqual(skyline.pareto_frontier([]), [])
+
+
+class TestSkyline(unittest.TestCase):
+    def test_parse_targets(self):
+        self.assertEqual(
+            skyline.parse_targets(["central_defender:normal", "forward", "Winger:Offensive"]),
+            [("central defender", "normal"), ("forward", "normal"), ("forward", "defensive"),
+             ("forward", "towards wing"), ("winger", "offensive")])
+        with self.assertRaises(ValueError):
+            skyline.parse_targets(["winger:sweeper"])
+
+    def test_frontier_players_are_undominated(self):
+        players = random_players(300, seed=5)
+        targets = [("central defender", "normal"), ("winger", "normal"),
+                   ("inner midfielder", "offensive")]
+        entries = skyline.skyline(players, targets, ALL_ONE_WEIGHTS)
+        self.assertTrue(entries)
+        labels = ["central defender/normal", "winger/normal", "inner midfielder/offensive"]
+        frontier = [tuple(entry["totals"][label] for label in labels) for entry in entries]
+        for point in frontier:
+            self.assertFalse(any(dominates(other, point) for other in frontier))
+        best_cd = max(entries, key=lambda entry: entry["totals"][labels[0]])
+        self.assertEqual(best_cd["totals"][labels[0]],
+                         max(skyline.skyline(players, targets[:1], ALL_ONE_WEIGHTS)[0]
+                             ["totals"].values()))
+
+
+class TestMain(unittest.TestCase):
+    def test_prints_frontier(self):
+        path = write_csv([FULL_ROW, FULL_ROW_2])
+        self.addCleanup(os.remove, path)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+            skyline.main([path, "wingback:normal", "winger:offensive"])
+        header = stdout.getvalue().splitlines()[0]
+        self.assertIn("wingback/normal", header)
+        self.assertIn("Ako Jansons", stdout.getvalue())
+        self.assertNotIn("Weak Player", stdout.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+import contextlib
+import io
+import itertools
+import os
+import random
+import tempfile
+import unittest
+
+import lineup_search
+import ratings
+import transfers
+from tests.test_player_index import random_players
+from tests.test_rank_players import ALL_ONE_WEIGHTS, CSV_HEADER
+
+FOUR_FOUR_TWO = ("GK", "LWB", "RWB", "LCD", "RCD", "LW", "RW", "LIM", "RIM", "LFW", "RFW")
+
+
+def weighted_rating(team, weights):
+    team_ratings = ratings.calculate_team_ratings(team)
+    return sum(weights[sector] * team_ratings[sector] for sector in team_ratings)
+
+
+def brute_force(lineup, market, weights, budget, max_buys):
+    """Best weighted team rating over every affordable purchase set, via ratings directly."""
+    codes = list(lineup)
+    best = weighted_rating(lineup, weights)
+    for count in range(1, max_buys + 1):
+        for slots in itertools.combinations(range(len(codes)), count):
+            for players in itertools.permutations(range(len(market)), count):
+                if sum(market[player]["price"] for player in players) > budget:
+                    continue
+                orders = [lineup_search.SLOT_ORDERS[transfers.ORDER_SLOT[codes[slot]]] for slot in slots]
+                for chosen in itertools.product(*orders):
+                    bought = dict(zip(slots, zip(players, chosen)))
+                    team = {}
+                    for slot, code in enumerate(codes):
+                        if slot in bought:
+                            player, order = bought[slot]
+                            team[order] = market[player]["skills"]
+                        else:
+                            team[code] = lineup[code]
+                    best = max(best, weighted_rating(team, weights))
+    return best
+
+
+def random_market(size, seed):
+    rng = random.Random(seed)
+    market = random_players(size, seed=seed)
+    for player in market:
+        player["price"] = float(rng.randint(1, 10))
+    return market
+
+
+class TestHulls(unittest.TestCase):
+    def test_upper_hull_keeps_rising_concave_points(self):
+        points = [(1., 1.), (2., 3.), (3., 3.5), (4., 3.), (5., 6.)]
+        self.assertEqual(transfers.upper_hull(points), [(0., 0.), (2., 3.), (5., 6.)])
+        self.assertEqual(transfers.rising_hull([1., 2., 3.], [-1., 2., 1.]), [(0., 0.), (2., 2.)])
+
+    def test_knapsack_bound_is_above_every_choice(self):
+        rng = random.Random(3)
+        points = [sorted((float(rng.randint(1, 6)), rng.uniform(-1., 5.)) for _ in range(3))
+                  for _ in range(4)]
+        hulls = [transfers.upper_hull(slot) for slot in points]
+        for budget, buys in ((0., 4), (5., 1), (7., 2), (30., 4)):
+            bound = transfers.knapsack_bound(hulls, budget, buys)[0]
+            for choice in itertools.product(*[[None] + slot for slot in points]):
+                bought = [point for point in choice if point is not None]
+                if len(bought) <= buys and sum(price for price, _ in bought) <= budget:
+                    self.assertLessEqual(sum(value for _, value in bought), bound + 1e-9)
+
+
+class TestBestPurchases(unittest.TestCase):
+    def test_matches_brute_force(self):
+        for seed in range(2):
+            squad = random_players(11, seed=seed)
+            lineup = {code: player["skills"] for code, player in zip(FOUR_FOUR_TWO, squad)}
+            market = random_market(5, seed + 100)
+            weights = dict(ALL_ONE_WEIGHTS, M=3.0)
+            for budget in (5., 12.):
+                result = transfers.best_purchases(lineup, market, weights, budget, max_buys=2)
+                self.assertAlmostEqual(result["objective"],
+                                       brute_force(lineup, market, weights, budget, 2))
+                team = transfers.apply_purchases(lineup, market, result["purchases"])
+                self.assertAlmostEqual(result["objective"], weighted_rating(team, weights))
+                self.assertLessEqual(result["spent"], budget)
+                self.assertEqual(len({p["player"] for p in result["purchases"]}),
+                                 len(result["purchases"]))
+
+    def test_gap_stays_within_gap(self):
+        squad = random_players(11, seed=7)
+        lineup = {code: player["skills"] for code, player in zip(FOUR_FOUR_TWO, squad)}
+        market = random_market(12, 8)
+        exact = transfers.best_purchases(lineup, market, ALL_ONE_WEIGHTS, 15.)
+        rough = transfers.best_purchases(lineup, market, ALL_ONE_WEIGHTS, 15., gap=0.5)
+        self.assertGreaterEqual(rough["objective"], exact["objective"] - 0.5)
+        self.assertLessEqual(rough["nodes"], exact["nodes"])
+
+    def test_time_budget_returns_incumbent_with_proven_gap(self):
+        squad = random_players(11, seed=7)
+        lineup = {code: player["skills"] for code, player in zip(FOUR_FOUR_TWO, squad)}
+        market = random_market(12, 8)
+        exact = transfers.best_purchases(lineup, market, ALL_ONE_WEIGHTS, 15.)
+        self.assertTrue(exact["complete"])
+        self.assertEqual(exact["gap"], 0.)
+        stopped = transfers.best_purchases(lineup, market, ALL_ONE_WEIGHTS, 15., time_budget=0.)
+        self.assertFalse(stopped["complete"])
+        # out of time before the filters, so no option was dropped
+        self.assertGreater(stopped["options"], exact["options"])
+        self.assertLessEqual(stopped["objective"], exact["objective"] + 1e-9)
+        self.assertGreaterEqual(stopped["objective"] + stopped["gap"], exact["objective"] - 1e-9)
+        self.assertGreaterEqual(stopped["objective"], stopped["base_objective"])
+
+    def test_unpriced_and_unaffordable_players_are_not_bought(self):
+        squad = random_players(11, seed=4)
+        lineup = {code: player["skills"] for code, player in zip(FOUR_FOUR_TWO, squad)}
+        star = {"skills": {skill: 20. for skill in squad[0]["skills"]}}
+        for price in (None, 11.):
+            result = transfers.best_purchases(lineup, [dict(star, price=price)], ALL_ONE_WEIGHTS, 10.)
+            self.assertEqual(result["purchases"], [])
+            self.assertEqual(result["objective"], result["base_objective"])
+        result = transfers.best_purchases(lineup, [dict(star, price=10.)], ALL_ONE_WEIGHTS, 10.)
+        self.assertEqual(len(result["purchases"]), 1)
+        self.assertGreater(result["objective"], result["base_objective"])
+
+    def test_rejects_bad_input(self):
+        squad = random_players(11, seed=1)
+        lineup = {code: player["skills"] for code, player in zip(FOUR_FOUR_TWO, squad)}
+        with self.assertRaises(ValueError):
+            transfers.best_purchases(lineup, [], ALL_ONE_WEIGHTS, -1.)
+        with self.assertRaises(ValueError):
+            transfers.best_purchases(lineup, [], dict(ALL_ONE_WEIGHTS, M=-1.), 5.)
+        with self.assertRaises(ValueError):
+            transfers.best_purchases(lineup, [], ALL_ONE_WEIGHTS, 5., gap=-1.)
+        with self.assertRaises(ValueError):
+            transfers.best_purchases(lineup, [], ALL_ONE_WEIGHTS, 5., time_budget=-1.)
+        with self.assertRaises(ValueError):
+            transfers.best_purchases({"XX": squad[0]["skills"]}, [], ALL_ONE_WEIGHTS, 5.)
+
+
+class TestParseLineup(unittest.TestCase):
+    def test_parses_and_rejects(self):
+        squad = random_players(12, seed=2)
+        for index, player in enumerate(squad):
+            player["player_id"] = 100 + index
+        spec = ",".join(f"{code}={100 + index}" for index, code in enumerate(FOUR_FOUR_TWO))
+        self.assertEqual(transfers.parse_lineup(spec.lower(), squad),
+                         {code: index for index, code in enumerate(FOUR_FOUR_TWO)})
+        for bad in (spec.replace("GK=100", "GK=999"), spec.replace("GK=", "XX="),
+                    spec.replace("GK=100,", ""), spec.replace("LW=105", "LWB=105")):
+            with self.assertRaises(ValueError):
+                transfers.parse_lineup(bad, squad)
+
+
+def write_priced_csv(rows: list[str]) -> str:
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(CSV_HEADER + "Price\n")
+        for row in rows:
+            f.write(row + "\n")
+    return path
+
+
+class TestMain(unittest.TestCase):
+    def test_prints_purchases(self):
+        rng = random.Random(5)
+        squad = [f"{i};First{i};;Last{i};{rng.randint(18, 30)};10;5;3;;6;7;"
+                 + ";".join(f"{rng.randint(2, 10)}.0" for _ in range(7)) + ";"
+                 for i in range(1, 13)]
+        market = [f"{i};Buy{i};;Last{i};25;10;5;0;;6;7;"
+                  + ";".join(f"{rng.randint(8, 16)}.0" for _ in range(7)) + f";{price}"
+                  for i, price in ((20, "1 500"), (21, "900"), (22, ""))]
+        squad_path, market_path = write_priced_csv(squad), write_priced_csv(market)
+        self.addCleanup(os.remove, squad_path)
+        self.addCleanup(os.remove, market_path)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            transfers.main([squad_path, market_path, "--budget", "2000", "--lineup",
+                            ",".join(f"{code}={i}" for i, code in enumerate(FOUR_FOUR_TWO, start=1))])
+        lines = stdout.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith("current objective"))
+        self.assertIn("  buy Buy", lines[1])
+        self.assertTrue(any(line.startswith("spent") for line in lines))
+        self.assertIn("1 market player(s) have no price", stderr.getvalue())
+        self.assertNotIn("Buy22", stdout.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
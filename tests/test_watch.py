@@ -0,0 +1,156 @@
+import contextlib
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import rank_players
+import watch
+from tests.test_player_index import random_players
+from tests.test_rank_players import ALL_ONE_WEIGHTS, CSV_HEADER, FULL_ROW, FULL_ROW_2
+
+SKILL_ORDER = ["Goalkeeping", "Playmaking", "Scoring", "Passing", "Winger", "Defending",
+               "Set Pieces"]
+
+
+def export_row(player_id, player):
+    years, _, days = player["age"].partition(".")
+    skills = ";".join(str(player["skills"][skill]) for skill in SKILL_ORDER)
+    return (f"{player_id};{player['name']};;X;{years};{days};{player['experience']};0;;"
+            f"{player['form']};5;{skills};")
+
+
+class WatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.mtime = 1_000_000_000
+
+    def write(self, name, rows):
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(CSV_HEADER + "\n" + "\n".join(rows) + "\n")
+        self.mtime += 10
+        os.utime(path, (self.mtime, self.mtime))
+        return path
+
+    def assert_matches_full_ranking(self, ranking):
+        expected = rank_players.rank_players(
+            [entry for entry in ranking.entries.values()], ranking.position, ranking.weights)
+        self.assertEqual([e["player_id"] for e in ranking.ranked()],
+                         [e["player_id"] for e in expected])
+
+
+class TestIncrementalRanking(WatchTestCase):
+    def test_only_changed_rows_are_rescored(self):
+        players = random_players(200, seed=12)
+        self.write("week1.csv", [export_row(i, p) for i, p in enumerate(players, start=1)])
+        ranking = watch.IncrementalRanking("wingback", ALL_ONE_WEIGHTS)
+        deltas = ranking.poll(self.directory)
+        self.assertEqual(len(deltas), 200)
+        self.assertTrue(all(delta["old_rank"] is None for delta in deltas))
+        self.assert_matches_full_ranking(ranking)
+
+        self.assertEqual(ranking.poll(self.directory), [])
+        self.assertEqual(ranking.rescored, 200)
+
+        players[4] = dict(players[4], skills=dict(players[4]["skills"], Defending=20.0))
+        players[9] = dict(players[9], form=1.0, age="30.1")
+        players[15] = dict(players[15], age="40.0")
+        self.write("week2.csv", [export_row(i, p) for i, p in enumerate(players, start=1)])
+        before = {pid: ranking.rank_of(pid) for pid in (5, 10)}
+        deltas = ranking.poll(self.directory)
+        self.assertEqual(ranking.rescored, 202)
+        self.assertEqual(sorted(delta["player_id"] for delta in deltas), [5, 10])
+        for delta in deltas:
+            self.assertEqual(delta["old_rank"], before[delta["player_id"]])
+            self.assertEqual(delta["new_rank"], ranking.rank_of(delta["player_id"]))
+        self.assertEqual(ranking.entries[16]["age"], "40.0")
+        self.assert_matches_full_ranking(ranking)
+
+    def test_rewritten_file_is_parsed_again(self):
+        self.write("squad.csv", [FULL_ROW_2])
+        ranking = watch.IncrementalRanking("wingback", ALL_ONE_WEIGHTS)
+        ranking.poll(self.directory)
+        self.write("squad.csv", [FULL_ROW, FULL_ROW_2])
+        deltas = ranking.poll(self.directory)
+        self.assertEqual([(d["player_id"], d["old_rank"], d["new_rank"]) for d in deltas],
+                         [(1, None, 1)])
+        self.assertEqual([e["name"] for e in ranking.ranked()], ["Ako Jansons", "Weak Player"])
+
+    def test_players_missing_from_the_latest_export_are_dropped(self):
+        players = random_players(80, seed=5)
+        self.write("week1.csv", [export_row(i, p) for i, p in enumerate(players, start=1)])
+        ranking = watch.IncrementalRanking("wingback", ALL_ONE_WEIGHTS)
+        ranking.poll(self.directory)
+        old_rank = ranking.rank_of(3)
+        self.write("week2.csv", [export_row(i, p) for i, p in enumerate(players, start=1)
+                                 if i not in (3, 40)])
+        deltas = ranking.poll(self.directory)
+        by_id = {delta["player_id"]: delta for delta in deltas}
+        self.assertEqual(sorted(by_id), [3, 40])
+        self.assertTrue(all(delta["new_rank"] is None for delta in deltas))
+        self.assertEqual(by_id[3]["old_rank"], old_rank)
+        self.assertEqual(len(ranking), 78)
+        self.assertNotIn(3, ranking.entries)
+        self.assert_matches_full_ranking(ranking)
+
+    def test_truncated_export_is_retried(self):
+        self.write("week1.csv", [FULL_ROW_2])
+        ranking = watch.IncrementalRanking("wingback", ALL_ONE_WEIGHTS)
+        ranking.poll(self.directory)
+        path = os.path.join(self.directory, "week2.csv.gz")
+        data = gzip.compress((CSV_HEADER + "\n" + FULL_ROW + "\n").encode())
+        with open(path, "wb") as f:
+            f.write(data[:len(data) // 2])
+        warnings = []
+        self.assertEqual(ranking.poll(self.directory, warnings.append), [])
+        self.assertEqual(len(warnings), 1)
+        self.assertIn("trying again", warnings[0])
+        self.assertEqual(len(ranking), 1)
+        with open(path, "wb") as f:
+            f.write(data)
+        self.mtime += 10
+        os.utime(path, (self.mtime, self.mtime))
+        deltas = ranking.poll(self.directory)
+        self.assertEqual(sorted((d["player_id"], d["new_rank"]) for d in deltas), [(1, 1), (2, None)])
+
+    def test_export_without_rows_drops_nobody(self):
+        self.write("week1.csv", [FULL_ROW, FULL_ROW_2])
+        ranking = watch.IncrementalRanking("wingback", ALL_ONE_WEIGHTS)
+        ranking.poll(self.directory)
+        self.write("week2.csv", [])
+        warnings = []
+        self.assertEqual(ranking.poll(self.directory, warnings.append), [])
+        self.assertEqual(len(ranking), 2)
+        self.assertIn("not applied", warnings[0])
+
+    def test_ignores_other_files(self):
+        with open(os.path.join(self.directory, "notes.txt"), "w", encoding="utf-8") as f:
+            f.write("not an export")
+        self.assertEqual(watch.IncrementalRanking("winger", ALL_ONE_WEIGHTS)
+                         .poll(self.directory), [])
+
+
+class TestMain(WatchTestCase):
+    def test_once_prints_ranking(self):
+        self.write("a.csv", [FULL_ROW, FULL_ROW_2])
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            watch.main([self.directory, "wingback", "--once"])
+        lines = stdout.getvalue().splitlines()
+        self.assertIn("Ako Jansons", lines[2])
+
+    def test_format_delta(self):
+        self.assertEqual(watch.format_delta({"player_id": 7, "name": "A", "old_rank": 9,
+                                             "new_rank": 3, "best_total": 1.5}),
+                         "A [7]: 9 -> 3 (+6), best 1.500")
+        self.assertEqual(watch.format_delta({"player_id": 7, "name": "A", "old_rank": 9,
+                                             "new_rank": None, "best_total": 1.5}),
+                         "A [7]: dropped from 9, best 1.500")
+
+
+if __name__ == "__main__":
+    unittest.main()
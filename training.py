@@ -1,8 +1,55 @@
+import json
 import math
 from age import Age
-import logging
+import log
 
-def calculate_training(age, level, training, coach=5, assistant=10, intensity=100, stamina=10, minutes=90):
+TRAINING_TYPES = ("Goalkeeping", "Defending", "Playmaking", "Winger", "Passing", "Scoring", "Set Pieces")
+
+# Fitted constants of the training model; calibration.py refits them from
+# observed skill changes and writes them out for load_parameters.
+PARAMS = {
+    "under_9_scale": 16.289,
+    "under_9_rate": -0.1396,
+    "over_9_scale": 54.676,
+    "over_9_offset": 1.438,
+    "drop_start": 14.,
+    "drop_shift_over_20": 0.39,
+    "drop_a": 0.000006111,
+    "drop_b": 0.000808,
+    "drop_c": -0.026017,
+    "drop_d": 0.192775,
+    "Goalkeeping": 0.0510,
+    "Defending": 0.0288,
+    "Playmaking": 0.0336,
+    "Winger": 0.048,
+    "Passing": 0.036,
+    "Scoring": 0.0324,
+    "Set Pieces": 0.147,
+    "age_numerator": 54.,
+    "age_offset": 37.,
+}
+PARAMETERS_FORMAT = "ht_optimizer.training_parameters"
+PARAMETERS_VERSION = 1
+
+
+def load_parameters(path):
+    """
+    Read a parameter set written by calibration.py.
+
+    Parameters missing from the file keep their PARAMS defaults; unknown
+    names or another format version raise ValueError.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") != PARAMETERS_FORMAT or data.get("version") != PARAMETERS_VERSION:
+        raise ValueError(f"{path} is not a version {PARAMETERS_VERSION} training parameter set")
+    unknown = set(data["params"]) - set(PARAMS)
+    if unknown:
+        raise ValueError(f"unknown training parameters: {', '.join(sorted(unknown))}")
+    return {**PARAMS, **{name: float(value) for name, value in data["params"].items()}}
+
+def calculate_training(age, level, training, coach=5, assistant=10, intensity=100, stamina=10, minutes=90,
+                       params=None):
     """
     Calculate the training effect based on various parameters.
 
@@ -24,56 +71,60 @@ def calculate_training(age, level, training, coach=5, assistant=10, intensity=10
         Stamina portion of training as percentage.
     minutes : int 
         Minutes the player played in the trainable position.
+    params : dict, optional
+        Model constants (see PARAMS and load_parameters); defaults to PARAMS.
 
     Returns
     -------
     float
         The calculated training effect.
     """
+    if params is None:
+        params = PARAMS
     adj_level = level - 1
-    f_lvl = level_factor(adj_level)
+    f_lvl = level_factor(adj_level, params)
     K_coach = coach_factor(coach)
     K_assistant = assistant_factor(assistant)
     K_intensity = intensity / 100.0
     K_stamina = 1 - stamina / 100.0
-    K_training = training_factor(training)
-    K_age = age_factor(age.get_age())
+    K_training = training_factor(training, params)
+    K_age = age_factor(age.get_age(), params)
     K_time = minutes / 90.0
-    #logging.log(f"Factors - Level: {f_lvl:.4f}, Coach: {K_coach:.4f}, Assistant: {K_assistant:.4f}, Intensity: {K_intensity:.4f}, Stamina: {K_stamina:.4f}, Training: {K_training:.4f}, Age: {K_age:.4f}, Time: {K_time:.4f}")
+    #log.log(f"Factors - Level: {f_lvl:.4f}, Coach: {K_coach:.4f}, Assistant: {K_assistant:.4f}, Intensity: {K_intensity:.4f}, Stamina: {K_stamina:.4f}, Training: {K_training:.4f}, Age: {K_age:.4f}, Time: {K_time:.4f}")
 
     training_amount = f_lvl * K_coach * K_assistant * K_intensity * K_stamina * K_training * K_age * K_time
-    # logging.log(f"Pre-drop Training Amount: {training_amount:.4f}")
-    training_drop = get_training_level_drop(adj_level)
+    # log.log(f"Pre-drop Training Amount: {training_amount:.4f}")
+    training_drop = get_training_level_drop(adj_level, params)
     if training_drop > training_amount:
         return 0.
-    # logging.log(f"Skill: {training}, Level: {level:.2f}, Age: {age.years}.{age.days}, Final: {training_amount - training_drop:.4f}")
+    # log.log(f"Skill: {training}, Level: {level:.2f}, Age: {age.years}.{age.days}, Final: {training_amount - training_drop:.4f}")
     return training_amount - training_drop
 
-def get_training_level_drop(level):
-    if level < 14:
+def get_training_level_drop(level, params=PARAMS):
+    if level < params["drop_start"]:
         return 0.
     if level > 20:
-        level += 0.39
-    a = 0.000006111
-    b = 0.000808
-    c = -0.026017
-    d = 0.192775
+        level += params["drop_shift_over_20"]
+    a = params["drop_a"]
+    b = params["drop_b"]
+    c = params["drop_c"]
+    d = params["drop_d"]
     return a * level**3 + b * level**2 + c * level + d
 
 
-def level_factor(level):
+def level_factor(level, params=PARAMS):
     if level < 9:
-        return level_factor_under_9(level)
+        return level_factor_under_9(level, params)
     else:
-        return level_factor_over_9(level)
+        return level_factor_over_9(level, params)
 
-def level_factor_under_9(level):
-    return 16.289 * (math.e ** (-0.1396 * level))
+def level_factor_under_9(level, params=PARAMS):
+    return params["under_9_scale"] * (math.e ** (params["under_9_rate"] * level))
 
-def level_factor_over_9(level):
+def level_factor_over_9(level, params=PARAMS):
     if level == 0:
         return 0.
-    return 54.676 / level - 1.438
+    return params["over_9_scale"] / level - params["over_9_offset"]
 
 def coach_factor(coach):
     if coach == 1:
@@ -92,23 +143,11 @@ def coach_factor(coach):
 def assistant_factor(assistant):
     return 1 + 0.035 * assistant
 
-def training_factor(training):
-    if training == "Goalkeeping":
-        return 0.0510
-    elif training == "Defending":
-        return 0.0288 
-    elif training == "Playmaking":
-        return 0.0336
-    elif training == "Winger":
-        return 0.048
-    elif training == "Passing":
-        return 0.036
-    elif training == "Scoring":
-        return 0.0324
-    elif training == "Set Pieces":
-        return 0.147
+def training_factor(training, params=PARAMS):
+    if training in TRAINING_TYPES:
+        return params[training]
     else:
         return 0.
 
-def age_factor(age):
-    return 54 / (age + 37.)
+def age_factor(age, params=PARAMS):
+    return params["age_numerator"] / (age + params["age_offset"])
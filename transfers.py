@@ -0,0 +1,602 @@
+"""Pick the transfer-market purchases within a budget that most improve the XI.
+
+The objective is lineup_search's: the sector-weighted sum of
+ratings.calculate_team_ratings. The XI is an {order code: skills} lineup as
+calculate_team_ratings takes it. A purchase replaces the player in one slot
+with a market player in any order of that slot, so the overcrowding factors
+stay the same and each slot contributes a fixed vector of sector sums.
+
+Precompute. Every market player's contribution vector is computed once per
+order, column by column over the whole market, and turned into the change it
+makes to the sector sums in each slot. Options that change nothing for the
+better, cost more than the budget or are beaten by an order of the same
+player are dropped. So is any option that at least as many other players as
+purchases allowed are at least as cheap and at least as good in every sector
+for: a purchase set using it leaves one of them unbought, and buying that
+player instead costs no more and rates at least as high. Before that, the
+box of sector sums the budget can reach is computed and every option that
+could not raise the objective anywhere inside it is dropped, which narrows
+the box; this is repeated a few times.
+
+Search. Depth first over the slots, buying one of the slot's options or
+keeping the incumbent. The bound of a node uses the same chords as
+lineup_search: inside the box of sector sums the remaining slots can reach,
+each sector's chord lies above its curve, which makes the objective linear
+in the purchases. What is left is a multiple-choice knapsack, whose budget
+constraint is moved into the prices by a Lagrange multiplier: the slope of
+the first upper-hull segment that no longer fits when segments of all slots
+are bought steepest first. Options whose reduced value cannot lift a
+completion above the best purchase set are dropped and the bound is
+recomputed on the narrower box. The same multiplier bounds every child in
+constant time, so children are visited best bound first and the rest are
+skipped as soon as one cannot win; children start from their parent's box.
+Two greedy purchase sets (by gain and by gain per price) give the first
+sets to prune against. With gap > 0 a node is pruned unless it can beat the
+best set by more than gap, so the result is within gap of the optimum. With
+a time budget the search stops once it runs out and returns the best set
+found; the highest bound among the children it left unvisited proves how far
+that set can be below the optimum. The budget covers the precompute too: out
+of time, its filters stop and keep the options they have not checked, and
+only the greedy sets and the root bound are computed.
+"""
+
+import argparse
+import bisect
+import itertools
+import sys
+import time
+
+import lineup_search
+import rank_players
+import ratings
+
+SECTORS = lineup_search.SECTORS
+EPSILON = lineup_search.EPSILON
+# order code -> the lineup_search slot it is played in
+ORDER_SLOT = {code: slot for slot, codes in lineup_search.SLOT_ORDERS.items() for code in codes}
+# passes of dropping options that cannot gain inside the box the rest can reach
+FILTER_ROUNDS = 3
+# passes of dropping options by their reduced value and recomputing a node's bound
+FIXING_ROUNDS = 3
+
+
+def column_vectors(columns: dict[str, list[float]], code: str, factor: float) -> list[tuple]:
+    """lineup_search.contribution_vector of every player at once, from skill columns."""
+    size = len(next(iter(columns.values()))) if columns else 0
+    sums = [None] * len(SECTORS)
+    for skill, sector, weight in lineup_search.ORDER_TERMS.get(code, ()):
+        scale = weight * factor
+        terms = [(level - 1.) * scale for level in columns[skill]]
+        sums[sector] = terms if sums[sector] is None else list(map(float.__add__, sums[sector], terms))
+    zeros = [0.] * size
+    return list(zip(*(column if column is not None else zeros for column in sums)))
+
+
+def upper_hull(points) -> list[tuple[float, float]]:
+    """Vertices of the concave upper hull of (price, value) points sorted by price, from (0, 0).
+
+    Only rising segments are kept: a point to the right of the highest one
+    is never the best choice under a non-negative price multiplier.
+    """
+    hull = [(0., 0.)]
+    for price, value in points:
+        if value <= hull[-1][1]:
+            continue
+        while len(hull) >= 2:
+            (p1, v1), (p2, v2) = hull[-2], hull[-1]
+            # drop the middle point when it lies on or under the segment to the new one
+            if (v2 - v1) * (price - p1) <= (value - v1) * (p2 - p1):
+                hull.pop()
+            else:
+                break
+        hull.append((price, value))
+    return hull
+
+
+def rising_hull(prices, values) -> list[tuple[float, float]]:
+    """upper_hull of the points (prices[i], values[i]), sorted by price.
+
+    Only points worth more than every cheaper one can be hull vertices; they
+    are picked out with C-level iterators before the hull loop sees them.
+    """
+    values = list(values)
+    best_before = itertools.accumulate(values, max, initial=0.)
+    return upper_hull(itertools.compress(zip(prices, values), map(float.__gt__, values, best_before)))
+
+
+def option_columns(options: list[tuple]) -> tuple[list[float], list[tuple]]:
+    """Prices and per-sector delta columns of a slot's options, for column-wise arithmetic."""
+    return [option[0] for option in options], list(zip(*(option[3] for option in options))) or [()] * len(SECTORS)
+
+
+def linear_values(columns: list[tuple], slopes: list[float]) -> list[float]:
+    """slopes . delta of every option, summed column by column."""
+    values = [0.] * len(columns[0])
+    for slope, column in zip(slopes, columns):
+        if slope:
+            values = list(map(float.__add__, values, map(slope.__mul__, column)))
+    return values
+
+
+def knapsack_bound(hulls: list[list[tuple[float, float]]], budget: float,
+                   buys: int) -> tuple[float, float, list[float]]:
+    """Lagrangian bound of picking at most one point per hull, at most buys in all, within budget.
+
+    Returns (bound, multiplier, each hull's value at the multiplier). For any
+    multiplier m >= 0, m * budget plus the buys largest of max(value - m *
+    price) bounds every pick. The multiplier used is the one of the linear
+    relaxation: hull segments are bought greedily by slope until the budget
+    runs out, and the slope of the first one that does not fit is m.
+    """
+    segments = []
+    for vertices in hulls:
+        for (p0, v0), (p1, v1) in zip(vertices, vertices[1:]):
+            slope = (v1 - v0) / (p1 - p0) if p1 > p0 else float("inf")
+            segments.append((slope, p1 - p0))
+    segments.sort(reverse=True)
+    multiplier = 0.
+    left = budget
+    for slope, cost in segments:
+        if cost > left:
+            multiplier = slope
+            break
+        left -= cost
+    values = [max(value - multiplier * price for price, value in vertices) for vertices in hulls]
+    return multiplier * budget + top_sum(values, buys), multiplier, values
+
+
+def top_sum(values: list[float], count: int) -> float:
+    if count <= 0:
+        return 0.
+    if count >= len(values):
+        return sum(values)
+    return sum(sorted(values, reverse=True)[:count])
+
+
+class TransferSearch:
+    """Branch and bound for the best purchase set of one lineup and market."""
+
+    def __init__(self, lineup: dict[str, dict], market: list[dict], weights: dict[str, float],
+                 budget: float, max_buys: int | None = None, gap: float = 0.,
+                 time_budget: float | None = None):
+        # the time budget covers the precompute as well as the search
+        self.deadline = None if time_budget is None else time.monotonic() + time_budget
+        if any(value < 0 for value in weights.values()):
+            raise ValueError("sector weights must not be negative")
+        if budget < 0:
+            raise ValueError("the budget must not be negative")
+        unknown = [code for code in lineup if code not in ORDER_SLOT]
+        if unknown:
+            raise ValueError(f"unknown order code(s) in the lineup: {', '.join(unknown)}")
+        self.lineup = lineup
+        self.market = market
+        self.weights = [weights[sector] for sector in SECTORS]
+        self.budget = budget
+        # a node is pruned unless it can beat the best purchase set by more than this
+        self.slack = EPSILON + gap
+        self.gap = gap
+        # highest bound of the subtrees left unvisited when the time budget ran out
+        self.open_bound = None
+        self.codes = list(lineup)
+        self.max_buys = len(self.codes) if max_buys is None else min(max_buys, len(self.codes))
+        overcrowding = ratings.count_overcrowding(self.codes)
+        factors = [ratings.get_overcowding_factor(code, overcrowding) for code in self.codes]
+        incumbents = [lineup_search.contribution_vector(lineup[code], code, factor)
+                      for code, factor in zip(self.codes, factors)]
+        self.base = [sum(vector[s] for vector in incumbents) for s in range(len(SECTORS))]
+        self.base_objective = lineup_search.objective(self.base, self.weights)
+
+        # market players without a price cannot be bought
+        self.priced = [index for index, player in enumerate(market)
+                       if player.get("price") is not None and player["price"] <= budget]
+        columns = {skill: [market[index]["skills"][skill] for index in self.priced]
+                   for skill in rank_players.SKILL_COLUMNS.values()}
+        vectors = {}
+        # options[slot] = [(price, player, code, delta)], cheapest first
+        self.options = []
+        for code, factor, incumbent in zip(self.codes, factors, incumbents):
+            slot_options = []
+            slot_codes = lineup_search.SLOT_ORDERS[ORDER_SLOT[code]]
+            per_code = []
+            for slot_code in slot_codes:
+                key = (slot_code, factor)
+                if key not in vectors:
+                    vectors[key] = column_vectors(columns, slot_code, factor)
+                per_code.append((slot_code, vectors[key]))
+            for position, index in enumerate(self.priced):
+                deltas = [(tuple(map(float.__sub__, player_vectors[position], incumbent)), slot_code)
+                          for slot_code, player_vectors in per_code]
+                for delta, slot_code in deltas:
+                    if not any(change > EPSILON for change in delta):
+                        continue
+                    if any(other != delta and all(map(float.__ge__, other, delta))
+                           or (other == delta and other_code < slot_code)
+                           for other, other_code in deltas):
+                        continue
+                    slot_options.append((market[index]["price"], index, slot_code, delta))
+            slot_options.sort(key=lambda option: (option[0], option[1], option[2]))
+            self.options.append(slot_options)
+        self.cap_buys()
+        # options that cannot gain anywhere in the reachable box narrow the box when dropped
+        # both filters only narrow the search, so out of time they stop and keep the rest
+        for _ in range(FILTER_ROUNDS):
+            if self.out_of_time():
+                break
+            low, high = self.sector_range(list(map(option_columns, self.options)), self.base,
+                                          budget, self.max_buys)
+            kept = [[option for option in options if self.upper_gain(option[3], low, high) > 0.]
+                    for options in self.options]
+            if sum(map(len, kept)) == sum(map(len, self.options)):
+                break
+            self.options = kept
+            self.cap_buys()
+        self.drop_dominated()
+        self.nodes = 0
+        self.best = self.base_objective
+        self.best_purchases = []
+
+    def out_of_time(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def drop_dominated(self) -> None:
+        """Drop every option that enough other players beat at no higher price.
+
+        A purchase set with an option holds at most as many other players as
+        the rest of the budget buys; with one more player at least as cheap
+        and at least as good in every sector, one of them is left unbought and
+        buying them instead rates at least as high. Each option is compared
+        with the cheaper-or-equal options of its slot in descending order of
+        total change. Equal options are ordered by player so the swaps cannot
+        cycle. Options not yet compared when the time budget runs out are kept.
+        """
+        for slot, options in enumerate(self.options):
+            if self.out_of_time():
+                return
+            # the cheapest option of every other slot, for how many more the rest of the budget buys
+            cheapest = list(itertools.accumulate(sorted(
+                others[0][0] for other, others in enumerate(self.options) if other != slot and others)))
+            kept = []
+            # options seen so far (never more expensive), kept sorted by descending total
+            seen = []
+            for index, (price, player, code, delta) in enumerate(options):
+                if self.out_of_time():
+                    kept.extend(options[index:])
+                    break
+                total = sum(delta)
+                limit = min(self.max_buys,
+                            bisect.bisect_right(cheapest, self.budget - price + EPSILON) + 1)
+                beaten_by = set()
+                for negative_total, other_player, other_delta in seen:
+                    if -negative_total < total - EPSILON or len(beaten_by) >= limit:
+                        break
+                    if other_player != player and all(map(float.__ge__, other_delta, delta)):
+                        beaten_by.add(other_player)
+                if len(beaten_by) < limit:
+                    kept.append((price, player, code, delta))
+                bisect.insort(seen, (-total, player, delta))
+            options[:] = kept
+
+    def cap_buys(self) -> None:
+        """Lower max_buys to the number of slots whose cheapest options fit the budget together."""
+        cheapest = sorted(options[0][0] for options in self.options if options)
+        self.max_buys = min(self.max_buys, sum(1 for total in itertools.accumulate(cheapest)
+                                               if total <= self.budget + EPSILON))
+
+    def objective(self, sums: list[float]) -> float:
+        return lineup_search.objective(sums, self.weights)
+
+    def sector_range(self, slot_columns: list[tuple], sums: list[float], budget: float,
+                     buys: int) -> tuple[list[float], list[float]]:
+        """Lowest and highest sum of each sector that buying within budget reaches.
+
+        slot_columns holds the option_columns of each open slot.
+        """
+        low, high = [], []
+        for s, total in enumerate(sums):
+            rise = knapsack_bound([rising_hull(prices, columns[s])
+                                   for prices, columns in slot_columns], budget, buys)[0]
+            fall = knapsack_bound([rising_hull(prices, map(float.__neg__, columns[s]))
+                                   for prices, columns in slot_columns], budget, buys)[0]
+            low.append(total - fall)
+            high.append(total + rise)
+        return low, high
+
+    def upper_gain(self, delta: tuple, low: list[float], high: list[float]) -> float:
+        """Most an option can add to the objective when the sector sums stay within [low, high].
+
+        The rating is convex, so a rise gains most at the top of the range and
+        a fall loses least at the bottom. An option that cannot gain can be
+        left out of any purchase set without lowering it.
+        """
+        gain = 0.
+        for weight, change, a, b in zip(self.weights, delta, low, high):
+            if change > 0.:
+                gain += weight * (lineup_search.sector_rating(b) - lineup_search.sector_rating(b - change)) / 4.
+            elif change < 0.:
+                gain += weight * (lineup_search.sector_rating(a) - lineup_search.sector_rating(a - change)) / 4.
+        return gain
+
+    def bound(self, slot_options: list[list], sums: list[float], budget: float, buys: int,
+              box: tuple | None = None):
+        """Upper bound of every completion of a node, with what its children need.
+
+        slot_options are the node's options per open slot. Returns (bound,
+        constant, multiplier, the value of each slot at the multiplier, the
+        options still worth buying per slot as (option, linear value) pairs,
+        the (low, high) box of the sector sums), where constant + multiplier *
+        budget plus the values of the slots bought in bounds any completion.
+        An option is dropped once even the best completion through it under
+        the multiplier cannot beat the best purchase set found; that narrows
+        the box, so the bound is recomputed a few times. A box passed in (the
+        parent's, which holds every completion of its children) saves
+        computing the first one.
+        """
+        floor = self.best + self.slack
+        pairs = None
+        for _ in range(FIXING_ROUNDS):
+            slot_columns = list(map(option_columns, slot_options))
+            if box is None:
+                box = self.sector_range(slot_columns, sums, budget, buys)
+            low, high = box
+            corner = self.objective(high)
+            slopes = []
+            constant = 0.
+            for weight, total, a, b in zip(self.weights, sums, low, high):
+                if b - a > EPSILON:
+                    slope = weight * (lineup_search.sector_rating(b) - lineup_search.sector_rating(a)) / (b - a) / 4.
+                else:
+                    slope = 0.
+                slopes.append(slope)
+                constant += weight * (lineup_search.sector_rating(a) / 4. + 1.) + slope * (total - a)
+            linears = [linear_values(columns, slopes) for _, columns in slot_columns]
+            pairs = [list(zip(options, linear)) for options, linear in zip(slot_options, linears)]
+            value, multiplier, values = knapsack_bound(
+                [rising_hull(prices, linear) for (prices, _), linear in zip(slot_columns, linears)],
+                budget, buys)
+            bound = min(corner, constant + value)
+            if bound <= floor:
+                break
+            base = constant + multiplier * budget
+            kept = []
+            for slot, slot_pairs in enumerate(pairs):
+                rest = values[:slot] + values[slot + 1:]
+                threshold = floor - base - top_sum(rest, buys - 1)
+                kept.append([(option, linear) for option, linear in slot_pairs
+                             if linear - multiplier * option[0] > threshold])
+            dropped = sum(map(len, pairs)) - sum(map(len, kept))
+            pairs = kept
+            if not dropped:
+                break
+            slot_options = [[option for option, _ in slot_pairs] for slot_pairs in pairs]
+            box = None
+        return bound, constant, multiplier, values, pairs, box
+
+    def visit(self, slots: tuple, slot_options: list[list], sums: list[float], budget: float,
+              purchases: list, box: tuple | None = None) -> None:
+        """Search the purchases for the open slots of a node, given the options left in each."""
+        self.nodes += 1
+        value = self.objective(sums)
+        if value > self.best + EPSILON:
+            self.best, self.best_purchases = value, list(purchases)
+        buys = self.max_buys - len(purchases)
+        if not slots or buys <= 0:
+            return
+        bound, constant, multiplier, values, pairs, box = self.bound(slot_options, sums, budget, buys, box)
+        if bound <= self.best + self.slack:
+            return
+        # branch on the slot that adds most to the bound
+        branch = max(range(len(slots)), key=values.__getitem__)
+        slot = slots[branch]
+        rest_slots = slots[:branch] + slots[branch + 1:]
+        rest_pairs = pairs[:branch] + pairs[branch + 1:]
+        rest = values[:branch] + values[branch + 1:]
+        # the node's multiplier bounds each child in constant time
+        base = constant + multiplier * budget
+        children = [(base + top_sum(rest, buys), None)]
+        rest_bound = base + top_sum(rest, buys - 1)
+        for option, linear in pairs[branch]:
+            children.append((rest_bound + linear - multiplier * option[0], option))
+        children.sort(key=lambda child: child[0], reverse=True)
+        floor = None
+        for child_bound, option in children:
+            if child_bound <= self.best + self.slack:
+                break
+            if self.out_of_time():
+                # children come best bound first, so this one bounds every child left
+                self.open_bound = max(child_bound, self.open_bound or child_bound)
+                break
+            if floor != self.best:
+                # a better purchase set rules out more options for the remaining children
+                floor = self.best
+                rest_options = []
+                for index, slot_pairs in enumerate(rest_pairs):
+                    threshold = (floor + self.slack - base
+                                 - top_sum(values[:index] + values[index + 1:] if index < branch
+                                           else values[:index + 1] + values[index + 2:], buys - 1))
+                    rest_options.append([option for option, linear in slot_pairs
+                                         if linear - multiplier * option[0] > threshold])
+            if option is None:
+                self.visit(rest_slots, rest_options, sums, budget, purchases, box)
+                continue
+            price, player, code, delta = option
+            left = budget - price
+            child_options = [[other for other in options
+                              if other[1] != player and other[0] <= left + EPSILON]
+                             for options in rest_options]
+            purchases.append((slot, player, code))
+            self.visit(rest_slots, child_options, list(map(float.__add__, sums, delta)), left,
+                       purchases, box)
+            purchases.pop()
+
+    def greedy(self, per_price: bool) -> None:
+        """Buy, while the budget lasts, whichever option raises the objective most.
+
+        With per_price the gain is divided by the price. The result is a
+        first purchase set for the search to prune against.
+        """
+        sums, budget, purchases = list(self.base), self.budget, []
+        slot_options = list(enumerate(self.options))
+        while slot_options and len(purchases) < self.max_buys:
+            current = self.objective(sums)
+            best_score, choice = 0., None
+            for slot, options in slot_options:
+                for option in options:
+                    if option[0] > budget:
+                        break
+                    gain = self.objective(list(map(float.__add__, sums, option[3]))) - current
+                    score = gain / max(option[0], EPSILON) if per_price else gain
+                    if gain > EPSILON and score > best_score:
+                        best_score, choice = score, (slot, option)
+            if choice is None:
+                break
+            slot, (price, player, code, delta) = choice
+            sums = list(map(float.__add__, sums, delta))
+            budget -= price
+            purchases.append((slot, player, code))
+            slot_options = [(other, [option for option in options if option[1] != player])
+                            for other, options in slot_options if other != slot]
+        value = self.objective(sums)
+        if value > self.best + EPSILON:
+            self.best, self.best_purchases = value, purchases
+
+    def run(self) -> dict:
+        """Search; returns the result dict described in best_purchases."""
+        self.best = self.base_objective
+        self.best_purchases = []
+        self.open_bound = None
+        self.greedy(per_price=False)
+        self.greedy(per_price=True)
+        self.visit(tuple(range(len(self.codes))), self.options, list(self.base), self.budget, [])
+        purchases = [{"slot": self.codes[slot], "player": player, "order": code,
+                      "price": self.market[player]["price"]}
+                     for slot, player, code in sorted(self.best_purchases)]
+        return {
+            "objective": self.best,
+            "base_objective": self.base_objective,
+            "purchases": purchases,
+            "spent": sum(purchase["price"] for purchase in purchases),
+            "options": sum(len(options) for options in self.options),
+            "nodes": self.nodes,
+            "complete": self.open_bound is None,
+            "gap": self.gap if self.open_bound is None else max(self.gap, self.open_bound - self.best),
+        }
+
+
+def best_purchases(lineup: dict[str, dict], market: list[dict], weights: dict[str, float],
+                   budget: float, max_buys: int | None = None, gap: float = 0.,
+                   time_budget: float | None = None) -> dict:
+    """The purchases within budget that most raise the lineup's weighted team rating.
+
+    lineup is {order code: skills}; market players are parse_players dicts
+    and those without a price are never bought. Returns objective and
+    base_objective (weighted team rating after and before), purchases
+    [{"slot": replaced order code, "player": market index, "order": new order
+    code, "price"}], spent, and the number of options kept and nodes visited.
+    The search stops after time_budget seconds, counted from the start of
+    the precompute, when one is given; complete
+    says whether it finished, and gap is how far below the best objective the
+    result can be: the gap asked for, or the proven gap of a stopped search.
+    """
+    if gap < 0:
+        raise ValueError("the gap must not be negative")
+    if time_budget is not None and time_budget < 0:
+        raise ValueError("the time budget must not be negative")
+    return TransferSearch(lineup, market, weights, budget, max_buys, gap, time_budget).run()
+
+
+def apply_purchases(lineup: dict[str, dict], market: list[dict], purchases: list[dict]) -> dict:
+    """The lineup after the purchases, in the original slot order."""
+    bought = {purchase["slot"]: purchase for purchase in purchases}
+    team = {}
+    for code, skills in lineup.items():
+        if code in bought:
+            team[bought[code]["order"]] = market[bought[code]["player"]]["skills"]
+        else:
+            team[code] = skills
+    return team
+
+
+def parse_lineup(spec: str, squad: list[dict]) -> dict[str, int]:
+    """Turn "GK=123,LWB=456,..." (order code = PlayerID) into {order code: squad index}."""
+    by_id = {player["player_id"]: index for index, player in enumerate(squad)
+             if player["player_id"] is not None}
+    lineup = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        code, sep, player_id = part.partition("=")
+        code = code.strip().upper()
+        if not sep or code not in ORDER_SLOT:
+            raise ValueError(f"bad lineup entry {part.strip()!r}; expected ORDER=PlayerID")
+        if code in lineup:
+            raise ValueError(f"order {code} appears twice in the lineup")
+        try:
+            lineup[code] = by_id[int(player_id)]
+        except (KeyError, ValueError):
+            raise ValueError(f"no player {player_id.strip()!r} in the squad export") from None
+    if len(lineup) != 11:
+        raise ValueError(f"a lineup needs 11 players, got {len(lineup)}")
+    return lineup
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Choose the market players to buy within a budget for the best weighted team rating.")
+    parser.add_argument("squad_csv", help="semicolon-separated export of the current squad")
+    parser.add_argument("market_csv", help="export of the market players, with a Price column")
+    parser.add_argument("--budget", type=float, required=True, help="money available for purchases")
+    parser.add_argument("--lineup", default=None,
+                        help="current XI as ORDER=PlayerID pairs, e.g. GK=1,LWB=2,... "
+                             "(default: the squad's best lineup)")
+    parser.add_argument("--max-buys", type=int, default=None, help="most players to buy")
+    parser.add_argument("--weights", default=None,
+                        help="sector weight overrides, e.g. MB=1.2,M=3 (default 1.0 each)")
+    parser.add_argument("--gap", type=float, default=0.,
+                        help="accept a result this far below the best objective, for speed (default 0)")
+    parser.add_argument("--time-budget", type=float, default=10.,
+                        help="seconds to search before settling for the best purchases found, with "
+                             "their proven gap (default 10; 0 for no limit)")
+    args = parser.parse_args(argv)
+
+    try:
+        weights = rank_players.parse_weights(args.weights)
+    except ValueError as exc:
+        parser.error(str(exc))
+    squad, warnings = rank_players.parse_players(args.squad_csv)
+    market, market_warnings = rank_players.parse_players(args.market_csv)
+    for warning in warnings + market_warnings:
+        print(f"warning: {warning}", file=sys.stderr)
+    unpriced = sum(1 for player in market if player["price"] is None)
+    if unpriced:
+        print(f"warning: {unpriced} market player(s) have no price and are skipped", file=sys.stderr)
+
+    try:
+        if args.lineup:
+            chosen = parse_lineup(args.lineup, squad)
+        else:
+            found = lineup_search.best_lineup([player["skills"] for player in squad], weights)
+            chosen = {code: player for _, player, code in found["lineup"]}
+        lineup = {code: squad[player]["skills"] for code, player in chosen.items()}
+        result = best_purchases(lineup, market, weights, args.budget, args.max_buys, args.gap,
+                                args.time_budget or None)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    print(f"current objective {result['base_objective']:.3f}")
+    if not result["purchases"]:
+        print("no purchase within the budget improves the team")
+    for purchase in result["purchases"]:
+        replaced = squad[chosen[purchase["slot"]]]["name"]
+        print(f"  buy {market[purchase['player']]['name']} for {purchase['price']:,.0f}: "
+              f"{purchase['order']} instead of {replaced} ({purchase['slot']})")
+    print(f"spent {result['spent']:,.0f} of {args.budget:,.0f}  objective {result['objective']:.3f}")
+    team_ratings = ratings.calculate_team_ratings(apply_purchases(lineup, market, result["purchases"]))
+    print("  " + "  ".join(f"{sector} {team_ratings[sector]:.2f}" for sector in SECTORS))
+    if not result["complete"]:
+        print(f"search stopped at the time budget: the objective is within {result['gap']:.3f} "
+              f"of the best")
+    print(f"\n{result['options']} options, {result['nodes']} nodes", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Keep a ranking up to date as exports are dropped into a directory.
+
+Players are keyed by PlayerID, and the ranking holds the players of the
+latest export: each export is a snapshot of the squad, so players missing
+from it (sold or released) are dropped. Each poll parses only files that are
+new or whose size or modification time changed, and rescores only players
+whose skills, form or experience differ from what was last scored; other
+rows just refresh the name and age. The ranking is a sorted list
+of keys, updated by removing and re-inserting the rescored players with
+bisect (or, for large batches such as the first export, by one merge of the
+sorted new keys) instead of re-sorting, and each update reports how those
+players moved.
+
+Order matches rank_players (descending order totals compared
+lexicographically), with ties broken by PlayerID instead of input order.
+"""
+
+import argparse
+import bisect
+import csv
+import heapq
+import os
+import sys
+import time
+import zipfile
+
+import rank_players
+
+EXPORT_SUFFIXES = (".csv", ".gz", ".bz2", ".zip")
+# larger batches are merged into the ranking in one pass instead of key by key
+BISECT_LIMIT = 64
+
+
+def rank_key(totals: dict[str, float], player_id: int) -> tuple:
+    """Ascending sort key: best player first, like rank_players' descending sort."""
+    return tuple(-total for total in sorted(totals.values(), reverse=True)), player_id
+
+
+class IncrementalRanking:
+    """A position ranking over every player seen, updated from export rows."""
+
+    def __init__(self, position: str, weights: dict[str, float], use_form: bool = True,
+                 orders: list[str] | None = None):
+        self.position = position
+        self.weights = weights
+        self.use_form = use_form
+        self.orders = rank_players.resolve_orders(position, orders)
+        self.entries = {}
+        self.scored = {}
+        self.keys = []
+        self.files = {}
+        self.rescored = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def score(self, player: dict) -> dict:
+        """A rank_players-style entry for one player."""
+        codes = rank_players.POSITION_ORDERS[self.position]
+        form_mult = rank_players.form_multiplier(player["form"]) if self.use_form else 1.0
+        totals = {label: rank_players.order_total(player["skills"], form_mult, codes[label],
+                                                  self.weights, exp=player["experience"])
+                  for label in self.orders}
+        entry = dict(player)
+        entry["totals"] = totals
+        entry["best_order"] = max(totals, key=totals.get)
+        entry["average"] = sum(totals.values()) / len(totals)
+        return entry
+
+    def rank_of(self, player_id: int) -> int:
+        """1-based rank of a player in the current ranking."""
+        entry = self.entries[player_id]
+        return bisect.bisect_left(self.keys, rank_key(entry["totals"], player_id)) + 1
+
+    def update(self, players: list[dict], snapshot: bool = False) -> list[dict]:
+        """Apply parsed rows; returns a delta per rescored or dropped player, best new rank first.
+
+        A delta holds "player_id", "name", "old_rank" (None for a new player),
+        "new_rank" (None for a dropped one) and "best_total". Rows without a
+        PlayerID cannot be tracked and are ignored. With snapshot, the rows are
+        a whole squad and players without a row are dropped from the ranking.
+        """
+        dropped = []
+        if snapshot:
+            present = {player.get("player_id") for player in players}
+            dropped = [player_id for player_id in self.entries if player_id not in present]
+        dropped_deltas = [{"player_id": player_id, "name": self.entries[player_id]["name"],
+                           "old_rank": self.rank_of(player_id), "new_rank": None,
+                           "best_total": max(self.entries[player_id]["totals"].values())}
+                          for player_id in dropped]
+        for player_id in dropped:
+            key = rank_key(self.entries.pop(player_id)["totals"], player_id)
+            del self.scored[player_id]
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+        changed = {}
+        for player in players:
+            player_id = player.get("player_id")
+            if player_id is None:
+                continue
+            signature = (tuple(player["skills"].values()), player["form"], player["experience"])
+            if self.scored.get(player_id) == signature and player_id not in changed:
+                entry = self.entries[player_id]
+                entry["name"], entry["age"] = player["name"], player["age"]
+                continue
+            changed[player_id] = (player, signature)
+
+        old_ranks = {player_id: self.rank_of(player_id) if player_id in self.entries else None
+                     for player_id in changed}
+        stale = [rank_key(self.entries[player_id]["totals"], player_id)
+                 for player_id in changed if player_id in self.entries]
+        fresh = []
+        for player_id, (player, signature) in changed.items():
+            entry = self.score(player)
+            self.entries[player_id] = entry
+            self.scored[player_id] = signature
+            fresh.append(rank_key(entry["totals"], player_id))
+        if len(changed) <= BISECT_LIMIT:
+            for key in stale:
+                del self.keys[bisect.bisect_left(self.keys, key)]
+            for key in fresh:
+                bisect.insort(self.keys, key)
+        else:
+            stale = set(stale)
+            self.keys = list(heapq.merge([key for key in self.keys if key not in stale],
+                                         sorted(fresh)))
+        self.rescored += len(changed)
+
+        deltas = [{"player_id": player_id, "name": self.entries[player_id]["name"],
+                   "old_rank": old_ranks[player_id], "new_rank": self.rank_of(player_id),
+                   "best_total": max(self.entries[player_id]["totals"].values())}
+                  for player_id in changed]
+        deltas.sort(key=lambda delta: delta["new_rank"])
+        return deltas + dropped_deltas
+
+    def ranked(self) -> list[dict]:
+        """Entries best-first, as rank_players returns them."""
+        return [self.entries[player_id] for _, player_id in self.keys]
+
+    def changed_files(self, directory: str) -> list[tuple[str, tuple[int, int]]]:
+        """(path, (mtime, size)) of the directory's new or changed exports, oldest first."""
+        found = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if not name.lower().endswith(EXPORT_SUFFIXES) or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if self.files.get(path) != signature:
+                found.append((stat.st_mtime_ns, path, signature))
+        found.sort()
+        return [(path, signature) for _, path, signature in found]
+
+    def poll(self, directory: str, warn=None) -> list[dict]:
+        """Parse the directory's new or changed exports and apply them as snapshots; returns the deltas.
+
+        A player changed by several exports in one poll gets one delta per export.
+        warn, if given, is called with each parser warning. An export that
+        cannot be read (e.g. still being copied) is skipped and tried again on
+        the next poll; once complete its modification time is the newest, so
+        it is still applied after the exports before it. An export without a
+        single tracked player is taken as not fully written and not applied,
+        rather than as a squad everyone has left.
+        """
+        deltas = []
+        for path, signature in self.changed_files(directory):
+            name = os.path.basename(path)
+            try:
+                players, warnings = rank_players.parse_players(path)
+            except (EOFError, OSError, ValueError, csv.Error, zipfile.BadZipFile) as exc:
+                if warn is not None:
+                    warn(f"{name}: cannot read it yet ({exc}); trying again next poll")
+                continue
+            if warn is not None:
+                for warning in warnings:
+                    warn(f"{name}: {warning}")
+            self.files[path] = signature
+            if not any(player.get("player_id") is not None for player in players):
+                if warn is not None:
+                    warn(f"{name}: no players with a PlayerID; not applied")
+                continue
+            deltas.extend(self.update(players, snapshot=True))
+        return deltas
+
+
+def format_delta(delta: dict) -> str:
+    if delta["old_rank"] is None:
+        move = f"new at {delta['new_rank']}"
+    elif delta["new_rank"] is None:
+        move = f"dropped from {delta['old_rank']}"
+    else:
+        change = delta["old_rank"] - delta["new_rank"]
+        move = f"{delta['old_rank']} -> {delta['new_rank']} ({change:+d})"
+    return f"{delta['name']} [{delta['player_id']}]: {move}, best {delta['best_total']:.3f}"
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Watch a directory of exports and report how players' ranks change.")
+    parser.add_argument("directory", help="directory that exports (.csv, .gz, .bz2, .zip) are dropped in")
+    parser.add_argument("position", help="position to rank for, e.g. wingback")
+    parser.add_argument("--weights", default=None, help="sector weight overrides, e.g. MB=1.2,M=3")
+    parser.add_argument("--orders", default=None,
+                        help="comma-separated orders to consider (default: all orders of the position)")
+    parser.add_argument("--ignore-form", action="store_true",
+                        help="treat every player as being at maximum form")
+    parser.add_argument("--interval", type=float, default=10.0,
+                        help="seconds between directory scans (default 10)")
+    parser.add_argument("--once", action="store_true",
+                        help="scan once, print the ranking and exit")
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.directory):
+        parser.error(f"not a directory: {args.directory}")
+
+    order_labels = None
+    if args.orders:
+        order_labels = [label.strip().lower() for label in args.orders.split(",")]
+    try:
+        position = rank_players.normalize_position(args.position)
+        weights = rank_players.parse_weights(args.weights)
+        ranking = IncrementalRanking(position, weights, use_form=not args.ignore_form,
+                                     orders=order_labels)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    def warn(message):
+        print(f"warning: {message}", file=sys.stderr)
+
+    ranking.poll(args.directory, warn)
+    print(rank_players.format_table(ranking.ranked(), ranking.orders))
+    sys.stdout.flush()
+    if args.once:
+        return
+    try:
+        while True:
+            time.sleep(args.interval)
+            deltas = ranking.poll(args.directory, warn)
+            if deltas:
+                print(f"\n{time.strftime('%H:%M:%S')} {len(deltas)} player(s) rescored")
+                for delta in deltas:
+                    print(format_delta(delta))
+                sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()